@@ -0,0 +1,58 @@
+"""Cold history load: CSV log vs the binary log.
+
+Usage: python benchmarks/bench_binlog.py [rows]   (default 1,000,000)
+"""
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_binlog import BinaryLog  # noqa: E402
+from task_history import HistoryStore, TotalsStore, log_header  # noqa: E402
+
+
+def write_log(path, count):
+    rng = random.Random(0)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        f.write(log_header('v4'))
+        writer = csv.writer(f)
+        for i in range(count):
+            day = f"2025-{rng.randrange(1, 13):02}-{rng.randrange(1, 29):02}"
+            start = f"{rng.randrange(24):02}:{rng.randrange(60):02}:{rng.randrange(60):02}"
+            writer.writerow([day, start, day, start, f"Task {rng.randrange(200)}",
+                             f"note {rng.randrange(1000)}", rng.randrange(60, 7200)])
+
+
+def timed(name, load):
+    start = time.perf_counter()
+    load()
+    print(f"{name:<32} {time.perf_counter() - start:8.3f} s")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'task_log.csv')
+        bin_path = os.path.join(tmp, 'task_log.tlog')
+        write_log(csv_path, count)
+        BinaryLog(bin_path).import_csv(csv_path)
+        sizes = (os.path.getsize(csv_path), os.path.getsize(bin_path) + os.path.getsize(bin_path + '.str'))
+        print(f"{count:,} sessions: CSV {sizes[0] >> 20} MiB, binary {sizes[1] >> 20} MiB")
+
+        timed("CSV HistoryStore", lambda: HistoryStore(csv_path).refresh())
+        timed("CSV TotalsStore (no sidecar)", lambda: _totals(csv_path))
+        timed("binary log (history + totals)", lambda: BinaryLog(bin_path).refresh())
+
+
+def _totals(path):
+    store = TotalsStore(path)
+    store.invalidate()
+    store.refresh()
+
+
+if __name__ == '__main__':
+    main()
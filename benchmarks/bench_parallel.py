@@ -0,0 +1,39 @@
+"""Parallel vs serial totals over one large log.
+
+Usage: python benchmarks/bench_parallel.py [rows]   (default 2,000,000)
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gen_log import generate  # noqa: E402
+from task_parallel import aggregate, serial_totals  # noqa: E402
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'task_log.csv')
+        size = generate(path, count, layout='mixed')
+        print(f"{count:,} sessions, {size >> 20} MiB, {os.cpu_count()} cores")
+
+        start = time.perf_counter()
+        serial = serial_totals([path])
+        base = time.perf_counter() - start
+        print(f"{'serial':<12} {base:8.3f} s")
+        workers = 1
+        while workers <= (os.cpu_count() or 1):
+            start = time.perf_counter()
+            totals = aggregate([path], workers, chunk_size=max(size // (4 * workers), 1 << 20))
+            seconds = time.perf_counter() - start
+            same = totals.partial() == serial.partial()
+            print(f"{workers:>2} workers   {seconds:8.3f} s  x{base / seconds:5.2f}  "
+                  f"{'identical' if same else 'DIFFERENT'}")
+            workers *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""Range totals: one CSV log vs monthly partitions with a manifest.
+
+Usage: python benchmarks/bench_partitions.py [rows]   (default 1,000,000)
+"""
+import csv
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_binlog import write_log  # noqa: E402
+from task_history import parse_row_any  # noqa: E402
+from task_partitions import PartitionedLog, split_log  # noqa: E402
+
+
+def timed(name, load):
+    start = time.perf_counter()
+    load()
+    print(f"{name:<36} {time.perf_counter() - start:8.3f} s")
+
+
+def scan_totals(path, low, high):
+    totals = {}
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            parsed = parse_row_any(row)
+            if parsed is None:
+                continue
+            day = int(parsed[0].replace('-', ''))
+            if low <= day <= high:
+                totals[parsed[2]] = totals.get(parsed[2], 0) + parsed[4]
+    return totals
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'task_log.csv')
+        directory = os.path.join(tmp, 'task_log')
+        write_log(csv_path, count)
+        split_log(csv_path, directory)
+        print(f"{count:,} sessions over 12 monthly partitions")
+
+        for label, low, high in (("whole year", 20250101, 20251231),
+                                 ("one month", 20250601, 20250630),
+                                 ("mid-month to mid-month", 20250315, 20250414)):
+            timed(f"CSV scan, {label}", lambda: scan_totals(csv_path, low, high))
+            timed(f"partitions, {label}", lambda: PartitionedLog(directory).task_totals(low, high))
+        log = PartitionedLog(directory)
+        timed("partitions, compress", log.compress)
+        timed("gzip partitions, mid-month range", lambda: log.task_totals(20250315, 20250414))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Time of task_report's load-and-rollup path on a generated log.
+
+The log comes from ``gen_log.py`` (Zipf-skewed tasks, mixed v1/v4 rows)
+and is read the way ``python task_report.py`` reads it: ``HistoryStore``
+parses it, ``SessionArrays.from_store`` turns the store into NumPy columns,
+then each rollup the CLI offers runs on them.  A last case runs the CLI end
+to end.  Peak RSS is the process's, so it includes the generator when the
+log is written in the same run.
+
+Usage: python benchmarks/bench_report.py [rows] [--log PATH]   (default 10m)
+
+Writing 10M rows takes longer than reading them; ``--log`` keeps the
+generated file at PATH and reuses it on the next run.
+"""
+import argparse
+import contextlib
+import io
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gen_log import generate, parse_count  # noqa: E402
+import task_report  # noqa: E402
+from task_history import HistoryStore, parse_row_any  # noqa: E402
+from task_report import SessionArrays  # noqa: E402
+
+
+def peak_mib():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(run):
+    start = time.perf_counter()
+    result = run()
+    return result, time.perf_counter() - start, peak_mib()
+
+
+def report(name, seconds, peak, rows):
+    print(f"{name:<24} {seconds:8.3f} s  {rows / seconds:14,.0f} rows/s  peak {peak:7.1f} MiB")
+
+
+def run(path):
+    store = HistoryStore(path, parse_row_any)
+    _, parse_seconds, parse_peak = measure(store.refresh)
+    sessions, seconds, peak = measure(lambda: SessionArrays.from_store(store))
+    del store
+    rows = len(sessions.durations)
+    print(f"{rows:,} sessions, {os.path.getsize(path) / 2 ** 20:.1f} MiB")
+    report("parse log", parse_seconds, parse_peak, rows)
+    report("columns", seconds, peak, rows)
+    cases = [
+        ("by task", lambda: sessions.task_totals()),
+        ("by day", lambda: sessions.day_totals()),
+        ("by ISO week", lambda: sessions.week_totals()),
+        ("by month", lambda: sessions.month_totals()),
+        ("by day, one year", lambda: sessions.day_totals(20230101, 20231231)),
+        ("top 10 tasks", lambda: sessions.top_tasks(10)),
+    ]
+    for name, rollup in cases:
+        report(name, *measure(rollup)[1:], rows)
+    del sessions
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, seconds, peak = measure(lambda: task_report.main(['--log', path, '--by', 'week']))
+    report("task_report.py --by week", seconds, peak, rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time task_report's load and rollups.")
+    parser.add_argument('rows', type=parse_count, nargs='?', default=10_000_000, help="e.g. 1m, 10m")
+    parser.add_argument('--log', help="generated log to keep and reuse (default: a temporary file)")
+    args = parser.parse_args(argv)
+    if args.log:
+        if not os.path.exists(args.log):
+            generate(args.log, args.rows, layout='mixed')
+        run(args.log)
+        return 0
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'task_log.csv')
+        generate(path, args.rows, layout='mixed')
+        run(path)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""Concurrent clients against one TimerServer.
+
+Each client thread runs start/stop cycles on its own timer; every stop is a
+durable (fsynced) row written by the server's single writer.  Reports
+requests/s and checks that the log holds exactly one intact row per stop.
+
+Usage: python benchmarks/bench_server.py [clients] [cycles]   (default 200, 20)
+"""
+import asyncio
+import csv
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_history import parse_row_any  # noqa: E402
+from task_server import TimerClient, TimerServer  # noqa: E402
+
+
+def run_server(log, sock, ready, stop):
+    async def serve():
+        server = TimerServer(log)
+        await server.start(unix_path=sock)
+        ready.set()
+        await stop.wait()
+        await server.close()
+
+    loop = asyncio.new_event_loop()
+    stop.loop = loop
+    loop.run_until_complete(serve())
+
+
+class Stop:
+    def __init__(self):
+        self.event = None
+        self.loop = None
+
+    async def wait(self):
+        self.event = asyncio.Event()
+        await self.event.wait()
+
+    def set(self):
+        self.loop.call_soon_threadsafe(self.event.set)
+
+
+def client(address, index, cycles, errors):
+    c = TimerClient(address)
+    try:
+        for i in range(cycles):
+            c.start(f"client-{index}", f"Task {index % 17}", f"cycle {i}")
+            c.stop(f"client-{index}")
+    except Exception as e:
+        errors.append(e)
+    finally:
+        c.close()
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    cycles = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    with tempfile.TemporaryDirectory() as tmp:
+        log = os.path.join(tmp, 'task_log.csv')
+        sock = os.path.join(tmp, 'timer.sock')
+        ready, stop = threading.Event(), Stop()
+        server = threading.Thread(target=run_server, args=(log, sock, ready, stop))
+        server.start()
+        ready.wait()
+
+        errors = []
+        threads = [threading.Thread(target=client, args=(f"unix:{sock}", i, cycles, errors))
+                   for i in range(clients)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        seconds = time.perf_counter() - start
+        stop.set()
+        server.join()
+
+        with open(log, newline='', encoding='utf-8') as f:
+            rows = [parse_row_any(row) for row in csv.reader(f) if not row[0].startswith('#')]
+        expected = clients * cycles
+        print(f"{clients} clients x {cycles} cycles: {2 * expected / seconds:,.0f} requests/s, "
+              f"{expected / seconds:,.0f} durable rows/s")
+        print(f"rows: {len(rows)} written, {sum(r is not None for r in rows)} intact, {expected} expected")
+        if errors:
+            print(f"{len(errors)} client errors, first: {errors[0]!r}")
+
+
+if __name__ == '__main__':
+    main()
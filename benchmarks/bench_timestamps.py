@@ -0,0 +1,48 @@
+"""Micro-benchmark: strptime vs the fixed-format fast path in task_history.
+
+Usage: python benchmarks/bench_timestamps.py [rows]   (default 1,000,000)
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_history import TIMESTAMP_FORMAT, stamp_key  # noqa: E402
+
+
+def make_rows(count, seed=1):
+    rnd = random.Random(seed)
+    rows = []
+    for _ in range(count):
+        rows.append((f"{rnd.randint(2019, 2026)}-{rnd.randint(1, 12):02}-{rnd.randint(1, 28):02}",
+                     f"{rnd.randint(0, 23):02}:{rnd.randint(0, 59):02}:{rnd.randint(0, 59):02}"))
+    return rows
+
+
+def bench_strptime(rows):
+    for d, t in rows:
+        datetime.strptime(d + " " + t, TIMESTAMP_FORMAT)
+
+
+def bench_stamp_key(rows):
+    for d, t in rows:
+        stamp_key(d, t)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rows = make_rows(count)
+    results = {}
+    for name, fn in (("strptime", bench_strptime), ("stamp_key", bench_stamp_key)):
+        start = time.perf_counter()
+        fn(rows)
+        results[name] = time.perf_counter() - start
+        print(f"{name:<10} {results[name]:8.3f} s  {count / results[name]:12,.0f} rows/s")
+    print(f"speedup    {results['strptime'] / results['stamp_key']:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""Write throughput of append_row vs SessionWriter flush policies.
+
+Usage: python benchmarks/bench_writer.py [rows]   (default 20,000)
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_history import SessionWriter, append_row  # noqa: E402
+
+ROW = ['2025-07-09', '10:00:00', 'Benchmark task', 'bulk import', 60]
+
+POLICIES = [
+    ("writer, every row", dict(flush_every=1)),
+    ("writer, every row + fsync", dict(flush_every=1, fsync=True)),
+    ("writer, every 1000 rows", dict(flush_every=1000)),
+    ("writer, every 1000 rows + fsync", dict(flush_every=1000, fsync=True)),
+    ("writer, every 100 ms + fsync", dict(flush_every=10 ** 9, flush_interval=0.1, fsync=True)),
+]
+
+
+def report(name, count, seconds):
+    print(f"{name:<34} {seconds:8.3f} s  {count / seconds:12,.0f} rows/s")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'task_log.csv')
+        start = time.perf_counter()
+        for _ in range(count):
+            append_row(path, ROW)
+        report("append_row (open/close per row)", count, time.perf_counter() - start)
+
+        for name, policy in POLICIES:
+            os.remove(path)
+            start = time.perf_counter()
+            writer = SessionWriter(path, **policy)
+            for _ in range(count):
+                writer.write(ROW)
+            writer.close()
+            report(name, count, time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    main()
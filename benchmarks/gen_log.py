@@ -0,0 +1,118 @@
+"""Synthetic task logs for the benchmarks.
+
+Sessions start in time order, spread over ``--years`` from ``--since``
+(a team's log: more rows means more sessions per day, not a longer past).
+Task use is Zipf-skewed: a handful of tasks take most sessions and there
+is a long tail of rare ones.  Comments mix ticket numbers, ASCII words and
+non-ASCII text (Vietnamese, CJK, emoji), since that is what real logs hold.
+
+    python benchmarks/gen_log.py task_log.csv 1m              # v4, 7 columns
+    python benchmarks/gen_log.py old_log.csv 10k --layout v1  # 5 columns
+    python benchmarks/gen_log.py big_log.csv 10m --layout mixed
+
+Sizes accept k/m suffixes; the same arguments and seed give the same file.
+Like logs the apps append to, it has no magic line (``--header`` adds one,
+as ``migrate_log`` would).
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_history import log_header  # noqa: E402
+
+WORDS = ["fix", "review", "deploy", "meeting", "standup", "refactor", "docs", "on-call",
+         "sửa lỗi", "họp nhóm", "triển khai", "kiểm thử", "báo cáo",
+         "会议", "修复", "レビュー", "배포", "🚀", "☕", "naïve", "café", "Zürich"]
+PROJECTS = ["ABC", "OPS", "WEB", "DATA", "INFRA"]
+BATCH = 10000
+
+
+def parse_count(text):
+    """``10k`` / ``1m`` / ``2500`` to an int."""
+    scale = {'k': 1000, 'm': 1000000}.get(text[-1:].lower(), 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+def task_names(count, rng):
+    names = []
+    for i in range(count):
+        project = PROJECTS[i % len(PROJECTS)]
+        words = " ".join(rng.sample(WORDS, 2))
+        names.append(f"{project}-{i} {words}")
+    return names
+
+
+class _Clock:
+    """Seconds since ``since`` to log date/time strings, one date format per day."""
+
+    def __init__(self, since):
+        self.since = datetime.strptime(since, "%Y-%m-%d")
+        self.dates = {}
+
+    def __call__(self, seconds):
+        day, rest = divmod(int(seconds), 86400)
+        date = self.dates.get(day)
+        if date is None:
+            date = self.dates[day] = (self.since + timedelta(days=day)).strftime("%Y-%m-%d")
+        hours, rest = divmod(rest, 3600)
+        return date, f"{hours:02}:{rest // 60:02}:{rest % 60:02}"
+
+
+def generate(path, rows, layout='v4', tasks=2000, skew=1.1, since="2019-01-01", years=6, seed=0,
+             header=False):
+    """Write ``rows`` sessions to ``path``; returns the number of bytes written."""
+    rng = random.Random(seed)
+    names = task_names(tasks, rng)
+    weights = list(accumulate(1 / (rank + 1) ** skew for rank in range(tasks)))
+    stamp = _Clock(since)
+    gap = years * 365 * 86400 / max(rows, 1)
+    clock = 9 * 3600.0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        if header and layout != 'mixed':
+            f.write(log_header(layout))
+        writer = csv.writer(f)
+        written = 0
+        while written < rows:
+            batch = min(BATCH, rows - written)
+            picks = rng.choices(names, cum_weights=weights, k=batch)
+            out = []
+            for task in picks:
+                duration = min(int(rng.lognormvariate(7.3, 0.9)), 8 * 3600)
+                clock += rng.expovariate(1 / gap)
+                date, time_str = stamp(clock)
+                comment = f"{rng.choice(PROJECTS)}-{rng.randrange(10000)} {rng.choice(WORDS)} {rng.choice(WORDS)}"
+                if layout == 'v1' or (layout == 'mixed' and rng.random() < 0.5):
+                    out.append([date, time_str, task, comment, duration])
+                else:
+                    out.append([date, time_str, *stamp(clock + duration), task, comment, duration])
+            writer.writerows(out)
+            written += batch
+    return os.path.getsize(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic task log.")
+    parser.add_argument('path')
+    parser.add_argument('rows', type=parse_count, nargs='?', default=10000, help="e.g. 10k, 1m, 10m")
+    parser.add_argument('--layout', choices=['v1', 'v4', 'mixed'], default='v4')
+    parser.add_argument('--tasks', type=int, default=2000)
+    parser.add_argument('--skew', type=float, default=1.1, help="Zipf exponent of task use")
+    parser.add_argument('--since', default="2019-01-01", help="first session date")
+    parser.add_argument('--years', type=float, default=6, help="span the sessions are spread over")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--header', action='store_true', help="start with the magic line (not with --layout mixed)")
+    args = parser.parse_args(argv)
+    size = generate(args.path, args.rows, args.layout, args.tasks, args.skew, args.since,
+                    args.years, args.seed, args.header)
+    print(f"wrote {args.rows:,} {args.layout} sessions to {args.path} ({size / 2 ** 20:.1f} MiB)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,236 @@
+"""Time and peak memory of the history/persistence paths, comparable across commits.
+
+Each case runs in a fresh interpreter so caches, module-level stores and
+peak RSS are its own.  The log is the one given (see ``gen_log.py``); the
+cases that write to it get a private copy, the others a symlink, and every
+case starts without sidecar files (no ``.totals``, no ``.aliases``).
+
+    python benchmarks/gen_log.py /tmp/log_1m.csv 1m
+    python benchmarks/run_bench.py /tmp/log_1m.csv                      # this tree
+    python benchmarks/run_bench.py /tmp/log_1m.csv --json now.json
+    python benchmarks/run_bench.py /tmp/log_1m.csv --compare before.json
+    python benchmarks/run_bench.py /tmp/log_1m.csv --commits HEAD~10 HEAD
+
+``--commits`` checks each commit out in a temporary ``git worktree`` and runs
+the same cases against it; a case the commit cannot run is reported as such.
+A case more than ``--threshold`` slower than the reference is flagged.
+"""
+import argparse
+import ast
+import inspect
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import types
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAVES = 200
+
+# name -> (script the functions come from, needs a private copy of the log)
+CASES = {
+    'read_task_history': ('task-timer-v4.py', False),
+    'read_task_history (warm)': ('task-timer-v4.py', False),
+    'get_recent_tasks': ('task-timer-v4.py', False),
+    'summarize_time': ('task-timer.py', False),
+    'save_session': ('task-timer-v4.py', True),
+    'rename_task_in_file': ('task-timer-v4.py', True),
+    'rename + read_task_history': ('task-timer-v4.py', True),
+}
+
+
+def _load(tree, script):
+    """The script's functions and constants, without starting its Tk app.
+
+    Older scripts create the window at module level; top-level statements
+    are run one at a time and the ones that need a display are skipped.
+    """
+    path = os.path.join(tree, script)
+    with open(path, encoding='utf-8') as f:
+        body = ast.parse(f.read(), path).body
+    module = types.ModuleType(script.replace('-', '_')[:-3])
+    module.__file__ = path
+    for node in body:
+        if isinstance(node, ast.Expr) or isinstance(node, ast.If) and '__name__' in ast.dump(node.test):
+            continue  # mainloop() and the __main__ block
+        code = compile(ast.Module([node], []), path, 'exec')
+        try:
+            exec(code, module.__dict__)
+        except Exception:
+            if isinstance(node, (ast.Import, ast.ImportFrom, ast.FunctionDef, ast.ClassDef)):
+                raise
+    return module
+
+
+def _materialize(history):
+    # Lazy history views (HistoryStore) only pay on access; touch every session
+    return sum(len(list(sessions)) for sessions in history.values())
+
+
+def _top_task(history):
+    return max(history, key=lambda task: len(history[task]))
+
+
+def _save_sessions(module):
+    params = inspect.signature(module.save_session).parameters
+    for i in range(SAVES):
+        if len(params) == 3:
+            # Older scripts read the start time from the global app
+            module.app = types.SimpleNamespace(start_time=time.time() - 60)
+            module.save_session("Benchmark task", f"save {i}", 60)
+        else:
+            module.save_session("Benchmark task", f"save {i}", time.time() - 60, 60)
+    close = getattr(module, 'close_writer', None)
+    if close is not None:
+        close()
+
+
+def run_case(name, tree):
+    """Run one case in this process (cwd holds task_log.csv); returns its measurements."""
+    sys.path.insert(0, tree)
+    script, _ = CASES[name]
+    module = _load(tree, script)
+    before = None
+    if name == 'read_task_history (warm)':
+        _materialize(module.read_task_history())
+    elif name.startswith('rename'):
+        before = _top_task(module.read_task_history())
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time.perf_counter()
+    if name.startswith('read_task_history'):
+        _materialize(module.read_task_history())
+    elif name == 'get_recent_tasks':
+        list(module.get_recent_tasks(3))
+    elif name == 'summarize_time':
+        module.summarize_time()
+    elif name == 'save_session':
+        _save_sessions(module)
+    else:
+        module.rename_task_in_file(before, before + " (renamed)")
+        if name == 'rename + read_task_history':
+            _materialize(module.read_task_history())
+    seconds = time.perf_counter() - start
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {'seconds': seconds, 'peak_mib': max(peak - baseline, 0) / 1024}
+
+
+def run_in_child(name, tree, log):
+    """Run one case in a fresh interpreter and work directory."""
+    with tempfile.TemporaryDirectory() as work:
+        target = os.path.join(work, 'task_log.csv')
+        if CASES[name][1]:
+            shutil.copyfile(log, target)
+        else:
+            os.symlink(os.path.abspath(log), target)
+        env = {k: v for k, v in os.environ.items()
+               if not k.startswith('TASK_TIMER_') and k not in ('DISPLAY', 'WAYLAND_DISPLAY')}
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', name, '--tree', tree],
+                              cwd=work, env=env, capture_output=True, text=True)
+    if proc.returncode:
+        lines = proc.stderr.strip().splitlines()
+        return {'error': lines[-1] if lines else f"exit status {proc.returncode}"}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def run_tree(tree, log, cases, label):
+    results = {}
+    for name in cases:
+        results[name] = run_in_child(name, tree, log)
+        print_result(label, name, results[name])
+    return results
+
+
+def print_result(label, name, result, reference=None, threshold=0.1):
+    if 'error' in result:
+        print(f"{label:<10} {name:<28} {'-':>9}   {'-':>9}   {result['error']}")
+        return
+    line = f"{label:<10} {name:<28} {result['seconds']:8.3f} s {result['peak_mib']:8.1f} MiB"
+    if reference and 'error' not in reference and reference['seconds'] > 0:
+        ratio = result['seconds'] / reference['seconds']
+        line += f"   x{ratio:5.2f}"
+        if ratio > 1 + threshold:
+            line += "  SLOWER"
+    print(line)
+
+
+def commit_tree(commit, parent):
+    """Check ``commit`` out into a worktree under ``parent``; returns (path, short hash)."""
+    short = subprocess.run(['git', 'rev-parse', '--short', commit], cwd=REPO, check=True,
+                           capture_output=True, text=True).stdout.strip()
+    path = os.path.join(parent, short)
+    subprocess.run(['git', 'worktree', 'add', '--detach', '--quiet', path, commit], cwd=REPO, check=True)
+    return path, short
+
+
+def current_commit():
+    proc = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO, capture_output=True, text=True)
+    return proc.stdout.strip() or None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the history/persistence paths.")
+    parser.add_argument('log', nargs='?', help="task log to run against (see gen_log.py)")
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES))
+    parser.add_argument('--commits', nargs='+', metavar='COMMIT',
+                        help="run each commit's code instead of this tree; the first is the reference")
+    parser.add_argument('--json', metavar='FILE', help="write the results (of the last commit) here")
+    parser.add_argument('--compare', metavar='FILE', help="earlier --json results to compare against")
+    parser.add_argument('--threshold', type=float, default=0.1, help="slowdown flagged (0.1 = 10%%)")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--tree', default=REPO, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(run_case(args.child, args.tree)))
+        return 0
+    if not args.log:
+        parser.error("a log file is required")
+
+    with open(args.log, 'rb') as f:
+        rows = sum(1 for _ in f)
+    print(f"{args.log}: {rows:,} lines, {os.path.getsize(args.log) / 2 ** 20:.1f} MiB")
+    runs = {}
+    if args.commits:
+        with tempfile.TemporaryDirectory() as parent:
+            for commit in args.commits:
+                tree, short = commit_tree(commit, parent)
+                try:
+                    runs[short] = run_tree(tree, args.log, args.cases, short)
+                finally:
+                    subprocess.run(['git', 'worktree', 'remove', '--force', tree], cwd=REPO)
+    else:
+        label = current_commit() or 'tree'
+        runs[label] = run_tree(REPO, args.log, args.cases, label)
+
+    reference = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            saved = json.load(f)
+        reference = (saved['label'], saved['results'])
+    elif len(runs) > 1:
+        first = next(iter(runs))
+        reference = (first, runs[first])
+    if reference:
+        print(f"\nrelative to {reference[0]}:")
+        for label, results in runs.items():
+            if results is reference[1]:
+                continue
+            for name, result in results.items():
+                print_result(label, name, result, reference[1].get(name), args.threshold)
+
+    if args.json:
+        label, results = list(runs.items())[-1]
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'label': label, 'log': os.path.abspath(args.log), 'lines': rows,
+                       'results': results}, f, indent=1)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
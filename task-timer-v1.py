@@ -1,35 +1,23 @@
 import tkinter as tk
 from tkinter import messagebox
 import time
-import csv
 from datetime import datetime
 import os
+from task_history import append_row, get_totals
 
 DATA_FILE = 'task_log.csv'
 
 def save_session(task, comment, duration_sec):
     date = datetime.now().strftime("%Y-%m-%d")
     time_str = datetime.now().strftime("%H:%M:%S")
-    with open(DATA_FILE, 'a', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow([date, time_str, task, comment, duration_sec])
+    append_row(DATA_FILE, [date, time_str, task, comment, duration_sec])
 
 def summarize_time():
     if not os.path.exists(DATA_FILE):
         return "No records yet."
-    summary = {}
-    with open(DATA_FILE, newline='') as f:
-        reader = csv.reader(f)
-        for row in reader:
-            if len(row) != 5: continue  # tránh lỗi nếu file bị hỏng dòng
-            date, _, _, _, duration = row
-            try:
-                duration = int(duration)
-                summary[date] = summary.get(date, 0) + duration
-            except:
-                continue
     result = "Total time by date:\n"
-    for date, total_sec in summary.items():
+    # Totals skip broken rows (wrong column count, bad duration)
+    for date, total_sec in get_totals(DATA_FILE).day_totals.items():
         mins = total_sec // 60
         result += f"{date}: {mins} minutes\n"
     return result
@@ -41,8 +29,9 @@ class TaskTimerApp:
 
         self.task_var = tk.StringVar()
         self.comment_var = tk.StringVar()
-        self.start_time = None
+        self.start_time = None  # time.monotonic(), so clock changes do not skew sessions
         self.running = False
+        self.tick_id = None  # the pending update_timer callback
 
         tk.Label(root, text="Task Name:").pack()
         tk.Entry(root, textvariable=self.task_var).pack()
@@ -64,16 +53,18 @@ class TaskTimerApp:
 
     def update_timer(self):
         if self.running:
-            elapsed = int(time.time() - self.start_time)
-            hrs = elapsed // 3600
-            mins = (elapsed % 3600) // 60
-            secs = elapsed % 60
+            elapsed = time.monotonic() - self.start_time
+            whole = int(elapsed)
+            hrs = whole // 3600
+            mins = (whole % 3600) // 60
+            secs = whole % 60
             self.timer_label.config(text=f"Timer: {hrs:02}:{mins:02}:{secs:02}")
-            self.root.after(1000, self.update_timer)
+            # Wake just after the next whole second instead of drifting by a fixed 1000 ms
+            self.tick_id = self.root.after(max(1000 - int(elapsed % 1 * 1000), 100), self.update_timer)
 
     def start_timer(self):
         if not self.running:
-            self.start_time = time.time()
+            self.start_time = time.monotonic()
             self.running = True
             self.update_timer()
 
@@ -82,7 +73,7 @@ class TaskTimerApp:
             messagebox.showwarning("Warning", "Timer not running.")
             return
         self.running = False
-        duration = int(time.time() - self.start_time)
+        duration = int(time.monotonic() - self.start_time)
         task = self.task_var.get().strip() or "Unnamed Task"
         comment = self.comment_var.get().strip()
         save_session(task, comment, duration)
@@ -90,6 +81,7 @@ class TaskTimerApp:
         self.summary_label.config(text=summarize_time())
 
 # Run the app
-root = tk.Tk()
-app = TaskTimerApp(root)
-root.mainloop()
+if __name__ == '__main__':
+    root = tk.Tk()
+    app = TaskTimerApp(root)
+    root.mainloop()
@@ -1,10 +1,8 @@
 import tkinter as tk
 from tkinter import messagebox
 import time
-import csv
 from datetime import datetime
-import os
-from collections import defaultdict
+from task_history import append_row, get_store, get_totals
 
 DATA_FILE = 'task_log.csv'
 
@@ -12,36 +10,17 @@ DATA_FILE = 'task_log.csv'
 def save_session(task, comment, duration_sec):
     date = datetime.now().strftime("%Y-%m-%d")
     time_str = datetime.now().strftime("%H:%M:%S")
-    with open(DATA_FILE, 'a', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerow([date, time_str, task, comment, duration_sec])
+    append_row(DATA_FILE, [date, time_str, task, comment, duration_sec])
 
 
 def read_task_history():
     """Đọc lịch sử task, trả về dict: {task_name: [danh sách (date, time, comment, duration)]}"""
-    history = defaultdict(list)
-    if not os.path.exists(DATA_FILE):
-        return history
-    with open(DATA_FILE, newline='', encoding='utf-8') as f:
-        reader = csv.reader(f)
-        for row in reader:
-            if len(row) != 5:
-                continue
-            date, time_str, task, comment, duration = row
-            try:
-                duration = int(duration)
-                history[task].append((date, time_str, comment, duration))
-            except:
-                continue
-    return history
+    return get_store(DATA_FILE).history
 
 
 def get_recent_tasks(n=3):
-    history = read_task_history()
-    sorted_tasks = sorted(history.items(), key=lambda item: max(
-        [datetime.strptime(d + " " + t, "%Y-%m-%d %H:%M:%S") for d, t, _, _ in item[1]]
-    ), reverse=True)
-    return sorted_tasks[:n]
+    """[(task, tổng số giây, comment cuối)] từ sidecar totals, không cần đọc lịch sử"""
+    return get_totals(DATA_FILE).recent(n)
 
 
 class TaskTimerApp:
@@ -51,8 +30,9 @@ class TaskTimerApp:
 
         self.task_var = tk.StringVar()
         self.comment_var = tk.StringVar()
-        self.start_time = None
+        self.start_time = None  # time.monotonic(), so clock changes do not skew sessions
         self.running = False
+        self.tick_id = None  # the pending update_timer callback
         self.selected_task = None
 
         # --- TASK SELECTION BLOCK ---
@@ -62,9 +42,7 @@ class TaskTimerApp:
         self.task_frame.pack(pady=5)
 
         self.task_buttons = []
-        for task_name, sessions in get_recent_tasks():
-            total_time = sum([s[3] for s in sessions])
-            last_comment = sessions[-1][2] if sessions else ""
+        for task_name, total_time, last_comment in get_recent_tasks():
             btn = tk.Button(self.task_frame, text=f"{task_name:<20} {total_time//60} min",
                             command=lambda name=task_name: self.select_task(name),
                             anchor='w', width=40)
@@ -112,19 +90,23 @@ class TaskTimerApp:
 
     def update_timer(self):
         if self.running:
-            elapsed = int(time.time() - self.start_time)
-            hrs = elapsed // 3600
-            mins = (elapsed % 3600) // 60
-            secs = elapsed % 60
+            elapsed = time.monotonic() - self.start_time
+            whole = int(elapsed)
+            hrs = whole // 3600
+            mins = (whole % 3600) // 60
+            secs = whole % 60
             self.timer_label.config(text=f"Timer: {hrs:02}:{mins:02}:{secs:02}")
-            self.root.after(1000, self.update_timer)
+            # Wake just after the next whole second instead of drifting by a fixed 1000 ms
+            self.tick_id = self.root.after(max(1000 - int(elapsed % 1 * 1000), 100), self.update_timer)
 
     def start_timer(self):
         if not self.selected_task:
             messagebox.showwarning("Warning", "Please select or enter a task first.")
             return
-        self.start_time = time.time()
+        self.start_time = time.monotonic()
         self.running = True
+        if self.tick_id is not None:
+            self.root.after_cancel(self.tick_id)  # a restart keeps one tick chain
         self.update_timer()
 
     def stop_timer(self):
@@ -132,7 +114,7 @@ class TaskTimerApp:
             messagebox.showwarning("Warning", "Timer not running.")
             return
         self.running = False
-        duration = int(time.time() - self.start_time)
+        duration = int(time.monotonic() - self.start_time)
         task = self.selected_task
         comment = self.comment_var.get().strip()
         save_session(task, comment, duration)
@@ -140,6 +122,7 @@ class TaskTimerApp:
         messagebox.showinfo("Saved", f"Task '{task}' saved with {duration} sec.")
 
 # Run the app
-root = tk.Tk()
-app = TaskTimerApp(root)
-root.mainloop()
+if __name__ == '__main__':
+    root = tk.Tk()
+    app = TaskTimerApp(root)
+    root.mainloop()
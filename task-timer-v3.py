@@ -1,57 +1,28 @@
 import tkinter as tk
 from tkinter import messagebox, simpledialog, ttk
 import time
-import csv
 from datetime import datetime
-import os
-from collections import defaultdict
+from task_history import StaleHistoryError, append_row, get_store, get_totals, rename_task
 
 DATA_FILE = 'task_log.csv'
+# Sessions inserted per expand / "more" click in the All Tasks tree
+SESSION_PAGE_SIZE = 200
 
 def save_session(task, comment, duration_sec):
     date = datetime.now().strftime("%Y-%m-%d")
     time_str = datetime.now().strftime("%H:%M:%S")
-    with open(DATA_FILE, 'a', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerow([date, time_str, task, comment, duration_sec])
+    append_row(DATA_FILE, [date, time_str, task, comment, duration_sec])
 
 def read_task_history():
-    history = defaultdict(list)
-    if not os.path.exists(DATA_FILE):
-        return history
-    with open(DATA_FILE, newline='', encoding='utf-8') as f:
-        reader = csv.reader(f)
-        for row in reader:
-            if len(row) != 5:
-                continue
-            date, time_str, task, comment, duration = row
-            try:
-                duration = int(duration)
-                history[task].append((date, time_str, comment, duration))
-            except:
-                continue
-    return history
+    return get_store(DATA_FILE).history
 
+# (task, total seconds, last comment) from the totals sidecar; the history is only read by All Tasks
 def get_recent_tasks(n=3):
-    history = read_task_history()
-    sorted_tasks = sorted(history.items(), key=lambda item: max(
-        [datetime.strptime(d + " " + t, "%Y-%m-%d %H:%M:%S") for d, t, _, _ in item[1]]
-    ), reverse=True)
-    return sorted_tasks[:n]
+    return get_totals(DATA_FILE).recent(n)
 
 def rename_task_in_file(old_name, new_name):
-    if not os.path.exists(DATA_FILE):
-        return
-    rows = []
-    with open(DATA_FILE, newline='', encoding='utf-8') as f:
-        reader = csv.reader(f)
-        for row in reader:
-            if len(row) == 5 and row[2] == old_name:
-                row[2] = new_name
-            rows.append(row)
-    with open(DATA_FILE, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerows(rows)
+    # Recorded in the alias table; `python task_history.py compact` rewrites the log later
+    rename_task(DATA_FILE, old_name, new_name)
 
 class AllTasksWindow:
     def __init__(self, parent):
@@ -62,15 +33,52 @@ class AllTasksWindow:
         self.tree = ttk.Treeview(self.window, columns=("Total Time"), show="tree")
         self.tree.pack(fill="both", expand=True)
 
+        self.task_nodes = {}  # task node -> (task name, sessions loaded so far)
+        self.more_nodes = {}  # "more sessions" node -> its task node
+        totals = get_totals(DATA_FILE).task_totals
         for task, sessions in self.history.items():
-            total_sec = sum([s[3] for s in sessions])
+            total_sec = totals.get(task, 0)
             parent_id = self.tree.insert("", "end", text=f"{task} ({total_sec//60} min)", open=False)
-            for date, time_str, comment, duration in sessions:
-                self.tree.insert(parent_id, "end", text=f"{date} {time_str} - {duration//60} min - {comment}")
+            # Sessions are inserted on first expand; the placeholder makes the node expandable
+            self.tree.insert(parent_id, "end", text="Loading...")
+            self.task_nodes[parent_id] = (task, 0)
+        self.tree.bind("<<TreeviewOpen>>", self.on_open)
+        self.tree.bind("<<TreeviewSelect>>", self.on_select)
 
         self.rename_btn = tk.Button(self.window, text="Rename Task", command=self.rename_task)
         self.rename_btn.pack(pady=5)
 
+    def on_open(self, _):
+        node = self.tree.focus()
+        if node in self.task_nodes and self.task_nodes[node][1] == 0:
+            self.tree.delete(*self.tree.get_children(node))
+            self.load_sessions(node)
+
+    def on_select(self, _):
+        for node in self.tree.selection():
+            parent_id = self.more_nodes.pop(node, None)
+            if parent_id:
+                self.tree.delete(node)
+                self.load_sessions(parent_id)
+
+    def load_sessions(self, parent_id):
+        task, loaded = self.task_nodes[parent_id]
+        try:
+            sessions = self.history[task]
+            len(sessions)
+        except StaleHistoryError:
+            # The log was replaced (e.g. compacted) since the window opened: read it again
+            self.history = read_task_history()
+            sessions = self.history[task]
+        page = sessions[loaded:loaded + SESSION_PAGE_SIZE]
+        for date, time_str, comment, duration in page:
+            self.tree.insert(parent_id, "end", text=f"{date} {time_str} - {duration//60} min - {comment}")
+        loaded += len(page)
+        self.task_nodes[parent_id] = (task, loaded)
+        if loaded < len(sessions):
+            more_id = self.tree.insert(parent_id, "end", text=f"... {len(sessions) - loaded} more sessions (click to load)")
+            self.more_nodes[more_id] = parent_id
+
     def rename_task(self):
         selected = self.tree.selection()
         if not selected:
@@ -91,8 +99,9 @@ class TaskTimerApp:
 
         self.task_var = tk.StringVar()
         self.comment_var = tk.StringVar()
-        self.start_time = None
+        self.start_time = None  # time.monotonic(), so clock changes do not skew sessions
         self.running = False
+        self.tick_id = None  # the pending update_timer callback
         self.selected_task = None
 
         # Recent tasks block
@@ -101,9 +110,7 @@ class TaskTimerApp:
         self.task_frame.pack(pady=5)
         self.task_buttons = []
 
-        for task_name, sessions in get_recent_tasks():
-            total_time = sum([s[3] for s in sessions])
-            last_comment = sessions[-1][2] if sessions else ""
+        for task_name, total_time, last_comment in get_recent_tasks():
             btn = tk.Button(self.task_frame, text=f"{task_name:<20} {total_time//60} min",
                             command=lambda name=task_name: self.select_task(name),
                             anchor='w', width=40)
@@ -149,19 +156,23 @@ class TaskTimerApp:
 
     def update_timer(self):
         if self.running:
-            elapsed = int(time.time() - self.start_time)
-            hrs = elapsed // 3600
-            mins = (elapsed % 3600) // 60
-            secs = elapsed % 60
+            elapsed = time.monotonic() - self.start_time
+            whole = int(elapsed)
+            hrs = whole // 3600
+            mins = (whole % 3600) // 60
+            secs = whole % 60
             self.timer_label.config(text=f"Timer: {hrs:02}:{mins:02}:{secs:02}")
-            self.root.after(1000, self.update_timer)
+            # Wake just after the next whole second instead of drifting by a fixed 1000 ms
+            self.tick_id = self.root.after(max(1000 - int(elapsed % 1 * 1000), 100), self.update_timer)
 
     def start_timer(self):
         if not self.selected_task:
             messagebox.showwarning("Warning", "Please select or enter a task first.")
             return
-        self.start_time = time.time()
+        self.start_time = time.monotonic()
         self.running = True
+        if self.tick_id is not None:
+            self.root.after_cancel(self.tick_id)  # a restart keeps one tick chain
         self.update_timer()
 
     def stop_timer(self):
@@ -169,7 +180,7 @@ class TaskTimerApp:
             messagebox.showwarning("Warning", "Timer not running.")
             return
         self.running = False
-        duration = int(time.time() - self.start_time)
+        duration = int(time.monotonic() - self.start_time)
         task = self.selected_task
         comment = self.comment_var.get().strip()
         save_session(task, comment, duration)
@@ -180,6 +191,7 @@ class TaskTimerApp:
         AllTasksWindow(self.root)
 
 # Run the app
-root = tk.Tk()
-app = TaskTimerApp(root)
-root.mainloop()
+if __name__ == '__main__':
+    root = tk.Tk()
+    app = TaskTimerApp(root)
+    root.mainloop()
@@ -1,70 +1,285 @@
 import tkinter as tk
 from tkinter import messagebox, simpledialog, ttk
-import time
-import csv
-from datetime import datetime, timedelta
+import argparse
 import os
-from collections import defaultdict
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from task_core import SessionJournal, TaskTimer, TimerEngine, format_elapsed, session_row
+from task_history import SessionWriter, StaleHistoryError, format_segments, get_store, get_totals, rename_task
+from task_metrics import PROFILE_MODES, metrics, timed
+from task_search import SearchIndex
 
 DATA_FILE = 'task_log.csv'
-
-# Save a session log
-def save_session(task, comment, duration_sec):
-    start_dt = datetime.fromtimestamp(app.start_time)
-    end_dt = start_dt + timedelta(seconds=duration_sec)
-    with open(DATA_FILE, 'a', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerow([start_dt.strftime("%Y-%m-%d"), start_dt.strftime("%H:%M:%S"),
-                         end_dt.strftime("%Y-%m-%d"), end_dt.strftime("%H:%M:%S"),
-                         task, comment, duration_sec])
+# Start/pause/resume events of the running session, replayed after a crash
+JOURNAL_FILE = DATA_FILE + '.journal'
+# Set TASK_TIMER_DB=task_log.db to keep sessions in SQLite instead of DATA_FILE
+# (import an existing log with: python task_sqlite.py import task_log.csv task_log.db)
+DB_FILE = os.environ.get('TASK_TIMER_DB')
+# Set TASK_TIMER_BINLOG=task_log.tlog to keep sessions in the binary log instead of DATA_FILE
+# (python task_binlog.py import task_log.csv task_log.tlog; `export` converts back)
+BINLOG_FILE = os.environ.get('TASK_TIMER_BINLOG')
+# Set TASK_TIMER_PARTITIONS=task_log to keep sessions in monthly partitions under that directory
+# (python task_partitions.py split task_log.csv task_log; `compress` gzips old months)
+PARTITION_DIR = os.environ.get('TASK_TIMER_PARTITIONS')
+# Set TASK_TIMER_SERVER=127.0.0.1:8765 (or unix:/path/to.sock) to run as a thin client of
+# `python task_server.py`, which then owns the log and the running timer
+SERVER = os.environ.get('TASK_TIMER_SERVER')
+# Set one of these at most; if several are set, every read and write uses the first of
+# SERVER, BINLOG_FILE, PARTITION_DIR, DB_FILE, in that order
+# Only the configured backends are imported, so a plain CSV launch skips asyncio, mmap, gzip and sqlite3
+if SERVER:
+    from task_server import ServerError, TimerClient
+else:
+    ServerError = OSError  # only a server client raises it; handlers catch both
+if BINLOG_FILE:
+    from task_binlog import get_binlog
+if PARTITION_DIR:
+    from task_partitions import get_partitions
+if DB_FILE:
+    from task_sqlite import get_db
+TIMER_ID = f"tk-{os.getpid()}"
+# Engine id of the journaled main timer; parallel timers get p1, p2, ...
+MAIN_TIMER = 'main'
+# Task buttons in the recent-tasks panel
+RECENT_TASKS = 3
+# Sessions inserted per expand / "more" click in the All Tasks tree
+SESSION_PAGE_SIZE = 200
+# Most sessions a search shows, and task names offered while typing
+SEARCH_LIMIT = 1000
+SUGGESTIONS = 5
+# Seconds between heartbeats in the journal; after a crash, time since the last one is offered, not assumed
+HEARTBEAT_SEC = 60
+# How often the Tk thread checks for finished background loads (ms)
+LOAD_POLL_MS = 50
+
+# Save a session log; parallel timers too (with a server, its stop saves the main timer's session)
+@timed('save_session')
+def save_session(task, comment, start_time, duration_sec, segments=None):
+    row = session_row(task, comment, start_time, duration_sec, segments)
+    # Written and indexed in one step, so a search index snapshot has the row or queues it, not both
+    with index_lock:
+        if SERVER:
+            get_client().save(task, comment, start_time, duration_sec, segments)
+        elif BINLOG_FILE:
+            end = segments[-1][0] + segments[-1][1] if segments else start_time + duration_sec
+            get_binlog(BINLOG_FILE).append(start_time, end, task, comment, duration_sec, segments)
+        elif PARTITION_DIR:
+            # Partition files are only read by PartitionedLog, so the segments can ride along as an eighth column
+            get_partitions(PARTITION_DIR).append(row + [format_segments(segments)] if segments else row)
+        elif DB_FILE:
+            get_db(DB_FILE).save(row[0], row[1], task, comment, duration_sec, row[2], row[3],
+                                 format_segments(segments) if segments else None)
+        else:
+            get_writer().write(row, segments)
+        index_row(row)
+
+# One open handle for all session rows; each row is flushed and fsynced, closed in on_close
+session_writer = None
+
+def get_writer():
+    global session_writer
+    if session_writer is None:
+        session_writer = SessionWriter(DATA_FILE, flush_every=1, fsync=True)
+    return session_writer
+
+def close_writer():
+    global session_writer
+    if session_writer is not None:
+        session_writer.close()
+        session_writer = None
+
+# The running session's journal, cleared once the session is saved
+session_journal = None
+
+def get_journal():
+    global session_journal
+    if session_journal is None:
+        session_journal = SessionJournal(JOURNAL_FILE)
+    return session_journal
+
+# Search index over task names and comments; built on first use, then kept current by save_session.
+# The loader thread builds it from a snapshot of the history (each task's session count); sessions
+# saved after the snapshot wait in index_backlog until the build is done, and a rename bumps
+# index_generation so a build under way starts over with the new names.
+search_index = None
+index_backlog = None
+index_generation = 0
+index_lock = threading.RLock()
+
+def get_search_index():
+    global search_index, index_backlog
+    if not (SERVER or BINLOG_FILE or PARTITION_DIR or DB_FILE):
+        get_store(DATA_FILE)  # the first load of the log, outside the lock save_session waits on
+    while True:
+        with index_lock:
+            if search_index is not None:
+                return search_index
+            generation = index_generation
+            history = read_task_history()
+            counts = {task: len(sessions) for task, sessions in history.items()}
+            index_backlog = []
+        index = SearchIndex.from_history({task: islice(history[task], count) for task, count in counts.items()})
+        with index_lock:
+            if generation == index_generation:
+                for parsed in index_backlog:
+                    index.add(parsed)
+                search_index, index_backlog = index, None
+                return index
+
+def index_row(row):
+    parsed = (row[0], row[1], row[4], row[5], row[6])
+    with index_lock:
+        if search_index is not None:
+            search_index.add(parsed)
+        elif index_backlog is not None:
+            index_backlog.append(parsed)
+
+def reset_search_index():
+    global search_index, index_backlog, index_generation
+    with index_lock:
+        search_index = index_backlog = None  # rebuilt on next use
+        index_generation += 1
+
+# One keep-alive connection to the timer server, shared by the Tk and loader threads
+timer_client = None
+
+def get_client():
+    global timer_client
+    if timer_client is None:
+        timer_client = TimerClient(SERVER)
+    return timer_client
 
 # Read all task history
+@timed('read_task_history')
 def read_task_history():
-    history = defaultdict(list)
-    if not os.path.exists(DATA_FILE):
-        return history
-    with open(DATA_FILE, newline='', encoding='utf-8') as f:
-        reader = csv.reader(f)
-        for row in reader:
-            if len(row) < 7:
-                continue
-            date, time_str, end_date, end_time, task, comment, duration = row
-            try:
-                duration = int(duration)
-                history[task].append((date, time_str, comment, duration))
-            except:
-                continue
-    return history
-
-# Get recent tasks for suggestion
+    if SERVER:
+        return get_client().history()
+    if BINLOG_FILE:
+        return get_binlog(BINLOG_FILE).history
+    if PARTITION_DIR:
+        return get_partitions(PARTITION_DIR).history()
+    if DB_FILE:
+        return get_db(DB_FILE).history()
+    return get_store(DATA_FILE).history
+
+# Total seconds per task
+def get_task_totals():
+    if SERVER:
+        return get_client().report()
+    if BINLOG_FILE:
+        return get_binlog(BINLOG_FILE).task_totals
+    if PARTITION_DIR:
+        return get_partitions(PARTITION_DIR).task_totals()
+    if DB_FILE:
+        return get_db(DB_FILE).task_totals()
+    return get_totals(DATA_FILE).task_totals
+
+# Recent tasks for suggestion as (task, total seconds, last comment); never builds the full history
+@timed('get_recent_tasks')
 def get_recent_tasks(n=3):
+    if SERVER:
+        return [tuple(recent) for recent in get_client().recent(n)]
+    if BINLOG_FILE:
+        binlog = get_binlog(BINLOG_FILE)
+        totals = binlog.task_totals
+        recent = [(task, binlog.history[task]) for task in binlog.recent_tasks(n)]
+        return [(task, totals.get(task, 0), sessions[-1][2] if sessions else "") for task, sessions in recent]
+    if PARTITION_DIR:
+        # Manifest totals plus one partition read per task, never the whole history
+        log = get_partitions(PARTITION_DIR)
+        totals = log.task_totals()
+        recent = [(task, log.last_session(task)) for task in log.recent_tasks(n)]
+        return [(task, totals.get(task, 0), last[3] if last else "") for task, last in recent]
+    if DB_FILE:
+        db = get_db(DB_FILE)
+        return [(task, db.task_total(task), db.last_comment(task)) for task in db.recent_tasks(n)]
+    return get_totals(DATA_FILE).recent(n)
+
+# Rename a task (recorded in the alias table; `python task_history.py compact` rewrites the CSV later)
+def rename_task_in_file(old_name, new_name):
+    if SERVER:
+        get_client().rename(old_name, new_name)
+    elif BINLOG_FILE:
+        get_binlog(BINLOG_FILE).rename_task(old_name, new_name)
+    elif PARTITION_DIR:
+        get_partitions(PARTITION_DIR).rename_task(old_name, new_name)
+    elif DB_FILE:
+        get_db(DB_FILE).rename_task(old_name, new_name)
+    else:
+        rename_task(DATA_FILE, old_name, new_name)
+    reset_search_index()  # with the new name on next use
+
+# The recent-tasks panel plus every task's total, so a stop can update the panel without a reread
+def load_recent_panel(n=RECENT_TASKS):
+    return get_recent_tasks(n), dict(get_task_totals())
+
+# History plus (task, total) pairs for the All Tasks tree
+def load_all_tasks():
     history = read_task_history()
-    sorted_tasks = sorted(history.items(), key=lambda item: max(
-        [datetime.strptime(d + " " + t, "%Y-%m-%d %H:%M:%S") for d, t, _, _ in item[1]]
-    ), reverse=True)
-    return sorted_tasks[:n]
+    totals = get_task_totals()
+    return history, [(task, totals.get(task, 0)) for task in list(history)]
 
-# Rename a task in the CSV file
-def rename_task_in_file(old_name, new_name):
-    if not os.path.exists(DATA_FILE):
-        return
-    rows = []
-    with open(DATA_FILE, newline='', encoding='utf-8') as f:
-        reader = csv.reader(f)
-        for row in reader:
-            if len(row) >= 5 and row[4] == old_name:
-                row[4] = new_name
-            rows.append(row)
-    with open(DATA_FILE, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerows
+# Runs history loading off the Tk thread; results come back through a queue polled with root.after.
+# A history it returns is a live view, but every read of it takes the store's lock.
+class BackgroundLoader:
+    def __init__(self, root):
+        self.root = root
+        # One worker: loads never race each other on the shared stores
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.results = queue.Queue()
+        self.pending = 0
+
+    def submit(self, load, on_done):
+        future = self.executor.submit(self.run, load)
+        future.add_done_callback(lambda f: self.results.put((on_done, f)))
+        self.pending += 1
+        if self.pending == 1:
+            self.root.after(LOAD_POLL_MS, self.poll)
+
+    @staticmethod
+    def run(load):
+        with metrics.capture(f"load:{load.__name__}"):
+            return load()
+
+    def poll(self):
+        while True:
+            try:
+                on_done, future = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.pending -= 1
+            try:
+                result = future.result()
+            except Exception as e:
+                messagebox.showerror("Error", f"Could not load task history: {e}")
+                continue
+            try:
+                on_done(result)
+            except tk.TclError:
+                pass  # the window waiting for this result was closed meanwhile
+        if self.pending:
+            self.root.after(LOAD_POLL_MS, self.poll)
 
 # Session Log window (Group by Task)
 class AllTasksWindow:
-    def __init__(self, parent):
+    @timed('AllTasksWindow')
+    def __init__(self, parent, loader):
         self.window = tk.Toplevel(parent)
         self.window.title("All Tasks")
-        self.history = read_task_history()
+        self.loader = loader
+        self.history = None
+        self.tasks = None
+        self.index = None
+        self.search_id = None  # pending debounced search
+
+        # Words match task names and comments as prefixes; from:/to: YYYY-MM-DD narrow the dates
+        self.search_var = tk.StringVar()
+        search_entry = tk.Entry(self.window, textvariable=self.search_var)
+        search_entry.pack(side="top", fill="x", padx=5, pady=5)
+        search_entry.bind("<KeyRelease>", lambda _: self.schedule_search())
 
         self.tree = ttk.Treeview(self.window, columns=("Total Time"), show="tree")
         self.tree.pack(side="left", fill="both", expand=True)
@@ -73,16 +288,112 @@ class AllTasksWindow:
         scrollbar.pack(side="right", fill="y")
         self.tree.configure(yscrollcommand=scrollbar.set)
 
-        for task, sessions in self.history.items():
-            total_sec = sum([s[3] for s in sessions])
-            parent_id = self.tree.insert("", "end", text=f"{task} ({total_sec//60} min)", open=False)
-            for date, time_str, comment, duration in sessions:
-                self.tree.insert(parent_id, "end", text=f"{date} {time_str} - {duration//60} min - {comment}")
+        self.task_nodes = {}  # task node -> (task name, sessions loaded so far)
+        self.more_nodes = {}  # "more sessions" node -> its task node
+        self.loading_id = self.tree.insert("", "end", text="Loading tasks...")
+        self.tree.bind("<<TreeviewOpen>>", self.on_open)
+        self.tree.bind("<<TreeviewSelect>>", self.on_select)
 
         self.rename_btn = tk.Button(self.window, text="Rename Task", command=self.rename_task)
         self.rename_btn.pack(pady=5)
 
+        loader.submit(load_all_tasks, self.show_tasks)
+        loader.submit(get_search_index, self.set_index)
+
+    # Treeview inserts for every task: the Tk-thread cost of opening the window (its loads are captured apart)
+    @metrics.capture('window_open')
+    def show_tasks(self, result):
+        self.history, self.tasks = result
+        self.tree.delete(self.loading_id)
+        if self.search_var.get().strip():
+            self.search()
+        else:
+            self.insert_tasks()
+
+    def set_index(self, index):
+        self.index = index
+        if self.search_var.get().strip():
+            self.search()
+
+    def schedule_search(self):
+        if self.search_id is not None:
+            self.window.after_cancel(self.search_id)
+        self.search_id = self.window.after(150, self.search)
+
+    @timed('AllTasksWindow.search')
+    def search(self):
+        self.search_id = None
+        if self.tasks is None:
+            return  # show_tasks searches once the history is in
+        query = self.search_var.get().strip()
+        if query and self.index is None:
+            return  # set_index searches once the index is built
+        self.tree.delete(*self.tree.get_children())
+        self.task_nodes.clear()
+        self.more_nodes.clear()
+        if not query:
+            self.insert_tasks()
+            return
+        matches = {}
+        for date, time_str, task, comment, duration in self.index.search(query, limit=SEARCH_LIMIT):
+            matches.setdefault(task, []).append((date, time_str, comment, duration))
+        if not matches:
+            self.tree.insert("", "end", text="No matching sessions")
+        for task, sessions in matches.items():
+            parent_id = self.tree.insert("", "end", text=f"{task} ({len(sessions)} matches)", open=True)
+            for date, time_str, comment, duration in sessions:
+                self.tree.insert(parent_id, "end", text=f"{date} {time_str} - {duration//60} min - {comment}")
+
+    def insert_tasks(self):
+        for task, total_sec in self.tasks:
+            parent_id = self.tree.insert("", "end", text=f"{task} ({total_sec//60} min)", open=False)
+            # Sessions are inserted on first expand; the placeholder makes the node expandable
+            self.tree.insert(parent_id, "end", text="Loading...")
+            self.task_nodes[parent_id] = (task, 0)
+
+    def on_open(self, _):
+        node = self.tree.focus()
+        if node in self.task_nodes and self.task_nodes[node][1] == 0:
+            self.tree.delete(*self.tree.get_children(node))
+            self.load_sessions(node)
+
+    def on_select(self, _):
+        for node in self.tree.selection():
+            parent_id = self.more_nodes.pop(node, None)
+            if parent_id:
+                self.tree.delete(node)
+                self.load_sessions(parent_id)
+
+    @timed('AllTasksWindow.load_sessions')
+    def load_sessions(self, parent_id):
+        task, loaded = self.task_nodes[parent_id]
+        try:
+            sessions = self.history[task]
+            page = sessions[loaded:loaded + SESSION_PAGE_SIZE]
+            total = len(sessions)
+        except StaleHistoryError:
+            # The log was reloaded (compacted or replaced) since this window read it
+            self.reload()
+            return
+        for date, time_str, comment, duration in page:
+            self.tree.insert(parent_id, "end", text=f"{date} {time_str} - {duration//60} min - {comment}")
+        loaded += len(page)
+        self.task_nodes[parent_id] = (task, loaded)
+        if loaded < total:
+            more_id = self.tree.insert(parent_id, "end", text=f"... {total - loaded} more sessions (click to load)")
+            self.more_nodes[more_id] = parent_id
+
+    def reload(self):
+        self.history = self.tasks = None
+        self.tree.delete(*self.tree.get_children())
+        self.task_nodes.clear()
+        self.more_nodes.clear()
+        self.loading_id = self.tree.insert("", "end", text="Loading tasks...")
+        self.loader.submit(load_all_tasks, self.show_tasks)
+
     def rename_task(self):
+        if self.history is None:
+            return
         selected = self.tree.selection()
         if not selected:
             messagebox.showwarning("Warning", "Please select a task to rename.")
@@ -102,11 +413,18 @@ class TaskTimerApp:
         self.root.title("Task Timer v5")
         self.task_var = tk.StringVar()
         self.comment_var = tk.StringVar()
-        self.start_time = None
-        self.running = False
-        self.paused = False
-        self.elapsed_before_pause = 0
+        # Monotonic durations. With a server, the server keeps the session.
+        self.timer = TaskTimer(journal=None if SERVER else get_journal())
+        # Every timer, main and parallel, shares one tick chain (update_timer) and one writer
+        self.engine = TimerEngine(save=save_session)
+        self.engine.add(MAIN_TIMER, self.timer)
+        self.parallel_rows = {}  # timer id -> (row frame, label, pause button)
+        self.parallel_count = 0
+        self.tick_id = None  # the single pending update_timer callback
+        self.tick_due = None  # when it should fire, for the lateness histogram
+        self.timer_text = None  # what both timer labels currently show
         self.selected_task = None
+        self.loader = BackgroundLoader(root)
 
         # Prevent closing window if task is running
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
@@ -114,30 +432,46 @@ class TaskTimerApp:
         # Always on top
         self.root.wm_attributes("-topmost", 1)
 
+        # Both layouts are built once; minimize_view / expand_view only swap which one is packed
+        self.full_frame = tk.Frame(root)
+        self.compact_frame = tk.Frame(root)
+        self.build_full_view(self.full_frame)
+        self.build_compact_view(self.compact_frame)
+        self.full_frame.pack(fill="both", expand=True)
+
+        # In-memory recent tasks and totals; stop_timer updates them without touching the log
+        self.recent = None
+        self.totals = None
+        self.recent_rows = []  # (button, comment label) per recent task, reconfigured in place
+        self.loader.submit(load_recent_panel, self.show_recent_tasks)
+
+    def build_full_view(self, frame):
         # Task selection area
-        tk.Label(root, text="Choose recent task or enter new one:", font=("Arial", 12, "bold")).pack()
-        self.task_frame = tk.Frame(root)
+        tk.Label(frame, text="Choose recent task or enter new one:", font=("Arial", 12, "bold")).pack()
+        self.task_frame = tk.Frame(frame)
         self.task_frame.pack(pady=5)
 
-        for task_name, sessions in get_recent_tasks():
-            total_time = sum([s[3] for s in sessions])
-            last_comment = sessions[-1][2] if sessions else ""
-            tk.Button(self.task_frame, text=f"{task_name:<20} {total_time//60} min", command=lambda name=task_name: self.select_task_and_enable(name)).pack(anchor="w")
-            tk.Label(self.task_frame, text=f"  ↪ {last_comment}", fg="gray", font=("Arial", 9)).pack(anchor="w", padx=20)
+        # Replaced by show_recent_tasks once the history has loaded in the background
+        self.recent_placeholder = tk.Label(self.task_frame, text="Loading recent tasks...", fg="gray")
+        self.recent_placeholder.pack(anchor="w")
 
-        tk.Label(root, text="Or enter new task name:").pack()
-        self.task_entry = tk.Entry(root, textvariable=self.task_var)
+        tk.Label(frame, text="Or enter new task name:").pack()
+        self.task_entry = tk.Entry(frame, textvariable=self.task_var)
         self.task_entry.pack()
-        self.task_entry.bind("<KeyRelease>", lambda _: self.set_selected_task())
+        self.task_entry.bind("<KeyRelease>", lambda _: self.on_task_typed())
+        # Type-ahead from the search index; packed under the entry only while it has entries
+        self.suggestion_list = tk.Listbox(frame, height=SUGGESTIONS, activestyle="none")
+        self.suggestion_list.bind("<<ListboxSelect>>", lambda _: self.pick_suggestion())
+        self.index_pending = False
 
-        tk.Label(root, text="Comment:").pack()
-        tk.Entry(root, textvariable=self.comment_var).pack()
+        tk.Label(frame, text="Comment:").pack()
+        tk.Entry(frame, textvariable=self.comment_var).pack()
 
-        self.timer_label = tk.Label(root, text="Timer: 00:00:00", font=("Courier", 16))
+        self.timer_label = tk.Label(frame, text="Timer: 00:00:00", font=("Courier", 16))
         self.timer_label.pack(pady=10)
 
         # Button Row: Start, Pause, Stop
-        btn_frame = tk.Frame(root)
+        btn_frame = tk.Frame(frame)
         btn_frame.pack()
         self.start_button = tk.Button(btn_frame, text="Start", command=self.start_timer, state="disabled")
         self.start_button.pack(side="left", padx=5)
@@ -145,19 +479,100 @@ class TaskTimerApp:
         self.pause_button.pack(side="left", padx=5)
         self.stop_button = tk.Button(btn_frame, text="Stop", command=self.stop_timer)
         self.stop_button.pack(side="left", padx=5)
+        tk.Button(btn_frame, text="+ Parallel", command=self.start_parallel_timer).pack(side="left", padx=5)
+
+        # One row per parallel timer, for overlapping activities
+        self.parallel_frame = tk.Frame(frame)
+        self.parallel_frame.pack(pady=5)
 
         # Bottom buttons: All tasks and Minimize
-        bottom_frame = tk.Frame(root)
+        bottom_frame = tk.Frame(frame)
         bottom_frame.pack(fill="x", side="bottom")
         self.all_tasks_button = tk.Button(bottom_frame, text="All tasks", command=self.show_all_tasks)
         self.all_tasks_button.pack(side="left", padx=5, pady=5)
         self.minimize_button = tk.Button(bottom_frame, text="Minimize", command=self.minimize_view)
         self.minimize_button.pack(side="right", padx=5, pady=5)
 
+    def build_compact_view(self, frame):
+        info_frame = tk.Frame(frame)
+        info_frame.pack()
+        self.compact_task_label = tk.Label(info_frame, font=("Arial", 10, "bold"), anchor="w")
+        self.compact_task_label.pack(side="left", padx=5)
+        self.compact_timer_label = tk.Label(info_frame, text="Timer: 00:00:00", font=("Courier", 12))
+        self.compact_timer_label.pack(side="right", padx=5)
+
+        btn_frame = tk.Frame(frame)
+        btn_frame.pack()
+        tk.Button(btn_frame, text="Start", command=self.start_timer).pack(side="left", padx=2)
+        tk.Button(btn_frame, text="Pause", command=self.pause_timer).pack(side="left", padx=2)
+        tk.Button(btn_frame, text="Stop", command=self.stop_timer).pack(side="left", padx=2)
+        tk.Button(btn_frame, text="Expand", command=self.expand_view).pack(side="left", padx=2)
+
+    def show_recent_tasks(self, result):
+        self.recent, self.totals = result
+        if self.recent_placeholder is not None:
+            self.recent_placeholder.destroy()
+            self.recent_placeholder = None
+        self.draw_recent_tasks()
+
+    def draw_recent_tasks(self):
+        # Reuses the existing rows; widgets are only created the first time a row is needed
+        while len(self.recent_rows) < len(self.recent):
+            button = tk.Button(self.task_frame)
+            button.pack(anchor="w")
+            comment = tk.Label(self.task_frame, fg="gray", font=("Arial", 9))
+            comment.pack(anchor="w", padx=20)
+            self.recent_rows.append((button, comment))
+        for (button, comment), (task_name, total_time, last_comment) in zip(self.recent_rows, self.recent):
+            button.config(text=f"{task_name:<20} {total_time//60} min", command=lambda name=task_name: self.select_task_and_enable(name))
+            comment.config(text=f"  ↪ {last_comment}")
+
+    def update_recent_tasks(self, task, comment, duration):
+        # The saved session moves its task to the top with the new total; nothing is reread
+        if self.recent is None:
+            # Still loading: the pending result may predate this session, so load again
+            self.loader.submit(load_recent_panel, self.show_recent_tasks)
+            return
+        self.totals[task] = self.totals.get(task, 0) + duration
+        others = [recent for recent in self.recent if recent[0] != task]
+        self.recent = [(task, self.totals[task], comment)] + others[:RECENT_TASKS - 1]
+        self.draw_recent_tasks()
+
     def set_selected_task(self):
         self.selected_task = self.task_var.get().strip()
         self.update_start_button()
 
+    def on_task_typed(self):
+        self.set_selected_task()
+        if search_index is None and not self.index_pending:
+            # Built in the background (again after a rename); suggestions appear once it is ready
+            self.index_pending = True
+            self.loader.submit(get_search_index, self.on_index_ready)
+        self.show_suggestions()
+
+    def on_index_ready(self, _):
+        self.index_pending = False
+        self.show_suggestions()
+
+    def show_suggestions(self):
+        text = self.task_var.get().strip()
+        names = search_index.suggest(text, SUGGESTIONS) if search_index is not None else []
+        if names == [text]:
+            names = []  # already typed in full
+        self.suggestion_list.delete(0, "end")
+        if names:
+            self.suggestion_list.insert("end", *names)
+            self.suggestion_list.config(height=len(names))
+            self.suggestion_list.pack(after=self.task_entry)
+        else:
+            self.suggestion_list.pack_forget()
+
+    def pick_suggestion(self):
+        selected = self.suggestion_list.curselection()
+        if selected:
+            self.select_task_and_enable(self.suggestion_list.get(selected[0]))
+            self.suggestion_list.pack_forget()
+
     def update_start_button(self):
         task_filled = self.task_var.get().strip() != ""
         self.start_button.config(state="normal" if task_filled else "disabled")
@@ -168,52 +583,186 @@ class TaskTimerApp:
         self.task_var.set(name)
         self.update_start_button()
 
+    @property
+    def running(self):
+        return self.timer.running
+
+    @property
+    def paused(self):
+        return self.timer.paused
+
+    def elapsed(self):
+        return self.timer.elapsed()
+
+    def show_timer_text(self, text):
+        # Skip the Tk redraw when the labels already show this text
+        if text != self.timer_text:
+            metrics.count('timer_label.redraw')
+            self.timer_label.config(text=text)
+            self.compact_timer_label.config(text=text)
+            self.timer_text = text
+
+    def draw_timer(self):
+        self.show_timer_text(f"Timer: {format_elapsed(self.elapsed())}")
+
+    @timed('update_timer')
     def update_timer(self):
-        if self.running and not self.paused:
-            elapsed = int(time.time() - self.start_time)
-            hrs = elapsed // 3600
-            mins = (elapsed % 3600) // 60
-            secs = elapsed % 60
-            self.timer_label.config(text=f"Timer: {hrs:02}:{mins:02}:{secs:02}")
-        self.root.after(1000, self.update_timer)
+        # The only tick chain, for every timer; wakes when the next timer reaches a whole second
+        if self.tick_id is not None and metrics.enabled:
+            metrics.observe('update_timer.late', time.perf_counter() - self.tick_due)
+        self.tick_id = None
+        changed, delay = self.engine.tick()
+        for timer_id, seconds in changed.items():
+            if timer_id == MAIN_TIMER:
+                self.show_timer_text(f"Timer: {format_elapsed(seconds)}")
+                self.timer.heartbeat(HEARTBEAT_SEC)
+            else:
+                _, label, _ = self.parallel_rows[timer_id]
+                label.config(text=f"{self.engine.timers[timer_id].task:<20} {format_elapsed(seconds)}")
+        if delay is not None:
+            self.tick_id = self.root.after(delay, self.update_timer)
+            self.tick_due = time.perf_counter() + delay / 1000
+
+    def restart_ticks(self, timer_id=MAIN_TIMER):
+        # Redraw ``timer_id`` now and reschedule the chain for whatever is still counting
+        self.stop_ticks()
+        self.engine.redraw(timer_id)
+        self.update_timer()
+
+    def stop_ticks(self):
+        if self.tick_id is not None:
+            self.root.after_cancel(self.tick_id)
+            self.tick_id = None
+
+    def call_server(self, action, *args):
+        # The server owns the running session; the local timer only drives the display
+        try:
+            return getattr(get_client(), action)(TIMER_ID, *args)
+        except (ServerError, OSError) as e:
+            messagebox.showerror("Error", f"Timer server: {e}")
+            return None
 
     def start_timer(self):
         if not self.selected_task:
             messagebox.showwarning("Warning", "Please select or enter a task first.")
             return
-        self.start_time = time.time()
-        self.running = True
-        self.paused = False
-        self.update_timer()
+        if SERVER and self.call_server('start', self.selected_task, self.comment_var.get().strip()) is None:
+            return
+        self.timer.start(self.selected_task, self.comment_var.get().strip())
+        self.restart_ticks()
 
     def pause_timer(self):
         if not self.running:
             messagebox.showwarning("Warning", "Timer is not running.")
             return
 
+        if SERVER and self.call_server('resume' if self.paused else 'pause') is None:
+            return
         if not self.paused:
-            self.paused = True
-            self.elapsed_before_pause = int(time.time() - self.start_time)
+            self.timer.pause()
+            self.restart_ticks()
             self.pause_button.config(text="Resume")
         else:
-            self.paused = False
-            self.start_time = time.time() - self.elapsed_before_pause
+            self.timer.resume()
+            self.restart_ticks()
             self.pause_button.config(text="Pause")
 
     def stop_timer(self):
         if not self.running:
             messagebox.showwarning("Warning", "Timer not running.")
             return
-        self.running = False
-        duration = int(time.time() - self.start_time)
-        task = self.selected_task
-        comment = self.comment_var.get().strip()
-        save_session(task, comment, duration)
-        self.timer_label.config(text=f"Last session: {duration} sec")
+        if SERVER:
+            with index_lock:  # the server saves the session; indexed in the same step, as in save_session
+                saved = self.call_server('stop', self.comment_var.get().strip())
+                if saved is not None:
+                    index_row(session_row(saved['task'], saved['comment'], saved['start_time'], saved['duration']))
+            if saved is None:
+                return
+            self.timer.stop()
+            self.restart_ticks()
+            task, comment, duration = saved['task'], saved['comment'], saved['duration']
+        else:
+            _, _, start_time, duration = self.timer.stop()
+            self.restart_ticks()
+            task = self.selected_task
+            comment = self.comment_var.get().strip()
+            save_session(task, comment, start_time, duration, self.timer.segments)
+            get_journal().clear()
+        self.show_timer_text(f"Last session: {duration} sec")
+        self.update_recent_tasks(task, comment, duration)
         messagebox.showinfo("Saved", f"Task '{task}' saved with {duration} sec.")
 
+    def start_parallel_timer(self):
+        task = self.task_var.get().strip()
+        if not task:
+            messagebox.showwarning("Warning", "Please select or enter a task first.")
+            return
+        self.parallel_count += 1
+        timer_id = f"p{self.parallel_count}"
+        self.engine.start(timer_id, task, self.comment_var.get().strip())
+        row = tk.Frame(self.parallel_frame)
+        row.pack(anchor="w")
+        label = tk.Label(row, font=("Courier", 11))
+        label.pack(side="left", padx=5)
+        pause = tk.Button(row, text="Pause", command=lambda: self.pause_parallel_timer(timer_id))
+        pause.pack(side="left", padx=2)
+        tk.Button(row, text="Stop", command=lambda: self.stop_parallel_timer(timer_id)).pack(side="left", padx=2)
+        self.parallel_rows[timer_id] = (row, label, pause)
+        self.restart_ticks(timer_id)
+
+    def pause_parallel_timer(self, timer_id):
+        timer = self.engine.timers[timer_id]
+        if timer.paused:
+            self.engine.resume(timer_id)
+            self.parallel_rows[timer_id][2].config(text="Pause")
+        else:
+            self.engine.pause(timer_id)
+            self.parallel_rows[timer_id][2].config(text="Resume")
+        self.restart_ticks(timer_id)
+
+    def stop_parallel_timer(self, timer_id):
+        try:
+            task, comment, _, duration = self.engine.stop(timer_id)
+        except (ServerError, OSError) as e:
+            messagebox.showerror("Error", f"Could not save the session: {e}")
+            return
+        self.parallel_rows.pop(timer_id)[0].destroy()
+        self.restart_ticks(None)
+        self.update_recent_tasks(task, comment, duration)
+
+    def recover_session(self):
+        # A session left in the journal was still running when the app crashed or was killed
+        if SERVER:
+            return
+        downtime = get_journal().downtime()
+        count_downtime = downtime >= 1 and messagebox.askyesno(
+            "Unfinished session",
+            f"The app stopped {format_elapsed(downtime)} ago while a session was running.\n\n"
+            "Count that time as part of the session?")
+        timer = get_journal().recover(count_downtime=count_downtime)
+        if timer is None:
+            return
+        answer = messagebox.askyesnocancel(
+            "Unfinished session",
+            f"'{timer.task}' was still {'paused' if timer.paused else 'running'} "
+            f"({format_elapsed(timer.elapsed())}) when the app last closed.\n\n"
+            "Yes: resume it\nNo: stop and save it\nCancel: discard it")
+        if answer is None:
+            get_journal().clear()
+            return
+        self.timer = self.engine.add(MAIN_TIMER, timer)
+        self.select_task(timer.task)
+        self.comment_var.set(timer.comment)
+        if not answer:
+            self.stop_timer()
+        elif timer.paused:
+            self.pause_button.config(text="Resume")
+            self.draw_timer()
+        else:
+            self.restart_ticks()
+
     def show_all_tasks(self):
-        AllTasksWindow(self.root)
+        AllTasksWindow(self.root, self.loader)
 
     def minimize_view(self):
         self.root.geometry("360x60")
@@ -222,64 +771,32 @@ class TaskTimerApp:
         self.root.attributes("-topmost", True)
 
         # Cho phép kéo cửa sổ thu nhỏ
-        def start_move(event):
-            self._x = event.x
-            self._y = event.y
-
-        def do_move(event):
-            x = self.root.winfo_pointerx() - self._x
-            y = self.root.winfo_pointery() - self._y
-            self.root.geometry(f"+{x}+{y}")
+        self.root.bind('<Button-1>', self.start_move)
+        self.root.bind('<B1-Motion>', self.do_move)
 
-        self.root.bind('<Button-1>', start_move)
-        self.root.bind('<B1-Motion>', do_move)
+        self.full_frame.pack_forget()
+        self.compact_task_label.config(text=self.selected_task or "")
+        self.compact_frame.pack()
 
-        for widget in self.root.winfo_children():
-            widget.pack_forget()
+    def start_move(self, event):
+        self._x = event.x
+        self._y = event.y
 
-        info_frame = tk.Frame(self.root)
-        info_frame.pack()
-        tk.Label(info_frame, text=self.selected_task, font=("Arial", 10, "bold"), anchor="w").pack(side="left", padx=5)
-        self.timer_label = tk.Label(info_frame, text="Timer: 00:00:00", font=("Courier", 12))
-        self.timer_label.pack(side="right", padx=5)
-
-        btn_frame = tk.Frame(self.root)
-        btn_frame.pack()
-        tk.Button(btn_frame, text="Start", command=self.start_timer).pack(side="left", padx=2)
-        tk.Button(btn_frame, text="Pause", command=self.pause_timer).pack(side="left", padx=2)
-        tk.Button(btn_frame, text="Stop", command=self.stop_timer).pack(side="left", padx=2)
-        tk.Button(btn_frame, text="Expand", command=self.expand_view).pack(side="left", padx=2)
+    def do_move(self, event):
+        x = self.root.winfo_pointerx() - self._x
+        y = self.root.winfo_pointery() - self._y
+        self.root.geometry(f"+{x}+{y}")
 
     def expand_view(self):
+        self.root.unbind('<Button-1>')
+        self.root.unbind('<B1-Motion>')
         self.root.overrideredirect(False)
+        self.root.configure(highlightthickness=0)
         self.root.geometry("600x400")  # Phóng to như khi khởi động app
 
-        # Khôi phục toàn bộ giao diện không mất session đang chạy
-        for widget in self.root.winfo_children():
-            widget.destroy()
-
-        # Lưu trạng thái session cũ
-        old_state = {
-            'selected_task': self.selected_task,
-            'comment': self.comment_var.get(),
-            'running': self.running,
-            'paused': self.paused,
-            'start_time': self.start_time
-        }
-
-        self.__init__(self.root)
-
-        # Phục hồi session đang chạy (nếu có)
-        self.selected_task = old_state['selected_task']
-        self.task_var.set(old_state['selected_task'])
-        self.comment_var.set(old_state['comment'])
-        self.running = old_state['running']
-        self.paused = old_state['paused']
-        self.start_time = old_state['start_time']
-
-        if self.running:
-            self.update_timer()
-            self.timer_label.config(text="Resumed...")
+        # The running session, entries and timer label are untouched; only the layout changes
+        self.compact_frame.pack_forget()
+        self.full_frame.pack(fill="both", expand=True)
 
     def select_task_and_enable(self, name):
         self.selected_task = name
@@ -287,12 +804,29 @@ class TaskTimerApp:
         self.update_start_button()
 
     def on_close(self):
-        if self.running:
+        if self.engine.running():
             messagebox.showwarning("Stop Timer", "Please stop the timer before closing the app.")
         else:
+            close_writer()
+            if BINLOG_FILE:
+                get_binlog(BINLOG_FILE).close()
+            if session_journal is not None:
+                session_journal.close()
+            if timer_client is not None:
+                timer_client.close()
             self.root.destroy()
 
 # Run the app
-root = tk.Tk()
-app = TaskTimerApp(root)
-root.mainloop()
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Task timer.")
+    parser.add_argument('--metrics', metavar='FILE',
+                        help="write counters and latency histograms here on exit (or TASK_TIMER_METRICS)")
+    parser.add_argument('--profile', choices=PROFILE_MODES,
+                        help="also profile startup and window opens (or TASK_TIMER_PROFILE)")
+    args = parser.parse_args()
+    metrics.configure(args.metrics, args.profile)
+    root = tk.Tk()
+    with metrics.capture('startup'):
+        app = TaskTimerApp(root)
+    app.recover_session()
+    root.mainloop()
@@ -1,31 +1,22 @@
 import tkinter as tk
 from tkinter import messagebox
 import time
-import csv
 from datetime import datetime
 import os
+from task_history import append_row, get_totals
 
 DATA_FILE = 'task_log.csv'
 
 def save_session(task, comment, duration_sec):
     date = datetime.now().strftime("%Y-%m-%d")
     time_str = datetime.now().strftime("%H:%M:%S")
-    with open(DATA_FILE, 'a', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow([date, time_str, task, comment, duration_sec])
+    append_row(DATA_FILE, [date, time_str, task, comment, duration_sec])
 
 def summarize_time():
     if not os.path.exists(DATA_FILE):
         return "No records yet."
-    summary = {}
-    with open(DATA_FILE, newline='') as f:
-        reader = csv.reader(f)
-        for row in reader:
-            date, _, _, _, duration = row
-            duration = int(duration)
-            summary[date] = summary.get(date, 0) + duration
     result = "Total time by date:\n"
-    for date, total_sec in summary.items():
+    for date, total_sec in get_totals(DATA_FILE).day_totals.items():
         mins = total_sec // 60
         result += f"{date}: {mins} minutes\n"
     return result
@@ -73,6 +64,7 @@ class TaskTimerApp:
         self.timer_label.config(text=f"Session lasted {duration} seconds.")
         self.summary_label.config(text=summarize_time())
 
-root = tk.Tk()
-app = TaskTimerApp(root)
-root.mainloop()
+if __name__ == '__main__':
+    root = tk.Tk()
+    app = TaskTimerApp(root)
+    root.mainloop()
@@ -0,0 +1,447 @@
+"""Optional binary task log: fixed-size records plus a string table.
+
+CSV parsing (``csv.reader`` and ``int()`` per row) bounds how fast history
+loads.  ``BinaryLog`` keeps each session as one 32-byte record in
+``<name>.tlog``:
+
+    start epoch (int64), end epoch (int64), task id (uint32),
+    comment offset (uint32), duration (int64)
+
+Task names and comments are stored once each in ``<name>.tlog.str`` and
+records refer to them by task id and byte offset.  A rename is one more
+string table entry, and so are a session's active segments, tied to its
+record number and written after the record.  Reads map both files with
+``mmap`` and decode records with ``struct.iter_unpack`` over a
+``memoryview``: nothing is parsed or copied, and a refresh only indexes the
+records appended since the last one, re-mapping a file (and closing the old
+map) only when it grew.
+
+One process writes at a time; readers may be many.  A
+record or string torn by a crash mid-write is ignored by readers and cut
+off by the next writer.
+
+    python task_binlog.py import task_log.csv task_log.tlog
+    python task_binlog.py export task_log.tlog task_log.csv
+"""
+import csv
+import heapq
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from datetime import datetime
+
+from task_history import (HistoryView, format_segments, log_header, parse_row_any, parse_segments,
+                          read_rows, read_segments, segments_path, stamp_key, write_segments)
+
+RECORD = struct.Struct('<qqIIq')
+RECORD_SIZE = RECORD.size
+# The record file starts with one record-sized header: magic, then zeros
+RECORD_MAGIC = b'TTLOG\x00\x00\x01'
+HEADER_SIZE = RECORD_SIZE
+STRING_MAGIC = b'TTSTR\x00\x00\x01'
+# String table entries: kind (uint8), payload length (uint32), payload
+ENTRY = struct.Struct('<BI')
+TASK, COMMENT, RENAME, SEGMENTS = 0, 1, 2, 3
+RENAME_ID = struct.Struct('<I')
+SEGMENTS_ROW = struct.Struct('<Q')
+
+
+def _epoch(date, time_str):
+    s = stamp_key(date, time_str)
+    return int(datetime(s // 10 ** 10, s // 10 ** 8 % 100, s // 10 ** 6 % 100,
+                        s // 10 ** 4 % 100, s // 100 % 100, s % 100).timestamp())
+
+
+def _date_time(epoch):
+    local = time.localtime(epoch)
+    return time.strftime("%Y-%m-%d", local), time.strftime("%H:%M:%S", local)
+
+
+def _map(path, magic):
+    """Read-only map of ``path`` (None while it only has its header)."""
+    with open(path, 'rb') as f:
+        if f.read(len(magic)) != magic:
+            raise ValueError(f"{path} is not a task binary log")
+        if os.fstat(f.fileno()).st_size <= len(magic):
+            return None
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class BinaryLog:
+    """Sessions of one binary log, refreshed incrementally; also its writer.
+
+    Exposes the same ``history`` view, ``task_totals`` and ``recent_tasks``
+    as ``HistoryStore``/``TotalsStore`` do for a CSV log.
+    """
+
+    def __init__(self, path, fsync=False):
+        self.path = path
+        self.strings_path = path + '.str'
+        self.fsync = fsync
+        self._lock = threading.RLock()
+        self._rec_f = None
+        self._str_f = None
+        self.generation = 0  # bumped when rows move between tasks; retires history views
+        self._reset()
+
+    def _reset(self):
+        for mm in (getattr(self, '_rec_map', None), getattr(self, '_str_map', None)):
+            if mm is not None:
+                mm.close()
+        self._identity = None
+        self._records = 0
+        self._str_size = len(STRING_MAGIC)
+        self._rec_map = None
+        self._str_map = None
+        self._canon = []  # task id in the file -> index below (renames can merge tasks)
+        self._tasks = []
+        self._task_ids = {}
+        self._task_rows = []
+        self._totals = []
+        self._last = []  # latest start epoch per task
+        self._comments = {}  # string table offset -> comment
+        self._segments = {}  # record number -> format_segments text
+        self.generation += 1
+        self.history = HistoryView(self)
+
+    # Reading
+
+    def refresh(self):
+        """Index records appended since the last call; returns True if anything changed."""
+        with self._lock:
+            try:
+                # Records first: every string they refer to is then already in the table
+                st = os.stat(self.path)
+                st_str = os.stat(self.strings_path)
+            except FileNotFoundError:
+                changed = self._identity is not None
+                self._reset()
+                return changed
+            identity = (st.st_dev, st.st_ino, st_str.st_ino)
+            if identity != self._identity:
+                self._reset()
+                self._identity = identity
+            changed = False
+            if st_str.st_size > self._str_size:
+                self._remap('_str_map', self.strings_path, STRING_MAGIC)
+                changed = self._read_strings(st_str.st_size)
+            count = max(0, (st.st_size - HEADER_SIZE) // RECORD_SIZE)
+            if count > self._records:
+                self._remap('_rec_map', self.path, RECORD_MAGIC)
+                self._read_records(count)
+                changed = True
+            return changed
+
+    def _remap(self, attr, path, magic):
+        # A map cannot grow with its file: map again and close the old one (views read under the lock)
+        old = getattr(self, attr)
+        setattr(self, attr, _map(path, magic))
+        if old is not None:
+            old.close()
+
+    def _read_strings(self, size):
+        mm = self._str_map
+        pos = start = self._str_size
+        while pos + ENTRY.size <= size:
+            kind, length = ENTRY.unpack_from(mm, pos)
+            end = pos + ENTRY.size + length
+            if end > size:
+                break  # torn by a crash, or still being written
+            payload = mm[pos + ENTRY.size:end]
+            if kind == TASK:
+                self._add_task(payload.decode('utf-8'))
+            elif kind == COMMENT:
+                self._comments[pos] = payload.decode('utf-8')
+            elif kind == RENAME:
+                self._rename(RENAME_ID.unpack_from(payload)[0],
+                             payload[RENAME_ID.size:].decode('utf-8'))
+            elif kind == SEGMENTS:
+                self._segments[SEGMENTS_ROW.unpack_from(payload)[0]] = \
+                    payload[SEGMENTS_ROW.size:].decode('utf-8')
+            pos = end
+        self._str_size = pos
+        return pos > start
+
+    def _add_task(self, name):
+        index = self._task_ids.get(name)
+        if index is None:
+            index = self._task_ids[name] = len(self._tasks)
+            self._tasks.append(name)
+            self._task_rows.append(array('q'))
+            self._totals.append(0)
+            self._last.append(-1)
+        self._canon.append(index)
+
+    def _rename(self, task_id, new_name):
+        index = self._canon[task_id]
+        other = self._task_ids.get(new_name)
+        del self._task_ids[self._tasks[index]]
+        if other is None or other == index:
+            self._tasks[index] = new_name
+            self._task_ids[new_name] = index
+            return
+        # Renamed onto an existing task: one task, at the earlier first-seen position
+        keep, drop = min(index, other), max(index, other)
+        self._task_rows[keep] = array('q', sorted(self._task_rows[keep] + self._task_rows[drop]))
+        self._totals[keep] += self._totals[drop]
+        self._last[keep] = max(self._last[keep], self._last[drop])
+        for column in (self._tasks, self._task_rows, self._totals, self._last):
+            del column[drop]
+        self._tasks[keep] = new_name
+        self._task_ids = {name: i for i, name in enumerate(self._tasks)}
+        self._canon = [keep if i == drop else i - (i > drop) for i in self._canon]
+        self.generation += 1
+        self.history = HistoryView(self)
+
+    def _read_records(self, count):
+        canon, rows, totals, last = self._canon, self._task_rows, self._totals, self._last
+        row = self._records
+        with memoryview(self._rec_map) as view:
+            new = view[HEADER_SIZE + row * RECORD_SIZE:HEADER_SIZE + count * RECORD_SIZE]
+            for start, _, task_id, _, duration in RECORD.iter_unpack(new):
+                task = canon[task_id]
+                rows[task].append(row)
+                totals[task] += duration
+                if start > last[task]:
+                    last[task] = start
+                row += 1
+            new.release()
+        self._records = count
+
+    def record(self, row):
+        """Raw ``(start, end, task id, comment offset, duration)`` of one record."""
+        return RECORD.unpack_from(self._rec_map, HEADER_SIZE + row * RECORD_SIZE)
+
+    def session(self, row):
+        """The ``(date, time, comment, duration)`` tuple of one record."""
+        start, _, _, comment, duration = self.record(row)
+        date, time_str = _date_time(start)
+        return date, time_str, self._comments[comment], duration
+
+    def count(self, task_id):
+        """Number of sessions of one task (``HistoryView`` reads through this and ``sessions``)."""
+        return len(self._task_rows[task_id])
+
+    def sessions(self, task_id, rows=None):
+        """One task's ``(date, time, comment, duration)`` tuples, or those of a slice of them."""
+        task_rows = self._task_rows[task_id]
+        return [self.session(row) for row in (task_rows if rows is None else task_rows[rows])]
+
+    def segments(self, row):
+        """``[(start, seconds)]`` active segments of one record ([] if none were stored)."""
+        return parse_segments(self._segments.get(row, ""))
+
+    @property
+    def task_totals(self):
+        return dict(zip(self._tasks, self._totals))
+
+    def recent_tasks(self, n=3):
+        """Names of the ``n`` most recently used tasks, newest first; ties keep first-seen order."""
+        return [self._tasks[i] for i in heapq.nlargest(n, range(len(self._tasks)),
+                                                       key=self._last.__getitem__)]
+
+    # Writing
+
+    def _open_writer(self):
+        if self._rec_f is not None:
+            return
+        for path, magic in ((self.path, RECORD_MAGIC.ljust(HEADER_SIZE, b'\x00')),
+                            (self.strings_path, STRING_MAGIC)):
+            if not os.path.exists(path) or not os.path.getsize(path):
+                with open(path, 'wb') as f:
+                    f.write(magic)
+        self._reset()
+        self.refresh()
+        # Cut off whatever a crashed writer left half-written
+        self._rec_f = open(self.path, 'r+b')
+        self._rec_f.truncate(HEADER_SIZE + self._records * RECORD_SIZE)
+        self._rec_f.seek(0, os.SEEK_END)
+        self._str_f = open(self.strings_path, 'r+b')
+        self._str_f.truncate(self._str_size)
+        self._str_f.seek(0, os.SEEK_END)
+        # Writer-side lookups: name -> task id in the file, comment -> offset
+        self._write_ids = {}
+        for task_id, index in enumerate(self._canon):
+            self._write_ids[self._tasks[index]] = task_id
+        self._write_comments = {text: offset for offset, text in self._comments.items()}
+        self._next_id = len(self._canon)
+
+    def _string(self, kind, payload):
+        offset = self._str_f.tell()
+        self._str_f.write(ENTRY.pack(kind, len(payload)) + payload)
+        return offset
+
+    def _write(self, start, end, task, comment, duration):
+        task_id = self._write_ids.get(task)
+        if task_id is None:
+            self._string(TASK, task.encode('utf-8'))
+            task_id = self._write_ids[task] = self._next_id
+            self._next_id += 1
+        offset = self._write_comments.get(comment)
+        if offset is None:
+            offset = self._write_comments[comment] = self._string(COMMENT, comment.encode('utf-8'))
+        return RECORD.pack(int(start), int(end), task_id, offset, duration)
+
+    def _commit(self, records):
+        # Strings reach the file before the records that refer to them
+        self._str_f.flush()
+        if self.fsync:
+            os.fsync(self._str_f.fileno())
+        self._rec_f.write(records)
+        self._rec_f.flush()
+        if self.fsync:
+            os.fsync(self._rec_f.fileno())
+
+    def _commit_segments(self, entries):
+        # After their records: a crash in between loses the segments, never attaches them to
+        # a record a later writer puts at the same number
+        if not entries:
+            return
+        for row, text in entries:
+            self._string(SEGMENTS, SEGMENTS_ROW.pack(row) + text.encode('utf-8'))
+        self._str_f.flush()
+        if self.fsync:
+            os.fsync(self._str_f.fileno())
+
+    def append(self, start, end, task, comment, duration, segments=None):
+        """Append one session; ``start``/``end`` are epoch seconds, ``segments`` ``TaskTimer.segments``."""
+        with self._lock:
+            self._open_writer()
+            row = self._records
+            self._commit(self._write(start, end, task, comment, duration))
+            if segments:
+                self._commit_segments([(row, format_segments(segments))])
+            self.refresh()
+
+    def rename_task(self, old_name, new_name):
+        with self._lock:
+            self._open_writer()
+            task_id = self._write_ids.pop(old_name, None)
+            if task_id is None:
+                return
+            self._string(RENAME, RENAME_ID.pack(task_id) + new_name.encode('utf-8'))
+            self._write_ids.setdefault(new_name, task_id)
+            self._commit(b'')
+            self.refresh()
+
+    def close(self):
+        with self._lock:
+            for f in (self._rec_f, self._str_f):
+                if f is not None:
+                    f.close()
+            self._rec_f = self._str_f = None
+
+    # CSV
+
+    def import_csv(self, csv_path, encoding='utf-8', batch=10000):
+        """Append every session of a CSV log (either layout); returns (imported, skipped).
+
+        Renames still pending in the log's alias table are applied.
+        Segments come from the log's ``.segments`` sidecar (or an eighth
+        column).  Rows whose timestamps do not parse cannot be stored as
+        epochs and are skipped.
+        """
+        imported = skipped = 0
+        recorded = read_segments(csv_path)
+        with self._lock:
+            self._open_writer()
+            pending = []
+            pending_segments = []
+            for row in read_rows(csv_path, encoding):
+                parsed = parse_row_any(row)
+                if parsed is None:
+                    continue
+                date, time_str, task, comment, duration = parsed
+                try:
+                    start = _epoch(date, time_str)
+                    try:
+                        end = _epoch(row[2], row[3]) if len(row) >= 7 else start + duration
+                    except ValueError:
+                        end = start + duration
+                    pending.append(self._write(start, end, task, comment, duration))
+                except (ValueError, OverflowError, struct.error):
+                    skipped += 1
+                    continue
+                text = row[7] if len(row) >= 8 else None
+                if text is None and (date, time_str, duration) in recorded:
+                    text = format_segments(recorded[date, time_str, duration])
+                if text:
+                    pending_segments.append((self._records + imported, text))
+                imported += 1
+                if len(pending) >= batch:
+                    self._commit(b''.join(pending))
+                    self._commit_segments(pending_segments)
+                    pending.clear()
+                    pending_segments.clear()
+            self._commit(b''.join(pending))
+            self._commit_segments(pending_segments)
+            self.refresh()
+        return imported, skipped
+
+    def export_csv(self, csv_path, encoding='utf-8'):
+        """Write every session as a v4 (7-column) CSV log; returns the row count.
+
+        Stored segments go to the CSV's ``.segments`` sidecar.
+        """
+        with self._lock:
+            self.refresh()
+            count = self._records
+            try:
+                os.remove(segments_path(csv_path))  # it belonged to whatever csv_path held before
+            except FileNotFoundError:
+                pass
+            with open(csv_path, 'w', newline='', encoding=encoding) as f:
+                f.write(log_header('v4'))
+                writer = csv.writer(f)
+                if not count:
+                    return 0
+                segments = []
+                with memoryview(self._rec_map) as view:
+                    records = view[HEADER_SIZE:HEADER_SIZE + count * RECORD_SIZE]
+                    for row, (start, end, task_id, comment, duration) in enumerate(
+                            RECORD.iter_unpack(records)):
+                        fields = _date_time(start) + _date_time(end) + (
+                            self._tasks[self._canon[task_id]], self._comments[comment], duration)
+                        writer.writerow(fields)
+                        if row in self._segments:
+                            segments.append((fields, self.segments(row)))
+                    records.release()
+            if segments:
+                write_segments(csv_path, segments)
+        return count
+
+
+_logs = {}
+_lock = threading.Lock()
+
+
+def get_binlog(path):
+    """Return the process-wide ``BinaryLog`` for ``path``, refreshed against the files."""
+    key = os.path.abspath(path)
+    with _lock:
+        log = _logs.get(key)
+        if log is None:
+            log = _logs[key] = BinaryLog(path)
+    log.refresh()
+    return log
+
+
+def main(argv):
+    if len(argv) != 3 or argv[0] not in ('import', 'export'):
+        print("usage: python task_binlog.py import LOG.csv LOG.tlog | export LOG.tlog LOG.csv")
+        return 2
+    if argv[0] == 'import':
+        imported, skipped = get_binlog(argv[2]).import_csv(argv[1])
+        print(f"imported {imported} sessions into {argv[2]}"
+              + (f" ({skipped} with unparseable timestamps skipped)" if skipped else ""))
+    else:
+        print(f"exported {get_binlog(argv[1]).export_csv(argv[2])} sessions to {argv[2]}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,147 @@
+"""Drive the task timer from a terminal, without Tk.
+
+The running timer lives in ``<log>.timer`` (JSON), so each command is a
+short-lived process and a session can be started on one shell and stopped
+from another.  Finished sessions are appended to the log in the v4
+(7-column) layout, exactly as the Tk app writes them.
+
+    python -m task_cli start "Write report" -c "first draft"
+    python -m task_cli pause        # again, or `resume`, to continue
+    python -m task_cli status
+    python -m task_cli stop
+    python -m task_cli report --by day
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from task_core import TaskTimer, format_elapsed, save_session
+
+# task_history.LAYOUTS; task_history itself is only imported by the commands that read the log
+LAYOUT_NAMES = ['any', 'v1', 'v4']
+
+
+def state_path(log):
+    return log + ".timer"
+
+
+def load_timer(log):
+    """The persisted timer for ``log``, or None when none is running."""
+    try:
+        with open(state_path(log), encoding='utf-8') as f:
+            return TaskTimer.from_dict(json.load(f))
+    except FileNotFoundError:
+        return None
+
+
+def store_timer(log, timer):
+    path = state_path(log)
+    tmp = path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(timer.to_dict(), f)
+    os.replace(tmp, path)
+
+
+def clear_timer(log):
+    try:
+        os.remove(state_path(log))
+    except FileNotFoundError:
+        pass
+
+
+def describe(timer):
+    state = "paused" if timer.paused else "running"
+    text = f"{timer.task}: {format_elapsed(timer.elapsed())} ({state})"
+    if timer.comment:
+        text += f" - {timer.comment}"
+    return text
+
+
+def cmd_start(args):
+    timer = load_timer(args.log)
+    if timer is not None:
+        print(f"Already timing {describe(timer)}; stop it first.", file=sys.stderr)
+        return 1
+    # Wall clock: the timer has to survive between processes
+    timer = TaskTimer(clock=time.time)
+    timer.start(args.task, args.comment)
+    store_timer(args.log, timer)
+    print(f"Started {args.task}")
+    return 0
+
+
+def cmd_pause(args, resume=None):
+    timer = load_timer(args.log)
+    if timer is None:
+        print("Timer is not running.", file=sys.stderr)
+        return 1
+    if resume is None:
+        resume = timer.paused
+    if resume:
+        timer.resume()
+    else:
+        timer.pause()
+    store_timer(args.log, timer)
+    print(describe(timer))
+    return 0
+
+
+def cmd_resume(args):
+    return cmd_pause(args, resume=True)
+
+
+def cmd_stop(args):
+    timer = load_timer(args.log)
+    if timer is None:
+        print("Timer not running.", file=sys.stderr)
+        return 1
+    task, comment, start_time, duration = timer.stop()
+    save_session(args.log, task, comment, start_time, duration, timer.segments)
+    clear_timer(args.log)
+    print(f"Task '{task}' saved with {duration} sec.")
+    return 0
+
+
+def cmd_status(args):
+    timer = load_timer(args.log)
+    print(describe(timer) if timer is not None else "No timer running.")
+    return 0
+
+
+def cmd_report(args):
+    from task_history import LAYOUTS, get_totals
+    totals = get_totals(args.log, LAYOUTS[args.layout])
+    rows = totals.task_totals if args.by == 'task' else totals.day_totals
+    print(f"Total time by {args.by}:")
+    for label, total_sec in rows.items():
+        print(f"{label}: {total_sec // 60} minutes")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="task_cli", description="Task timer without a GUI.")
+    parser.add_argument('--log', default='task_log.csv')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    start = commands.add_parser('start', help="start timing a task")
+    start.add_argument('task')
+    start.add_argument('-c', '--comment', default="")
+    start.set_defaults(run=cmd_start)
+    commands.add_parser('pause', help="pause, or resume a paused timer").set_defaults(run=cmd_pause)
+    commands.add_parser('resume', help="resume a paused timer").set_defaults(run=cmd_resume)
+    commands.add_parser('stop', help="stop and save the session").set_defaults(run=cmd_stop)
+    commands.add_parser('status', help="show the running timer").set_defaults(run=cmd_status)
+    report = commands.add_parser('report', help="total time by task or day")
+    report.add_argument('--by', choices=['task', 'day'], default='task')
+    report.add_argument('--layout', choices=LAYOUT_NAMES, default='any',
+                        help="v1: only 5-column rows (task-timer.py, v1-v3); v4: only 7-column rows")
+    report.set_defaults(run=cmd_report)
+
+    args = parser.parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
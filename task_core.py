@@ -0,0 +1,360 @@
+"""Timer and session logic shared by the Tk app and the command line.
+
+Nothing here imports tkinter, so ``task_cli`` can drive timers on headless
+machines and scripts can reuse the logic without starting a GUI.
+"""
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+
+def session_row(task, comment, start_time, duration_sec, segments=None):
+    """v4 log row: start date/time, end date/time, task, comment, duration.
+
+    With ``segments`` (``TaskTimer.segments``) the end is where the last
+    segment ended.  The segments themselves are not part of the row; writers
+    put them in the ``<log>.segments`` sidecar.
+    """
+    start_dt = datetime.fromtimestamp(start_time)
+    if segments:
+        end_dt = datetime.fromtimestamp(segments[-1][0] + segments[-1][1])
+    else:
+        end_dt = start_dt + timedelta(seconds=duration_sec)
+    return [start_dt.strftime("%Y-%m-%d"), start_dt.strftime("%H:%M:%S"),
+            end_dt.strftime("%Y-%m-%d"), end_dt.strftime("%H:%M:%S"),
+            task, comment, duration_sec]
+
+
+def save_session(path, task, comment, start_time, duration_sec, segments=None):
+    """Append one finished session to the v4 log at ``path``."""
+    # Imported here: timers alone (``task_cli status``, pause, resume) never load the log machinery
+    from task_history import append_row
+    row = session_row(task, comment, start_time, duration_sec, segments)
+    append_row(path, row, segments=segments)
+
+
+class TaskTimer:
+    """One task's session: start, pause/resume and stop.
+
+    The session is a list of active ``segments``, ``[wall-clock start,
+    active seconds]`` each; the seconds are measured with ``clock``
+    (``time.monotonic`` by default, so wall-clock jumps do not affect them)
+    and kept as floats, so pausing loses nothing.  ``start_time`` is the
+    wall-clock start of the first segment.  A timer persisted between
+    processes must use ``clock=time.time``.  With a ``journal``
+    (``SessionJournal``) every start, pause and resume is also appended
+    there, so the session can be recovered after a crash; ``heartbeat``
+    adds an ``alive`` event now and then, so recovery knows when the app
+    was last running.
+    """
+
+    def __init__(self, clock=time.monotonic, wall=time.time, journal=None):
+        self.clock = clock
+        self.wall = wall
+        self.journal = journal
+        self.task = None
+        self.comment = ""
+        self.start_time = None
+        self.segments = []
+        self.started = None  # clock() when the current segment began
+        self.running = False
+        self.paused = False
+        self.elapsed_before_pause = 0.0  # active seconds of the closed segments
+        self.recorded = None  # wall() of the last journal event
+
+    def start(self, task, comment=""):
+        self.task = task
+        self.comment = comment
+        self.start_time = self.wall()
+        self.segments = [[self.start_time, 0.0]]
+        self.started = self.clock()
+        self.running = True
+        self.paused = False
+        self.elapsed_before_pause = 0.0
+        self._record('start', task=task, comment=comment)
+
+    def elapsed(self):
+        if not self.running:
+            return 0
+        if self.paused:
+            return self.elapsed_before_pause
+        return self.elapsed_before_pause + self.clock() - self.started
+
+    def _close_segment(self):
+        seconds = self.clock() - self.started
+        self.segments[-1][1] = seconds
+        self.elapsed_before_pause += seconds
+
+    def pause(self):
+        if self.running and not self.paused:
+            self._close_segment()
+            self.paused = True
+            self._record('pause')
+
+    def resume(self):
+        if self.running and self.paused:
+            self.paused = False
+            self.segments.append([self.wall(), 0.0])
+            self.started = self.clock()
+            self._record('resume')
+
+    def heartbeat(self, every=60):
+        """Journal an ``alive`` event if the session has counted ``every`` seconds since the last event."""
+        if self.journal is not None and self.running and not self.paused:
+            if self.wall() - self.recorded >= every:
+                self._record('alive')
+
+    def _record(self, event, **fields):
+        if self.journal is not None:
+            self.recorded = self.wall()
+            self.journal.record(event, self.recorded, **fields)
+
+    def stop(self):
+        """End the session; returns ``(task, comment, start_time, duration_sec)``.
+
+        ``duration_sec`` is the whole seconds of active time; ``segments``
+        keeps the exact split.  The journal is left alone: clear it once the
+        session is saved.
+        """
+        if self.running and not self.paused:
+            self._close_segment()
+        duration = int(self.elapsed_before_pause)
+        self.running = False
+        self.paused = False
+        return self.task, self.comment, self.start_time, duration
+
+    def to_dict(self):
+        return {
+            'task': self.task,
+            'comment': self.comment,
+            'start_time': self.start_time,
+            'segments': self.segments,
+            'started': self.started,
+            'running': self.running,
+            'paused': self.paused,
+            'elapsed_before_pause': self.elapsed_before_pause,
+        }
+
+    @classmethod
+    def from_dict(cls, data, clock=time.time):
+        timer = cls(clock, clock)
+        for key, value in data.items():
+            setattr(timer, key, value)
+        return timer
+
+
+class TimerEngine:
+    """Any number of ``TaskTimer``s behind one tick loop and one save function.
+
+    ``tick()`` is the only thing a UI needs to call: it reports which
+    timers' whole-second display changed and how long to wait before the
+    next call.  Timers whose next second falls within ``floor_ms`` of each
+    other are served by the same wake-up, so a second timer adds one
+    ``elapsed()`` per tick rather than a tick loop of its own.  Finished
+    sessions all go through ``save(task, comment, start_time, duration,
+    segments)``.
+    """
+
+    def __init__(self, save=None, timer_factory=TaskTimer, floor_ms=100):
+        self.save = save
+        self.timer_factory = timer_factory
+        self.floor_ms = floor_ms
+        self.timers = {}  # id -> TaskTimer, in start order
+        self.shown = {}   # id -> whole seconds last reported by tick()
+
+    def add(self, timer_id, timer):
+        """Drive an existing timer (e.g. one recovered from a journal)."""
+        self.timers[timer_id] = timer
+        self.shown.pop(timer_id, None)
+        return timer
+
+    def start(self, timer_id, task, comment="", **timer_args):
+        if timer_id in self.timers and self.timers[timer_id].running:
+            raise ValueError(f"timer {timer_id!r} is already running")
+        timer = self.add(timer_id, self.timer_factory(**timer_args))
+        timer.start(task, comment)
+        return timer
+
+    def pause(self, timer_id):
+        self.timers[timer_id].pause()
+
+    def resume(self, timer_id):
+        self.timers[timer_id].resume()
+        self.shown.pop(timer_id, None)
+
+    def stop(self, timer_id, comment=None):
+        """Stop, save and forget a timer; returns ``(task, comment, start_time, duration_sec)``.
+
+        If ``save`` raises, the stopped timer stays registered so the stop can be retried.
+        """
+        timer = self.timers[timer_id]
+        task, timer_comment, start_time, duration = timer.stop()
+        comment = timer_comment if comment is None else comment
+        if self.save is not None:
+            self.save(task, comment, start_time, duration, timer.segments)
+        del self.timers[timer_id]
+        self.shown.pop(timer_id, None)
+        return task, comment, start_time, duration
+
+    def running(self):
+        return [timer_id for timer_id, timer in self.timers.items() if timer.running]
+
+    def redraw(self, timer_id=None):
+        """Make the next tick report ``timer_id`` (or every timer) even if unchanged."""
+        if timer_id is None:
+            self.shown.clear()
+        else:
+            self.shown.pop(timer_id, None)
+
+    def tick(self):
+        """``({timer_id: whole elapsed seconds}, delay_ms)`` for the timers that changed.
+
+        ``delay_ms`` is None when no timer is counting, so the loop can stop.
+        """
+        changed = {}
+        delay = None
+        for timer_id, timer in self.timers.items():
+            if not timer.running or timer.paused:
+                continue
+            elapsed = timer.elapsed()
+            whole = int(elapsed)
+            if self.shown.get(timer_id) != whole:
+                self.shown[timer_id] = changed[timer_id] = whole
+            until_next = 1000 - int(elapsed % 1 * 1000)
+            if delay is None or until_next < delay:
+                delay = until_next
+        if delay is not None:
+            delay = max(delay, self.floor_ms)
+        return changed, delay
+
+
+class SessionJournal:
+    """Append-only record of the running session's start/pause/resume events.
+
+    One JSON line per event, written through a handle kept open and flushed
+    to the OS per event (no fsync unless asked), so it survives the app
+    being killed and costs a few microseconds per button press.  ``clear``
+    truncates it once the session has been saved; whatever is left at
+    startup belongs to a session that never finished, and ``recover``
+    rebuilds it by replaying the events.  The last event (a heartbeat, if
+    the timer sends them) is the last moment the app is known to have been
+    running; ``downtime`` is how long ago that was.
+    """
+
+    def __init__(self, path, fsync=False):
+        self.path = path
+        self.fsync = fsync
+        self._f = None
+
+    def _open(self):
+        if self._f is None:
+            self._f = open(self.path, 'a', encoding='utf-8')
+            if self._f.tell():
+                with open(self.path, 'rb') as f:
+                    f.seek(-1, os.SEEK_END)
+                    torn = f.read(1) != b"\n"
+                if torn:
+                    self._f.write("\n")  # end a torn line so the next event parses
+
+    def record(self, event, when, **fields):
+        self._open()
+        fields['event'] = event
+        fields['time'] = when
+        self._f.write(json.dumps(fields) + "\n")
+        self._f.flush()
+        if self.fsync:
+            os.fsync(self._f.fileno())
+
+    def events(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return []
+        events = []
+        for line in lines:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                pass  # torn last line of a crashed write
+        return events
+
+    def _replay(self):
+        """The unfinished session replayed on a ``ReplayClock`` left at its last event, or None."""
+        events = self.events()
+        starts = [i for i, e in enumerate(events) if e['event'] == 'start']
+        if not starts:
+            return None
+        replay = ReplayClock()
+        timer = TaskTimer(replay, replay)
+        for event in events[starts[-1]:]:
+            replay.now = event['time']
+            if event['event'] == 'start':
+                timer.start(event['task'], event.get('comment', ""))
+            elif event['event'] == 'pause':
+                timer.pause()
+            elif event['event'] == 'resume':
+                timer.resume()
+        timer.recorded = replay.now
+        return timer
+
+    def downtime(self):
+        """Seconds between the unfinished session's last event and now, or 0 if it was paused."""
+        timer = self._replay()
+        if timer is None or timer.paused:
+            return 0
+        return max(time.time() - timer.recorded, 0)
+
+    def recover(self, clock=time.monotonic, count_downtime=False):
+        """The unfinished session as a live ``TaskTimer``, or None.
+
+        A session running at the crash counted until its last event; the
+        time since (``downtime``) becomes a pause, journaled as one, unless
+        ``count_downtime`` is true, in which case it keeps counting as if
+        the app had never stopped.  A session paused at the crash stays
+        paused.
+        """
+        timer = self._replay()
+        if timer is None:
+            return None
+        now = time.time()
+        # Replayed on the journal's wall-clock timestamps; hand over to ``clock`` from here
+        replay = timer.clock
+        timer.journal = self
+        if timer.running and not timer.paused and not count_downtime:
+            timer.pause()
+            replay.now = max(now, replay.now)
+            timer.resume()
+        replay.now = now
+        current = now - timer.started
+        timer.clock, timer.wall = clock, time.time
+        timer.started = clock() - current
+        return timer
+
+    def clear(self):
+        self._open()
+        self._f.truncate(0)
+        self._f.flush()
+        if self.fsync:
+            os.fsync(self._f.fileno())
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+
+class ReplayClock:
+    """A clock that returns whatever ``now`` was last set to."""
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def format_elapsed(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:02}:{seconds % 3600 // 60:02}:{seconds % 60:02}"
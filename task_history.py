@@ -0,0 +1,1433 @@
+"""Shared, incrementally refreshed view of the task log.
+
+Every script used to re-open ``task_log.csv`` and parse it from the first row
+each time the history was needed.  ``HistoryStore`` keeps the parsed rows in
+memory together with the byte offset and identity (device/inode, mtime, size)
+of the file it read them from.  A refresh parses only the rows appended since
+the last call and falls back to a full reload when the file was rewritten,
+e.g. by ``rename_task_in_file``.
+
+``TotalsStore`` follows the log the same way but only keeps running totals per
+task, per day and per (task, day).  It persists them to a small sidecar file
+next to the log so the summary label and task tree can be rendered without
+parsing the CSV at all; the sidecar is rebuilt from the CSV whenever it no
+longer matches the file.  It is rewritten in batches, once about
+``SIDECAR_SAVE_BYTES`` of new rows have been folded in and at exit: a
+sidecar a few rows behind only costs parsing those rows at the next start.
+
+Renaming a task does not touch the log: ``rename_task`` appends a redirect to
+``<log>.aliases`` that readers apply to every row logged before the rename,
+and stores that have already folded those rows rename the task in memory.
+``compact_log`` later folds pending renames into the log in one streaming
+pass (``python task_history.py compact task_log.csv``).
+
+Logs may mix 5-column (v1-v3) and 7-column (v4) rows; ``parse_row_any``, the
+default everywhere, reads both in one pass.  ``migrate_log`` rewrites a whole
+log into one layout, streaming and resumable (``python task_history.py
+migrate task_log.csv v4``), behind a magic line, ``#task-timer-log v4`` (or
+``v1``), naming that layout.  Only migrated or converted logs get the line:
+the readers here and in v1-v4 skip it, but the original ``task-timer.py``
+unpacks every row into five fields and fails on it, so logs the apps append
+to are left without one.
+
+Rows stay five or seven columns, which is all older scripts accept.  The
+exact active segments of a session go to ``<log>.segments`` instead.
+"""
+import abc
+import atexit
+import codecs
+import csv
+import heapq
+import io
+import itertools
+import json
+import operator
+import os
+import shutil
+import sys
+import threading
+import time
+from array import array
+from collections.abc import Mapping, Sequence
+from datetime import datetime, timedelta
+
+# Bytes just before the last read offset that must still be on disk for an
+# incremental read to be trusted.
+TAIL_CHECK = 64
+
+# Largest slice of the log held in memory at once while reading or compacting.
+BLOCK_SIZE = 1 << 20
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# First line of a log: the magic word and the layout its rows are written in.
+LOG_MAGIC = "#task-timer-log"
+
+# Input bytes migrated between two resumable checkpoints.
+CHECKPOINT_SIZE = 64 << 20
+
+# Log bytes a TotalsStore folds in before it rewrites its sidecar (it also saves at exit).
+SIDECAR_SAVE_BYTES = 1 << 20
+
+_DAYS_IN_MONTH = (0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+# A log has few distinct dates and at most 86400 distinct times, so the
+# sliced-and-validated parts are memoised; -1 marks "not fixed-width".
+_CACHE_LIMIT = 100000
+_date_parts = {}
+_time_parts = {}
+
+
+def stamp_key(date, time_str):
+    """Order-preserving int (YYYYMMDDhhmmss) for a log row's start timestamp.
+
+    ``save_session`` always writes fixed-width "YYYY-MM-DD" / "HH:MM:SS"
+    fields, so those are sliced straight into ints; anything else goes
+    through ``datetime.strptime``.  Raises ValueError for anything
+    ``strptime`` would reject.
+    """
+    stamp = canonical_stamp(date, time_str)
+    if stamp >= 0:
+        return stamp
+    return _slow_stamp_key(date, time_str)
+
+
+def canonical_stamp(date, time_str):
+    """``stamp_key`` of a timestamp in exactly the format save_session writes, else -1."""
+    d = _date_parts.get(date)
+    if d is None:
+        d = _date_part(date)
+    t = _time_parts.get(time_str)
+    if t is None:
+        t = _time_part(time_str)
+    if d >= 0 and t >= 0:
+        return d + t
+    return -1
+
+
+def _date_part(date):
+    part = -1
+    if len(date) == 10 and date[4] == '-' and date[7] == '-':
+        digits = date[:4] + date[5:7] + date[8:]
+        if digits.isdigit() and digits.isascii():
+            year, month, day = int(digits[:4]), int(digits[4:6]), int(digits[6:])
+            if year and 1 <= month <= 12 and 1 <= day <= _days_in_month(year, month):
+                part = int(digits) * 1000000
+    if len(_date_parts) >= _CACHE_LIMIT:
+        _date_parts.clear()
+    _date_parts[date] = part
+    return part
+
+
+def _time_part(time_str):
+    part = -1
+    if len(time_str) == 8 and time_str[2] == ':' and time_str[5] == ':':
+        digits = time_str[:2] + time_str[3:5] + time_str[6:]
+        if (digits.isdigit() and digits.isascii()
+                and digits[:2] < '24' and digits[2:4] < '60' and digits[4:] < '60'):
+            part = int(digits)
+    if len(_time_parts) >= _CACHE_LIMIT:
+        _time_parts.clear()
+    _time_parts[time_str] = part
+    return part
+
+
+def _parts(values, cache, part):
+    """``part(value)`` of each value through its memo ``cache``, as a list."""
+    found = list(map(cache.get, values))
+    if None in found:
+        for index, value in enumerate(values):
+            if found[index] is None:
+                found[index] = part(value)
+    return found
+
+
+def _split_columns(chunk, parse_row):
+    """``(dates, times, tasks, comments, durations)`` of a chunk of plain rows, else None.
+
+    ``save_session`` never needs to quote a field, so a chunk without a quote
+    character and with one layout on every line is only commas and
+    newlines, and one ``bytes.split`` over all of it is far cheaper than
+    ``csv.reader``.  Every newline is moved to the start of the next row's
+    first field; all of them landing in the first column proves every line
+    has the same number of fields.  The fields stay raw bytes.
+    """
+    lines = chunk.count(b'\n')
+    if not lines or not chunk.endswith(b'\n') or b'"' in chunk:
+        return None
+    commas = chunk.count(b',')
+    if commas == 6 * lines and parse_row in (parse_row_v4, parse_row_any):
+        width = 7
+    elif commas == 4 * lines and parse_row in (parse_row_v1, parse_row_any):
+        width = 5
+    else:
+        return None
+    if chunk.count(b'\r') != chunk.count(b'\r\n'):
+        return None  # csv.reader would end a row at a lone '\r'
+    fields = chunk.replace(b'\n', b',\n').split(b',')
+    firsts = b''.join(fields[::width])
+    if firsts.count(b'\n') != lines:
+        return None
+    # The '\r' of a CRLF line ending stays on the duration, which int() ignores
+    return (firsts.split(b'\n')[:-1], fields[1::width], fields[width - 3::width],
+            fields[width - 2::width], fields[width - 1::width])
+
+
+def _days_in_month(year, month):
+    if month == 2 and year % 4 == 0 and (year % 100 != 0 or year % 400 == 0):
+        return 29
+    return _DAYS_IN_MONTH[month]
+
+
+def parse_day(text):
+    """"YYYY-MM-DD" to a YYYYMMDD int."""
+    day = datetime.strptime(text, "%Y-%m-%d")
+    return day.year * 10000 + day.month * 100 + day.day
+
+
+def _slow_stamp_key(date, time_str):
+    dt = datetime.strptime(date + " " + time_str, TIMESTAMP_FORMAT)
+    return (((((dt.year * 100 + dt.month) * 100 + dt.day) * 100 + dt.hour) * 100
+             + dt.minute) * 100 + dt.second)
+
+
+def parse_row_v1(row):
+    """5-column layout (v1-v3): date, time, task, comment, duration."""
+    if len(row) != 5:
+        return None
+    date, time_str, task, comment, duration = row
+    try:
+        return date, time_str, task, comment, int(duration)
+    except ValueError:
+        return None
+
+
+def parse_row_v4(row):
+    """7-column layout (v4): start date/time, end date/time, task, comment, duration."""
+    if len(row) < 7:
+        return None
+    date, time_str, _, _, task, comment, duration = row[:7]
+    try:
+        return date, time_str, task, comment, int(duration)
+    except ValueError:
+        return None
+
+
+def parse_row_any(row):
+    """Either layout, told apart by column count; the magic line and junk give None."""
+    if len(row) == 5:
+        return parse_row_v1(row)
+    return parse_row_v4(row)
+
+
+# Row layouts by name, as written in the magic line (``any`` reads mixed logs).
+LAYOUTS = {'v1': parse_row_v1, 'v4': parse_row_v4, 'any': parse_row_any}
+
+
+def log_header(layout):
+    return f"{LOG_MAGIC} {layout}\n"
+
+
+def row_layout(row):
+    return 'v1' if len(row) == 5 else 'v4'
+
+
+def read_header(path):
+    """Layout named by the log's magic line; None for logs written before it existed."""
+    try:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            line = f.readline(256)
+    except FileNotFoundError:
+        return None
+    return _header_layout(line)
+
+
+def _header_layout(line):
+    if not line.startswith(LOG_MAGIC):
+        return None
+    layout = line[len(LOG_MAGIC):].strip()
+    if layout not in ('v1', 'v4'):
+        raise ValueError(f"unsupported task log format {layout!r}")
+    return layout
+
+
+def format_segments(segments):
+    """Active segments as text: "start+seconds ..." (epoch, 3 decimals)."""
+    return " ".join(f"{start:.3f}+{seconds:.3f}" for start, seconds in segments)
+
+
+def parse_segments(text):
+    """``format_segments`` text back to ``[(start, seconds)]``; [] if empty or malformed."""
+    segments = []
+    try:
+        for part in text.split():
+            start, _, seconds = part.partition('+')
+            segments.append((float(start), float(seconds)))
+    except ValueError:
+        return []
+    return segments
+
+
+def segments_path(log_path):
+    return log_path + '.segments'
+
+
+def write_segments(path, entries):
+    """Append ``(row, segments)`` pairs to ``<log>.segments``.
+
+    The log keeps seven columns, since deployed v4 readers unpack exactly
+    seven.  Each line is keyed by its row's start date, start time and
+    duration.  Renames, ``compact_log`` and ``migrate_log`` keep those,
+    while byte offsets would change under the last two.
+    """
+    with open(segments_path(path), 'a', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        for row, segments in entries:
+            writer.writerow([row[0], row[1], row[-1], format_segments(segments)])
+
+
+def read_segments(path):
+    """``{(date, time, duration): [(start, seconds)]}`` from ``<log>.segments``."""
+    found = {}
+    try:
+        with open(segments_path(path), newline='', encoding='utf-8') as f:
+            for row in csv.reader(f):
+                try:
+                    date, time_str, duration, text = row
+                    found[date, time_str, int(duration)] = parse_segments(text)
+                except ValueError:
+                    continue  # a torn last line
+    except FileNotFoundError:
+        pass
+    return found
+
+
+class AliasTable:
+    """Pending task renames of one log, kept in ``<log>.aliases``.
+
+    Each entry ``(offset, old, new)`` renames ``old`` to ``new`` in every row
+    that starts before byte ``offset``, i.e. every row logged before the
+    rename.  Entries are tied to the log's device/inode, so a log replaced by
+    ``compact_log`` silently drops the renames it already contains.
+    """
+
+    def __init__(self, log_path):
+        self.path = log_path + '.aliases'
+        self.entries = []
+        self._key = None
+
+    def refresh(self, identity):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            self.entries = []
+            self._key = None
+            return
+        key = (identity, st.st_size, st.st_mtime_ns)
+        if key == self._key:
+            return
+        entries = []
+        with open(self.path, newline='', encoding='utf-8') as f:
+            for row in csv.reader(f):
+                try:
+                    dev, ino, offset, old, new = row
+                    if (int(dev), int(ino)) == identity:
+                        entries.append((int(offset), old, new))
+                except ValueError:
+                    continue
+        self.entries = entries
+        self._key = key
+
+    def boundaries(self, start, end):
+        """Sorted rename offsets strictly inside ``(start, end)``."""
+        return sorted({offset for offset, _, _ in self.entries if start < offset < end})
+
+    def resolver(self, end):
+        """Name mapping for rows that end at or before ``end``, or None."""
+        applicable = [(old, new) for offset, old, new in self.entries if offset >= end]
+        if not applicable:
+            return None
+        cache = {}
+
+        def resolve(name):
+            resolved = cache.get(name)
+            if resolved is None:
+                resolved = name
+                for old, new in applicable:
+                    if resolved == old:
+                        resolved = new
+                cache[name] = resolved
+            return resolved
+        return resolve
+
+
+def iter_chunks(f, start, end, aliases=None, block=BLOCK_SIZE):
+    """Yield ``(data, resolve)`` for the complete lines of ``f`` in ``[start, end)``.
+
+    Pieces are at most about ``block`` bytes, never straddle a rename offset,
+    and ``resolve`` is the alias mapping that applies to them.  A trailing
+    partial line is not yielded.
+    """
+    f.seek(start)
+    cuts = aliases.boundaries(start, end) if aliases else []
+    pos = start
+    carry = b''
+    for cut in cuts + [end]:
+        resolve = aliases.resolver(cut) if aliases else None
+        while pos < cut:
+            read = f.read(min(block, cut - pos))
+            if not read:
+                return
+            pos += len(read)
+            data = carry + read
+            nl = data.rfind(b'\n') + 1
+            carry = data[nl:]
+            if nl:
+                yield data[:nl], resolve
+
+
+class LogFollower(abc.ABC):
+    """Remembers how far into a log file it has parsed.
+
+    Subclasses implement ``clear()`` and ``add(parsed)``; ``refresh()`` feeds
+    ``add`` only the rows that are new since the previous call, with pending
+    renames from the alias table already applied.  A rename recorded after
+    rows were folded goes to ``rename(old, new)``, or, for stores that do not
+    implement it, re-reads the log with the rename applied.
+    """
+
+    def __init__(self, path, parse_row=parse_row_any, encoding='utf-8'):
+        self.path = path
+        self.parse_row = parse_row
+        self.encoding = encoding
+        self.aliases = AliasTable(path)
+        self._alias_count = 0
+        self._reset()
+
+    @abc.abstractmethod
+    def clear(self):
+        """Drop every folded row."""
+
+    @abc.abstractmethod
+    def add(self, parsed):
+        """Fold in one parsed row, ``(date, time, task, comment, duration)`` or longer."""
+
+    def rename(self, old, new):
+        """Rename ``old`` to ``new`` in the rows folded so far; False if this store cannot."""
+        return False
+
+    def _reset(self):
+        self.clear()
+        self._identity = None
+        self._mtime = None
+        self._offset = 0
+        self._tail = b''
+
+    def invalidate(self):
+        """Drop everything so the next refresh reloads the whole file."""
+        self._reset()
+
+    def refresh(self):
+        """Bring the store up to date with the file; returns True if anything changed."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            changed = self._identity is not None
+            self._reset()
+            return changed
+
+        identity = (st.st_dev, st.st_ino)
+        self.aliases.refresh(identity)
+        renamed = len(self.aliases.entries) != self._alias_count
+        if renamed:
+            # A rename changes rows already folded in: apply it to them, or re-read with it applied.
+            if not self._apply_aliases(identity):
+                self._reset()
+            self._alias_count = len(self.aliases.entries)
+        if identity == self._identity and st.st_size == self._offset and st.st_mtime_ns == self._mtime:
+            return renamed
+
+        with open(self.path, 'rb') as f:
+            if not self._can_append(f, identity, st):
+                self._reset()
+                self._identity = identity
+            if not self._offset:
+                # Refuse a format this reader does not know instead of misreading it
+                _header_layout(f.readline(256).decode(self.encoding, 'replace'))
+            # A trailing partial line (a writer mid-append) is left for the next refresh.
+            for data, resolve in iter_chunks(f, self._offset, st.st_size, self.aliases):
+                self._consume(data, resolve)
+        self._mtime = st.st_mtime_ns
+        return True
+
+    def _apply_aliases(self, identity):
+        """Rename the folded rows for the alias entries added since the last refresh, if possible.
+
+        Only entries that cover every folded row (offset at or past what was
+        read) can be applied this way; rows after ``_offset`` are renamed as
+        they are read.
+        """
+        added = self.aliases.entries[self._alias_count:]
+        if (identity != self._identity or len(self.aliases.entries) < self._alias_count
+                or any(offset < self._offset for offset, _, _ in added)):
+            return False
+        for _, old, new in added:
+            if old != new and not self.rename(old, new):
+                return False
+        return True
+
+    def _can_append(self, f, identity, st):
+        if identity != self._identity or st.st_size < self._offset:
+            return False
+        if st.st_size == self._offset:
+            # Same size but a new mtime: rewritten in place.
+            return False
+        if self._tail:
+            f.seek(self._offset - len(self._tail))
+            if f.read(len(self._tail)) != self._tail:
+                return False
+        return True
+
+    def _consume(self, chunk, resolve=None):
+        # A byte that is not valid in the encoding only mangles its own row, never the rest of the
+        # chunk; the offset moves once every row of the chunk has been folded in
+        self._add_chunk(chunk, resolve)
+        self._offset += len(chunk)
+        self._tail = (self._tail + chunk[-TAIL_CHECK:])[-TAIL_CHECK:]
+
+    def _add_chunk(self, chunk, resolve):
+        text = chunk.decode(self.encoding, 'replace')
+        for row in csv.reader(io.StringIO(text, newline='')):
+            parsed = self.parse_row(row)
+            if parsed is not None:
+                if resolve is not None:
+                    parsed = parsed[:2] + (resolve(parsed[2]),) + parsed[3:]
+                self.add(parsed)
+
+    def get_state(self):
+        return {
+            'identity': self._identity,
+            'mtime': self._mtime,
+            'offset': self._offset,
+            'tail': self._tail.hex(),
+            'aliases': self._alias_count,
+        }
+
+    def set_state(self, state):
+        self._identity = tuple(state['identity']) if state['identity'] else None
+        self._mtime = state['mtime']
+        self._offset = state['offset']
+        self._tail = bytes.fromhex(state['tail'])
+        self._alias_count = state['aliases']
+
+
+class StaleHistoryError(RuntimeError):
+    """A history view was read after its store reloaded the log; read the history again."""
+
+
+class SessionsView(Sequence):
+    """One task's sessions as ``(date, time, comment, duration)`` tuples, built on access.
+
+    Appended sessions show up in a view; a reload of the store (the log
+    rewritten or replaced) or a rename makes it raise ``StaleHistoryError``
+    instead.
+    Reads hold the store's lock, so a view handed to another thread (the
+    Tk thread, from a loader) never sees a refresh half done.
+    """
+
+    __slots__ = ('_store', '_task_id', '_generation')
+
+    def __init__(self, store, task_id, generation):
+        self._store = store
+        self._task_id = task_id
+        self._generation = generation
+
+    def _check(self):
+        if self._store.generation != self._generation:
+            raise StaleHistoryError(f"{self._store.path} was reloaded since this view was taken")
+
+    def __len__(self):
+        with self._store._lock:
+            self._check()
+            return self._store.count(self._task_id) if self._task_id is not None else 0
+
+    def __getitem__(self, index):
+        with self._store._lock:
+            self._check()
+            if self._task_id is None:
+                return [][index]
+            if isinstance(index, slice):
+                return self._store.sessions(self._task_id, index)
+            count = self._store.count(self._task_id)
+            if not -count <= index < count:
+                raise IndexError("session index out of range")
+            index %= count
+            return self._store.sessions(self._task_id, slice(index, index + 1))[0]
+
+    def __iter__(self):
+        # The whole task in one split under one lock, not one lock and check per index
+        with self._store._lock:
+            self._check()
+            return iter(self._store.sessions(self._task_id) if self._task_id is not None else ())
+
+
+class HistoryView(Mapping):
+    """``{task: sessions}`` over a ``HistoryStore``, in first-seen task order.
+
+    Like the defaultdict it replaces, ``history[task]`` of an unknown task
+    is an empty view; ``get`` returns the default.  Stale after a reload,
+    like ``SessionsView``.
+    """
+
+    __slots__ = ('_store', '_generation')
+
+    def __init__(self, store):
+        self._store = store
+        self._generation = store.generation
+
+    _check = SessionsView._check
+
+    def __getitem__(self, task):
+        store = self._store
+        with store._lock:
+            self._check()
+            return SessionsView(store, store._task_ids.get(task), self._generation)
+
+    def get(self, task, default=None):
+        return self[task] if task in self else default
+
+    def __contains__(self, task):
+        with self._store._lock:
+            self._check()
+            return task in self._store._task_ids
+
+    def __iter__(self):
+        with self._store._lock:
+            self._check()
+            return iter(list(self._store._tasks))
+
+    def __len__(self):
+        with self._store._lock:
+            self._check()
+            return len(self._store._tasks)
+
+
+class HistoryStore(LogFollower):
+    """Parsed rows of one log file, refreshed incrementally.
+
+    Each task's sessions are kept as one UTF-8 ``bytearray`` of
+    newline-terminated fields, ``date\\ntime\\ncomment\\nduration\\n`` per
+    session in log order, plus one ``array('i')`` of the task of every row.
+    That is about the size of those fields in the log, 50-odd bytes a
+    session instead of a tuple of four strings, and a task's sessions come
+    back as tuples from a single ``split``.  ``history`` presents them as
+    ``{task: [(date, time, comment, duration)]}``, the shape
+    ``read_task_history`` has always returned; it is live and read-only.
+    Every reload and rename bumps ``generation``, which retires the views
+    handed out before it.
+    """
+
+    def __init__(self, path, parse_row=parse_row_any, encoding='utf-8'):
+        self.generation = 0
+        self._lock = _lock  # the one get_store refreshes under
+        # Rows of a UTF-8 log are copied into the records without decoding them
+        self._raw_records = codecs.lookup(encoding).name == 'utf-8'
+        super().__init__(path, parse_row, encoding)
+
+    def clear(self):
+        self.generation += 1
+        self._tasks = []
+        self._task_ids = {}
+        self._records = []
+        self._task_col = array('i')
+        # {task id: {index: (date, time, comment)}} for the rare field that holds a
+        # newline itself; its record keeps four empty fields
+        self._odd_rows = {}
+        # Byte offset of every record of the task last indexed into, for paging
+        self._starts = (None, 0, None)
+        self.history = HistoryView(self)
+
+    def _task_id(self, task):
+        task_id = self._task_ids.get(task)
+        if task_id is None:
+            task_id = self._task_ids[task] = len(self._tasks)
+            self._tasks.append(task)
+            self._records.append(bytearray())
+        return task_id
+
+    def add(self, parsed):
+        date, time_str, task, comment, duration = parsed
+        if not -2 ** 63 <= duration < 2 ** 63:
+            return  # does not fit the int64 column; no real session is that long
+        task_id = self._task_id(task)
+        if '\n' in date or '\n' in time_str or '\n' in comment:
+            self._odd_rows.setdefault(task_id, {})[self.count(task_id)] = (date, time_str, comment)
+            date = time_str = comment = ''
+        self._records[task_id] += f"{date}\n{time_str}\n{comment}\n{duration}\n".encode()
+        self._task_col.append(task_id)
+
+    def _add_chunk(self, chunk, resolve):
+        # Nearly every chunk of a real log is plain rows in one layout; those are
+        # copied into the records a column at a time, anything else goes through add()
+        columns = _split_columns(chunk, self.parse_row) if self._raw_records else None
+        if columns is None or not self._add_columns(*columns, resolve):
+            super()._add_chunk(chunk, resolve)
+
+    def _add_columns(self, dates, times, tasks, comments, durations, resolve):
+        """Append raw UTF-8 columns; False, with nothing added, if a row needs add()."""
+        try:
+            array('q', map(int, durations))
+        except (ValueError, OverflowError):
+            return False  # junk, or too long for the int64 column
+        task_ids = {}
+        for name in dict.fromkeys(tasks):
+            task = name.decode('utf-8', 'replace')
+            task_ids[name] = self._task_id(resolve(task) if resolve is not None else task)
+        task_ids = list(map(task_ids.__getitem__, tasks))
+        self._task_col.extend(task_ids)
+        # An invalid byte is kept as it is and decoded like the rest of the row when read
+        records = map(b'\n'.join, zip(dates, times, comments, durations, itertools.repeat(b'')))
+        appenders = [task_records.extend for task_records in self._records]
+        for task_id, record in zip(task_ids, records):
+            appenders[task_id](record)
+        return True
+
+    def count(self, task_id):
+        """Number of sessions of one task."""
+        return self._records[task_id].count(b'\n') // 4
+
+    def sessions(self, task_id, rows=None):
+        """One task's ``(date, time, comment, duration)`` tuples, or those of a slice of them."""
+        records, first = self._records[task_id], 0
+        if rows is not None:
+            first, stop, step = rows.indices(self.count(task_id))
+            if step != 1:
+                return self.sessions(task_id)[rows]
+            if first >= stop:
+                return []
+            starts = self._record_starts(task_id)
+            records = records[starts[first]:starts[stop]]
+        fields = records.decode('utf-8', 'replace').split('\n')
+        sessions = list(zip(fields[0::4], fields[1::4], fields[2::4], map(int, fields[3::4])))
+        for index, (date, time_str, comment) in self._odd_rows.get(task_id, {}).items():
+            if 0 <= index - first < len(sessions):
+                sessions[index - first] = (date, time_str, comment, sessions[index - first][3])
+        return sessions
+
+    def _record_starts(self, task_id):
+        records = self._records[task_id]
+        cached_id, size, starts = self._starts
+        if cached_id != task_id or size != len(records):
+            ends = itertools.accumulate(map(len, records.split(b'\n')), lambda end, n: end + n + 1,
+                                        initial=0)
+            starts = array('q', itertools.islice(ends, 0, None, 4))
+            self._starts = (task_id, len(records), starts)
+        return starts
+
+    def rename(self, old, new):
+        old_id = self._task_ids.get(old)
+        if old_id is None:
+            return True
+        self.generation += 1
+        self.history = HistoryView(self)
+        self._starts = (None, 0, None)
+        new_id = self._task_ids.get(new)
+        if new_id is None:
+            self._tasks[old_id] = new
+            self._task_ids[new] = self._task_ids.pop(old)
+            return True
+        # Merge into the first-seen of the two in log order, as a reload with the rename applied would
+        keep, drop = sorted((old_id, new_id))
+        merged = {keep: self._split_records(keep), drop: self._split_records(drop)}
+        queues = {task_id: iter(records) for task_id, records in merged.items()}
+        odd_rows, index = {}, 0
+        records = bytearray()
+        for task_id in self._task_col:
+            if task_id in queues:
+                record, odd = next(queues[task_id])
+                records += record
+                if odd is not None:
+                    odd_rows[index] = odd
+                index += 1
+        self._records[keep] = records
+        self._odd_rows.pop(drop, None)
+        if odd_rows:
+            self._odd_rows[keep] = odd_rows
+        else:
+            self._odd_rows.pop(keep, None)
+        self._odd_rows = {task_id - (task_id > drop): rows for task_id, rows in self._odd_rows.items()}
+        self._task_col = array('i', (keep if task_id == drop else task_id - (task_id > drop)
+                                     for task_id in self._task_col))
+        self._tasks[keep] = new
+        del self._tasks[drop]
+        del self._records[drop]
+        self._task_ids = {task: task_id for task_id, task in enumerate(self._tasks)}
+        return True
+
+    def _split_records(self, task_id):
+        """``(record bytes, odd fields or None)`` of each session of one task."""
+        fields = self._records[task_id].split(b'\n')
+        records = map(b'\n'.join, zip(fields[0::4], fields[1::4], fields[2::4], fields[3::4],
+                                       itertools.repeat(b'')))
+        odd = self._odd_rows.get(task_id, {})
+        return [(record, odd.get(index)) for index, record in enumerate(records)]
+
+    def columns(self):
+        """The sessions as columns, ``(tasks, task_ids, stamps, durations)``.
+
+        One ``array('q')`` entry per session, grouped by task; ``task_ids``
+        indexes ``tasks``.  Stamps of rows in another timestamp format are
+        resolved with ``stamp_key``; unparseable ones stay -1.
+        """
+        with _lock:
+            task_ids, stamps, durations = array('q'), array('q'), array('q')
+            for task_id in range(len(self._tasks)):
+                fields = self._records[task_id].decode('utf-8', 'replace').split('\n')
+                dates, times = fields[0:-1:4], fields[1::4]
+                for index, (date, time_str, _) in self._odd_rows.get(task_id, {}).items():
+                    dates[index], times[index] = date, time_str
+                base = len(stamps)
+                days = _parts(dates, _date_parts, _date_part)
+                clocks = _parts(times, _time_parts, _time_part)
+                stamps.extend(map(operator.add, days, clocks))
+                if min(days, default=0) < 0 or min(clocks, default=0) < 0:
+                    for index, (day, clock) in enumerate(zip(days, clocks)):
+                        if day < 0 or clock < 0:
+                            try:
+                                stamps[base + index] = stamp_key(dates[index], times[index])
+                            except ValueError:
+                                stamps[base + index] = -1
+                durations.extend(map(int, fields[3::4]))
+                task_ids.extend(itertools.repeat(task_id, len(dates)))
+            return list(self._tasks), task_ids, stamps, durations
+
+
+class TotalsStore(LogFollower):
+    """Running duration totals of one log file, backed by a sidecar file.
+
+    ``task_totals`` is ``{task: seconds}``, ``day_totals`` is ``{date: seconds}``
+    and ``task_day_totals`` is ``{task: {date: seconds}}``; dates and tasks keep
+    the order in which they first appear in the log.  ``last_seen`` maps each
+    task to the ``stamp_key`` of its latest session, ``last_comment`` to the
+    comment of the last session logged for it (in the order tasks were last
+    logged), and ``bad_stamps`` keeps the first unparseable timestamp of each
+    task.  That is all the recent-tasks
+    panel shows, so it never needs a ``HistoryStore``.
+    """
+
+    def __init__(self, path, parse_row=parse_row_any, encoding='utf-8'):
+        super().__init__(path, parse_row, encoding)
+        self.sidecar = path + '.totals'
+        self._saved = None  # (identity, offset, aliases) the sidecar holds
+        self._load()
+
+    def clear(self):
+        self.task_totals = {}
+        self.day_totals = {}
+        self.task_day_totals = {}
+        self.last_seen = {}
+        self.last_comment = {}
+        self.bad_stamps = {}
+
+    def add(self, parsed):
+        date, time_str, task, comment, duration = parsed
+        self.task_totals[task] = self.task_totals.get(task, 0) + duration
+        self.last_comment.pop(task, None)
+        self.last_comment[task] = comment
+        self.day_totals[date] = self.day_totals.get(date, 0) + duration
+        per_day = self.task_day_totals.setdefault(task, {})
+        per_day[date] = per_day.get(date, 0) + duration
+        try:
+            stamp = stamp_key(date, time_str)
+        except ValueError:
+            self.bad_stamps.setdefault(task, date + " " + time_str)
+            return
+        if stamp > self.last_seen.get(task, -1):
+            self.last_seen[task] = stamp
+
+    def rename(self, old, new):
+        self.task_totals = _rename_key(self.task_totals, old, new, lambda a, b: a + b)
+        self.task_day_totals = _rename_key(self.task_day_totals, old, new, _add_days)
+        self.last_seen = _rename_key(self.last_seen, old, new, max)
+        self.last_comment = _rename_key(self.last_comment, old, new, lambda a, b: b, at_last=True)
+        self.bad_stamps = _rename_key(self.bad_stamps, old, new, lambda a, b: a)
+        return True
+
+    def recent_tasks(self, n=3):
+        """Names of the ``n`` most recently used tasks, newest first.
+
+        Same result as sorting every task by the max ``strptime`` of its
+        sessions: ties keep log order, and a malformed timestamp raises the
+        ValueError ``strptime`` would have raised.
+        """
+        if self.bad_stamps:
+            for task in self.task_totals:
+                if task in self.bad_stamps:
+                    datetime.strptime(self.bad_stamps[task], TIMESTAMP_FORMAT)
+        return heapq.nlargest(n, self.task_totals, key=self.last_seen.__getitem__)
+
+    def recent(self, n=3):
+        """``[(task, total seconds, last comment)]`` for the ``n`` most recent tasks."""
+        return [(task, self.task_totals[task], self.last_comment.get(task, ""))
+                for task in self.recent_tasks(n)]
+
+    def refresh(self):
+        changed = super().refresh()
+        if changed and self._unsaved() >= SIDECAR_SAVE_BYTES:
+            self.save()
+        return changed
+
+    def _unsaved(self):
+        """Log bytes folded in since the sidecar was written (all of them after a reload)."""
+        if self._saved is None or self._saved[0] != self._identity or self._saved[1] > self._offset:
+            return self._offset
+        return self._offset - self._saved[1]
+
+    def dirty(self):
+        return self._saved != (self._identity, self._offset, self._alias_count)
+
+    def _load(self):
+        try:
+            with open(self.sidecar, encoding='utf-8') as f:
+                data = json.load(f)
+            if data['layout'] != self.parse_row.__name__:
+                return
+            self.set_state(data['state'])
+            self.task_totals = data['tasks']
+            self.day_totals = data['days']
+            self.task_day_totals = data['task_days']
+            self.last_seen = data['last_seen']
+            self.last_comment = data['last_comment']
+            self.bad_stamps = data['bad_stamps']
+            self._saved = (self._identity, self._offset, self._alias_count)
+        except (OSError, ValueError, KeyError, TypeError):
+            # Missing or unreadable sidecar: the first refresh rebuilds it.
+            self._reset()
+
+    def save(self):
+        data = {
+            'layout': self.parse_row.__name__,
+            'state': self.get_state(),
+            'tasks': self.task_totals,
+            'days': self.day_totals,
+            'task_days': self.task_day_totals,
+            'last_seen': self.last_seen,
+            'last_comment': self.last_comment,
+            'bad_stamps': self.bad_stamps,
+        }
+        tmp = self.sidecar + '.tmp'
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp, self.sidecar)
+            self._saved = (self._identity, self._offset, self._alias_count)
+        except OSError:
+            # The sidecar is only a cache; the CSV stays authoritative.
+            pass
+
+
+def _rename_key(mapping, old, new, merge, at_last=False):
+    """``mapping`` with key ``old`` renamed to ``new``, keeping dict order.
+
+    If both keys are present their values become ``merge(earlier, later)``
+    at the earlier key's position (the later one's with ``at_last``).
+    """
+    if old not in mapping:
+        return mapping
+    pair = [key for key in mapping if key == old or key == new]
+    value = mapping[old] if len(pair) == 1 else merge(mapping[pair[0]], mapping[pair[1]])
+    where = pair[-1] if at_last else pair[0]
+    return {(new if key == where else key): (value if key == where else item)
+            for key, item in mapping.items() if key == where or key not in pair}
+
+
+def _add_days(earlier, later):
+    merged = dict(earlier)
+    for date, seconds in later.items():
+        merged[date] = merged.get(date, 0) + seconds
+    return merged
+
+
+_stores = {}
+# Stores are refreshed from loader threads as well as the Tk thread.
+_lock = threading.RLock()
+
+
+def _get(cls, path, parse_row):
+    key = (cls, os.path.abspath(path), parse_row)
+    with _lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = cls(path, parse_row)
+        store.refresh()
+    return store
+
+
+def get_store(path, parse_row=parse_row_any):
+    """Return the process-wide history store for ``path``, refreshed against the file."""
+    return _get(HistoryStore, path, parse_row)
+
+
+def get_totals(path, parse_row=parse_row_any):
+    """Return the process-wide totals store for ``path``, refreshed against the file."""
+    return _get(TotalsStore, path, parse_row)
+
+
+@atexit.register
+def save_totals():
+    """Write the sidecar of every process-wide totals store that is behind its log."""
+    with _lock:
+        for store in _stores.values():
+            if isinstance(store, TotalsStore) and store.dirty():
+                store.save()
+
+
+def append_row(path, row, parse_row=parse_row_any, segments=None):
+    """Append one CSV row to ``path`` and fold it into the running totals.
+
+    ``segments`` go to the ``<log>.segments`` sidecar.
+    """
+    with _lock:
+        with open(path, 'a', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerow(row)
+        if segments:
+            write_segments(path, [(row, segments)])
+        _fold(path, parse_row)
+
+
+def _fold(path, parse_row=parse_row_any):
+    """Refresh the totals and every other store of ``path`` this process holds."""
+    with _lock:
+        get_totals(path, parse_row)
+        path = os.path.abspath(path)
+        for (_, store_path, _), store in _stores.items():
+            if store_path == path:
+                store.refresh()
+
+
+class SessionWriter:
+    """Appends rows to a log through one open handle, batching flushes.
+
+    Rows are flushed once ``flush_every`` rows are pending, and at the latest
+    ``flush_interval`` seconds after the first pending row when an interval is
+    given; with ``fsync`` every flush is also forced to disk.  The default
+    (flush every row, no fsync) behaves like ``append_row``: each flush folds
+    the rows into this process's stores for the log, the running totals
+    included.  The log is only checked at a flush; if it was replaced (e.g.
+    by ``compact_log``) the pending rows go to the new file.
+
+    Pending rows are held here, not in a file buffer: a flush that fails
+    raises, takes back whatever part of the batch reached the file, and drops
+    the batch, so a caller that retries the rows never logs them twice.
+    ``write(row, segments)`` records the segments in the ``<log>.segments``
+    sidecar once the row is flushed.
+    """
+
+    def __init__(self, path, flush_every=1, flush_interval=None, fsync=False, encoding='utf-8'):
+        self.path = path
+        self.flush_every = max(1, flush_every)
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.encoding = encoding
+        self._buffer = io.StringIO(newline='')
+        self._writer = csv.writer(self._buffer)
+        self._segments = []  # (row, segments) of pending rows
+        self._open()
+        self._lock = threading.Lock()
+        self._timer = None
+        self.pending = 0
+        self.rows = 0
+        self.flushes = 0
+        self.busy_seconds = 0.0
+        self.first_write = None  # perf_counter() of the first row, for wall-clock throughput
+
+    def _open(self):
+        self._f = open(self.path, 'ab', buffering=0)
+        st = os.fstat(self._f.fileno())
+        self._identity = (st.st_dev, st.st_ino)
+
+    def write(self, row, segments=None):
+        with self._lock:
+            start = time.perf_counter()
+            if self.first_write is None:
+                self.first_write = start
+            self._writer.writerow(row)
+            if segments:
+                self._segments.append((row, segments))
+            self.rows += 1
+            self.pending += 1
+            if self.pending >= self.flush_every:
+                self._flush()
+            elif self.flush_interval and self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+            self.busy_seconds += time.perf_counter() - start
+
+    def flush(self):
+        with self._lock:
+            start = time.perf_counter()
+            self._flush()
+            self.busy_seconds += time.perf_counter() - start
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self.pending or self._f.closed:
+            return
+        data = self._buffer.getvalue().encode(self.encoding)
+        segments, self._segments = self._segments, []
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        self.pending = 0
+        with _lock:  # not while compact_log swaps the file
+            try:
+                st = os.stat(self.path)
+                replaced = (st.st_dev, st.st_ino) != self._identity
+            except FileNotFoundError:
+                replaced = True
+            if replaced:
+                self._f.close()
+                self._open()
+            fd = self._f.fileno()
+            before = os.fstat(fd).st_size
+            written = 0
+            try:
+                while written < len(data):
+                    written += os.write(fd, data[written:])
+                if self.fsync:
+                    os.fsync(fd)
+            except OSError:
+                if written and os.fstat(fd).st_size == before + written:
+                    os.ftruncate(fd, before)  # no torn or unconfirmed rows left behind
+                raise
+        self.flushes += 1
+        if segments:
+            try:
+                write_segments(self.path, segments)
+            except OSError:
+                pass  # the rows are logged; failing them now would only get them logged twice
+        _fold(self.path)
+
+    def close(self):
+        with self._lock:
+            try:
+                self._flush()
+            finally:
+                self._f.close()
+
+    def stats(self):
+        """Rows, flushes and wall-clock rows/s since the first write.
+
+        ``busy_seconds`` is the part of that spent inside ``write``/``flush``.
+        """
+        seconds = time.perf_counter() - self.first_write if self.first_write is not None else 0.0
+        return {
+            'rows': self.rows,
+            'flushes': self.flushes,
+            'seconds': seconds,
+            'busy_seconds': self.busy_seconds,
+            'rows_per_sec': self.rows / seconds if seconds else 0.0,
+        }
+
+
+def invalidate(path):
+    """Force a full reload of every store reading ``path``."""
+    path = os.path.abspath(path)
+    with _lock:
+        for (_, store_path, _), store in _stores.items():
+            if store_path == path:
+                store.invalidate()
+
+
+def rename_task(path, old_name, new_name):
+    """Rename ``old_name`` to ``new_name`` in every session logged so far.
+
+    Only appends one line to the alias table, whatever the size of the log;
+    readers apply it lazily and ``compact_log`` makes it physical.
+    """
+    if old_name == new_name:
+        return
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return
+    with open(path + '.aliases', 'a', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerow([st.st_dev, st.st_ino, st.st_size, old_name, new_name])
+
+
+def _task_column(row):
+    if len(row) == 5:
+        return 2
+    if len(row) >= 7:
+        return 4
+    return None
+
+
+def read_rows(path, encoding='utf-8'):
+    """Yield every CSV row of a log with pending renames applied to its task column.
+
+    What the stores see after ``refresh``, as raw rows: importers read a log
+    through this so a rename still waiting in ``<log>.aliases`` is not lost.
+    Unlike a refresh, a last line without its newline is read too.
+    """
+    aliases = AliasTable(path)
+    with open(path, 'rb') as f:
+        st = os.fstat(f.fileno())
+        aliases.refresh((st.st_dev, st.st_ino))
+        done = 0
+        for data, resolve in iter_chunks(f, 0, st.st_size, aliases):
+            done += len(data)
+            yield from _resolved_rows(data, resolve, encoding)
+        f.seek(done)
+        tail = f.read(st.st_size - done)
+        if tail:
+            yield from _resolved_rows(tail, aliases.resolver(st.st_size), encoding)
+
+
+def _resolved_rows(data, resolve, encoding):
+    for row in csv.reader(io.StringIO(data.decode(encoding, 'replace'), newline='')):
+        column = _task_column(row) if resolve is not None else None
+        if column is not None:
+            row[column] = resolve(row[column])
+        yield row
+
+
+def compact_log(path, encoding='utf-8'):
+    """Apply pending renames to ``path`` in one streaming pass.
+
+    Rows are written to a temporary file that atomically replaces the log, so
+    a crash leaves either the old log plus its alias table or the compacted
+    log.  Returns False if there was nothing to do.
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return False
+    aliases = AliasTable(path)
+    aliases.refresh((st.st_dev, st.st_ino))
+    if not aliases.entries:
+        return False
+
+    tmp = path + '.compact'
+    with open(path, 'rb') as src, open(tmp, 'wb') as dst:
+        done = 0
+        written = 0
+        for data, resolve in iter_chunks(src, 0, st.st_size, aliases):
+            done += len(data)
+            if resolve is None:
+                written += dst.write(data)
+                continue
+            buf = io.StringIO(newline='')
+            writer = csv.writer(buf)
+            for row in csv.reader(io.StringIO(data.decode(encoding), newline='')):
+                column = _task_column(row)
+                if column is not None:
+                    row[column] = resolve(row[column])
+                writer.writerow(row)
+            written += dst.write(buf.getvalue().encode(encoding))
+        with _lock:
+            # Copy the partial last line and anything appended meanwhile verbatim.  Writers in
+            # this process wait on the lock until the compacted log is in place...
+            src.seek(done)
+            shutil.copyfileobj(src, dst)
+            dst.flush()
+            os.fsync(dst.fileno())
+            os.replace(tmp, path)
+            # ...and a row another process appended to the old log between the copy and the
+            # replace is still there to read through src.
+            late = src.read()
+            if late:
+                with open(path, 'ab') as f:
+                    f.write(late)
+    _carry_aliases(path, (st.st_dev, st.st_ino), len(aliases.entries), written - done)
+    invalidate(path)
+    return True
+
+
+def _carry_aliases(path, old_identity, applied, shift):
+    """Rewrite the alias table of ``path`` after ``compact_log`` replaced the log.
+
+    The first ``applied`` entries of the old log are in its rows now and go.
+    Renames recorded while the compaction ran are moved to the new log, their
+    offsets shifted by ``shift`` (how much the rewritten rows grew); entries
+    already made against the new log stay as they are.
+    """
+    alias_path = path + '.aliases'
+    st = os.stat(path)
+    while True:
+        try:
+            with open(alias_path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        buf = io.StringIO(newline='')
+        writer = csv.writer(buf)
+        seen = 0
+        for row in csv.reader(io.StringIO(data.decode('utf-8'), newline='')):
+            try:
+                dev, ino, offset, old, new = row
+                identity, offset = (int(dev), int(ino)), int(offset)
+            except ValueError:
+                continue
+            if identity == old_identity:
+                seen += 1
+                if seen > applied:
+                    writer.writerow([st.st_dev, st.st_ino, max(offset + shift, 0), old, new])
+            elif identity == (st.st_dev, st.st_ino):
+                writer.writerow(row)
+        tmp = alias_path + '.tmp'
+        with open(tmp, 'w', newline='', encoding='utf-8') as f:
+            f.write(buf.getvalue())
+        # A rename appended while this ran would be lost by the replace: start over
+        if os.path.getsize(alias_path) != len(data):
+            continue
+        if buf.tell():
+            os.replace(tmp, alias_path)
+        else:
+            os.remove(tmp)
+            os.remove(alias_path)
+        return
+
+
+def convert_row(row, layout):
+    """``row`` (either layout) rewritten in ``layout``; None for rows no reader accepts.
+
+    v1 to v4 derives the end from start + duration (or repeats the start if it
+    does not parse); v4 to v1 drops the end and the segments.
+    """
+    if parse_row_any(row) is None:
+        return None
+    if layout == 'v1':
+        return row if len(row) == 5 else [row[0], row[1], row[4], row[5], row[6]]
+    if len(row) != 5:
+        return row
+    date, time_str, task, comment, duration = row
+    end_date, end_time = date, time_str
+    try:
+        s = stamp_key(date, time_str)
+        end = (datetime(s // 10 ** 10, s // 10 ** 8 % 100, s // 10 ** 6 % 100,
+                        s // 10 ** 4 % 100, s // 100 % 100, s % 100)
+               + timedelta(seconds=int(duration)))
+        end_date, end_time = end.strftime("%Y-%m-%d"), end.strftime("%H:%M:%S")
+    except (ValueError, OverflowError):
+        pass
+    return [date, time_str, end_date, end_time, task, comment, duration]
+
+
+def _convert_chunk(data, layout, resolve, encoding):
+    buf = io.StringIO(newline='')
+    writer = csv.writer(buf)
+    count = 0
+    for row in csv.reader(io.StringIO(data.decode(encoding), newline='')):
+        row = convert_row(row, layout)
+        if row is None:
+            continue
+        if resolve is not None:
+            column = _task_column(row)
+            row[column] = resolve(row[column])
+        writer.writerow(row)
+        count += 1
+    return buf.getvalue().encode(encoding), count
+
+
+def _resume_point(state_path, tmp, src, identity, layout):
+    """The saved checkpoint if it still matches the log and the output, else None."""
+    try:
+        with open(state_path, encoding='utf-8') as f:
+            state = json.load(f)
+        if state['identity'] != list(identity) or state['layout'] != layout:
+            return None
+        if os.path.getsize(tmp) < state['out']:
+            return None
+        tail = bytes.fromhex(state['tail'])
+        src.seek(state['in'] - len(tail))
+        if src.read(len(tail)) != tail:
+            return None
+        return state
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def migrate_log(path, layout='v4', progress=None, encoding='utf-8', checkpoint=CHECKPOINT_SIZE):
+    """Rewrite ``path`` with every row in ``layout`` ('v1' or 'v4'), in constant memory.
+
+    Rows stream through ``<log>.migrate``, which atomically replaces the log
+    at the end, behind a fresh magic line; pending renames are applied on the
+    way, as ``compact_log`` does, and rows no reader accepts are dropped.
+    Every ``checkpoint`` input bytes the output is synced and the position
+    saved to ``<log>.migrate.json``, so calling this again after an
+    interruption resumes from there.  ``progress(done, total)`` is called per
+    block.  Returns the number of rows written.
+    """
+    if layout not in ('v1', 'v4'):
+        raise ValueError(f"unknown layout {layout!r}")
+    st = os.stat(path)
+    identity = (st.st_dev, st.st_ino)
+    aliases = AliasTable(path)
+    aliases.refresh(identity)
+    tmp = path + '.migrate'
+    state_path = tmp + '.json'
+
+    with open(path, 'rb') as src:
+        state = _resume_point(state_path, tmp, src, identity, layout)
+        with open(tmp, 'r+b' if state else 'wb') as dst:
+            if state:
+                dst.truncate(state['out'])
+                dst.seek(state['out'])
+                offset, rows = state['in'], state['rows']
+            else:
+                dst.write(log_header(layout).encode(encoding))
+                offset = rows = 0
+            saved = offset
+            for data, resolve in iter_chunks(src, offset, st.st_size, aliases):
+                out, count = _convert_chunk(data, layout, resolve, encoding)
+                dst.write(out)
+                offset += len(data)
+                rows += count
+                if offset - saved >= checkpoint:
+                    dst.flush()
+                    os.fsync(dst.fileno())
+                    state = {'identity': identity, 'layout': layout, 'in': offset,
+                             'out': dst.tell(), 'rows': rows, 'tail': data[-TAIL_CHECK:].hex()}
+                    with open(state_path + '.tmp', 'w', encoding='utf-8') as f:
+                        json.dump(state, f)
+                    os.replace(state_path + '.tmp', state_path)
+                    saved = offset
+                if progress:
+                    progress(offset, st.st_size)
+            # The partial last line and anything appended meanwhile
+            src.seek(offset)
+            rest = src.read()
+            out, count = _convert_chunk(rest, layout, aliases.resolver(offset + len(rest)), encoding)
+            dst.write(out)
+            rows += count
+            dst.flush()
+            os.fsync(dst.fileno())
+    os.replace(tmp, path)
+    for leftover in (state_path, aliases.path):
+        try:
+            os.remove(leftover)
+        except FileNotFoundError:
+            pass
+    invalidate(path)
+    if progress:
+        progress(st.st_size, st.st_size)
+    return rows
+
+
+def _print_progress(done, total):
+    print(f"\rmigrated {done / total if total else 1:.0%} ({done >> 20} of {total >> 20} MiB)",
+          end="", file=sys.stderr, flush=True)
+
+
+if __name__ == '__main__':
+    usage = "usage: python task_history.py compact LOG.csv | migrate LOG.csv [v1|v4]"
+    if len(sys.argv) == 3 and sys.argv[1] == 'compact':
+        print("compacted" if compact_log(sys.argv[2]) else "nothing to compact")
+    elif len(sys.argv) in (3, 4) and sys.argv[1] == 'migrate':
+        rows = migrate_log(sys.argv[2], sys.argv[3] if len(sys.argv) == 4 else 'v4', _print_progress)
+        print(f"\nmigrated {rows} rows")
+    else:
+        sys.exit(usage)
@@ -0,0 +1,213 @@
+"""Opt-in counters, latency histograms and profiling for the Tk app.
+
+Off unless configured, and then close to free: ``timed`` wrappers check one
+flag per call.  When on, every timed call lands in a histogram of
+power-of-two microsecond buckets, counters are plain integers, and the lot
+is written as JSON when the process exits.
+
+    TASK_TIMER_METRICS=metrics.json python task-timer-v4.py
+    python task-timer-v4.py --metrics metrics.json --profile cprofile
+
+``--profile`` (or ``TASK_TIMER_PROFILE``) additionally captures the phases
+wrapped in ``capture``: startup, opening the All Tasks window, background
+loads.  ``cprofile`` writes ``<metrics>.<phase>.prof`` per phase (read them
+with ``python -m pstats``); ``tracemalloc`` adds each phase's allocated and
+peak bytes and its top allocation sites to the JSON.
+"""
+import atexit
+import cProfile
+import functools
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+PROFILE_MODES = ('cprofile', 'tracemalloc')
+TOP_ALLOCATIONS = 15
+
+
+class Histogram:
+    """Latencies in power-of-two microsecond buckets plus count/total/min/max."""
+
+    __slots__ = ('count', 'total', 'min', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+        self.buckets = {}
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        bucket = max(int(seconds * 1e6), 1).bit_length()  # upper bound 2**bucket us
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def percentile(self, p):
+        """Upper bound, in seconds, of the bucket holding the ``p``-th percentile."""
+        seen, rank = 0, p / 100 * self.count
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(2 ** bucket / 1e6, self.max)
+        return self.max
+
+    def to_dict(self):
+        ms = 1000
+        return {
+            'count': self.count,
+            'total_ms': round(self.total * ms, 3),
+            'mean_ms': round(self.total / self.count * ms, 3) if self.count else None,
+            'min_ms': round(self.min * ms, 3) if self.min is not None else None,
+            'max_ms': round(self.max * ms, 3),
+            'p50_ms': round(self.percentile(50) * ms, 3),
+            'p90_ms': round(self.percentile(90) * ms, 3),
+            'p99_ms': round(self.percentile(99) * ms, 3),
+            'buckets_us': {f"<={2 ** b}": n for b, n in sorted(self.buckets.items())},
+        }
+
+
+class Metrics:
+    """Process-wide counters, histograms and profile captures."""
+
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.profile = None
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.profiles = {}   # phase -> [cProfile.Profile]
+        self.memory = {}     # phase -> tracemalloc summary
+        self._capturing = False
+        self.started = None
+
+    def configure(self, path=None, profile=None):
+        """Turn collection on if ``path`` (or TASK_TIMER_METRICS) is set; returns whether it is on."""
+        path = path or os.environ.get('TASK_TIMER_METRICS')
+        profile = profile or os.environ.get('TASK_TIMER_PROFILE')
+        if profile and profile not in PROFILE_MODES:
+            raise ValueError(f"unknown profile mode {profile!r}; expected one of {', '.join(PROFILE_MODES)}")
+        if not path:
+            return False
+        self.path, self.profile = path, profile
+        self.started = time.time()
+        if profile == 'tracemalloc':
+            tracemalloc.start(10)
+        if not self.enabled:
+            atexit.register(self.dump)
+        self.enabled = True
+        return True
+
+    def count(self, name, n=1):
+        if self.enabled:
+            with self._lock:
+                self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name, seconds):
+        if self.enabled:
+            with self._lock:
+                histogram = self.histograms.get(name)
+                if histogram is None:
+                    histogram = self.histograms[name] = Histogram()
+                histogram.add(seconds)
+
+    def timed(self, name):
+        """Decorator: record each call's latency under ``name`` while enabled."""
+        def decorate(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(name, time.perf_counter() - start)
+            return wrapper
+        return decorate
+
+    @contextmanager
+    def capture(self, phase):
+        """Time ``phase`` and, in a profile mode, profile it.
+
+        Only one phase is profiled at a time; one that overlaps it (a
+        background load during startup) is only timed.  cProfile sees the
+        capturing thread alone.
+        """
+        if not self.enabled:
+            yield
+            return
+        mode = None
+        with self._lock:
+            if self.profile and not self._capturing:
+                mode = self.profile
+                self._capturing = True
+        if mode == 'cprofile':
+            profiler = cProfile.Profile()
+            profiler.enable()
+        elif mode == 'tracemalloc':
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(f"phase:{phase}", time.perf_counter() - start)
+            if mode == 'cprofile':
+                profiler.disable()
+                with self._lock:
+                    self.profiles.setdefault(phase, []).append(profiler)
+            elif mode == 'tracemalloc':
+                self._record_memory(phase, before)
+            if mode:
+                with self._lock:
+                    self._capturing = False
+
+    def _record_memory(self, phase, before):
+        current, peak = tracemalloc.get_traced_memory()
+        top = tracemalloc.take_snapshot().statistics('lineno')[:TOP_ALLOCATIONS]
+        with self._lock:
+            self.memory.setdefault(phase, []).append({
+                'allocated_bytes': current - before,
+                'peak_bytes': peak - before,
+                'top': [{'where': str(stat.traceback), 'bytes': stat.size, 'blocks': stat.count}
+                        for stat in top],
+            })
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'started': self.started,
+                'seconds': time.time() - self.started,
+                'counters': dict(sorted(self.counters.items())),
+                'timers': {name: h.to_dict() for name, h in sorted(self.histograms.items())},
+                'memory': dict(self.memory),
+            }
+
+    def dump(self):
+        """Write the JSON report (and .prof files); called at exit."""
+        if not self.enabled:
+            return
+        data = self.snapshot()
+        base = os.path.splitext(self.path)[0]
+        for phase, profilers in self.profiles.items():
+            stats_path = f"{base}.{phase.replace(':', '-')}.prof"
+            pstats.Stats(*profilers).dump_stats(stats_path)
+            data.setdefault('profiles', {})[phase] = stats_path
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=1)
+        os.replace(tmp, self.path)
+
+
+metrics = Metrics()
+timed = metrics.timed
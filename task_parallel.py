@@ -0,0 +1,215 @@
+"""Totals of very large or many task logs, aggregated on several processes.
+
+A cold ``TotalsStore`` parses the whole log with one ``csv.reader`` on one
+core.  Here each log is cut into byte ranges that end on a newline and each
+range is parsed by a ``ProcessPoolExecutor`` worker into partial totals per
+task, per day and per (task, day) plus each task's last-seen stamp and
+last comment.  The
+partials are merged in file order, so the result is the one the serial
+path gives, dict order included: ranges use the same row parser, the same
+``TotalsStore.add`` and the same rename (alias) resolution by byte offset.
+
+    python task_parallel.py report task_log.csv archive/*.csv --by day
+    python task_parallel.py report task_log.csv --check      # also run serially and compare
+    python task_parallel.py rebuild task_log.csv             # write the .totals sidecar
+
+``rebuild`` seeds the sidecar ``TotalsStore`` keeps next to the log, so the
+app then starts from it and only parses rows appended later.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from task_history import (LAYOUTS, TAIL_CHECK, LogFollower, TotalsStore, iter_chunks,
+                          parse_row_any, read_header)
+
+CHUNK_SIZE = 32 << 20
+
+
+class RangeTotals(LogFollower):
+    """``TotalsStore`` accumulation without the sidecar, fed one byte range at a time."""
+
+    clear = TotalsStore.clear
+    add = TotalsStore.add
+    rename = TotalsStore.rename
+    recent_tasks = TotalsStore.recent_tasks
+
+    def read_range(self, start, end):
+        st = os.stat(self.path)
+        self.aliases.refresh((st.st_dev, st.st_ino))
+        if start == 0:
+            read_header(self.path)  # refuse an unknown format, like LogFollower.refresh
+        with open(self.path, 'rb') as f:
+            for data, resolve in iter_chunks(f, start, end, self.aliases):
+                self._consume(data, resolve)
+
+    def partial(self):
+        return (self.task_totals, self.day_totals, self.task_day_totals, self.last_seen,
+                self.last_comment, self.bad_stamps)
+
+    def merge(self, partial):
+        """Fold in the partial of the range (or file) that follows everything merged so far."""
+        tasks, days, task_days, last_seen, last_comment, bad_stamps = partial
+        for task, seconds in tasks.items():
+            self.task_totals[task] = self.task_totals.get(task, 0) + seconds
+        for day, seconds in days.items():
+            self.day_totals[day] = self.day_totals.get(day, 0) + seconds
+        for task, per_day in task_days.items():
+            mine = self.task_day_totals.setdefault(task, {})
+            for day, seconds in per_day.items():
+                mine[day] = mine.get(day, 0) + seconds
+        for task, stamp in last_seen.items():
+            if stamp > self.last_seen.get(task, -1):
+                self.last_seen[task] = stamp
+        for task, comment in last_comment.items():
+            # This partial's rows come later in the log; keep the dict in last-logged order
+            self.last_comment.pop(task, None)
+            self.last_comment[task] = comment
+        for task, first in bad_stamps.items():
+            self.bad_stamps.setdefault(task, first)
+
+
+def split_ranges(path, chunk_size=CHUNK_SIZE, size=None):
+    """``[(start, end)]`` byte ranges of about ``chunk_size``, each ending just after a newline."""
+    size = os.path.getsize(path) if size is None else size
+    ranges = []
+    start = 0
+    with open(path, 'rb') as f:
+        while start < size:
+            end = start + chunk_size
+            if end >= size:
+                end = size
+            else:
+                f.seek(end)
+                f.readline()
+                end = min(f.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def _range_partial(path, start, end, layout, encoding):
+    totals = RangeTotals(path, LAYOUTS[layout], encoding)
+    totals.read_range(start, end)
+    return totals.partial()
+
+
+def _layout_name(parse_row):
+    for name, func in LAYOUTS.items():
+        if func is parse_row:
+            return name
+    raise ValueError(f"{parse_row!r} is not one of task_history.LAYOUTS")
+
+
+def _merge_ranges(merged, jobs, workers, layout, encoding):
+    if workers == 1:
+        for path, start, end in jobs:
+            merged.merge(_range_partial(path, start, end, layout, encoding))
+        return merged
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_range_partial, path, start, end, layout, encoding)
+                   for path, start, end in jobs]
+        for future in futures:
+            merged.merge(future.result())
+    return merged
+
+
+def aggregate(paths, workers=None, chunk_size=CHUNK_SIZE, parse_row=parse_row_any, encoding='utf-8'):
+    """Merged totals of ``paths`` (in order) as a ``RangeTotals``.
+
+    ``workers=1`` parses in this process, range by range, with the same code.
+    """
+    jobs = [(path, start, end) for path in paths for start, end in split_ranges(path, chunk_size)]
+    merged = RangeTotals(paths[0] if paths else '', parse_row, encoding)
+    return _merge_ranges(merged, jobs, workers, _layout_name(parse_row), encoding)
+
+
+def serial_totals(paths, parse_row=parse_row_any, encoding='utf-8'):
+    """The single-process reference: one ``TotalsStore``-style pass per file, merged in order."""
+    merged = RangeTotals(paths[0] if paths else '', parse_row, encoding)
+    for path in paths:
+        totals = RangeTotals(path, parse_row, encoding)
+        totals.refresh()
+        merged.merge(totals.partial())
+    return merged
+
+
+def _complete_end(f, size):
+    """Offset just after the last newline before ``size`` (0 if there is none)."""
+    end = size
+    while end > 0:
+        start = max(end - (1 << 16), 0)
+        f.seek(start)
+        nl = f.read(end - start).rfind(b'\n')
+        if nl >= 0:
+            return start + nl + 1
+        end = start
+    return 0
+
+
+def rebuild_sidecar(path, workers=None, chunk_size=CHUNK_SIZE):
+    """Recompute ``path``'s ``TotalsStore`` sidecar in parallel; returns the store."""
+    st = os.stat(path)
+    identity = (st.st_dev, st.st_ino)
+    with open(path, 'rb') as f:
+        # Rows are only trusted up to the last complete line, as in LogFollower.refresh
+        end = _complete_end(f, st.st_size)
+        f.seek(max(end - TAIL_CHECK, 0))
+        tail = f.read(end - max(end - TAIL_CHECK, 0))
+    jobs = [(path, start, stop) for start, stop in split_ranges(path, chunk_size, size=end)]
+    merged = _merge_ranges(RangeTotals(path), jobs, workers, 'any', 'utf-8')
+
+    store = TotalsStore(path)
+    store.aliases.refresh(identity)
+    (store.task_totals, store.day_totals, store.task_day_totals, store.last_seen,
+     store.last_comment, store.bad_stamps) = merged.partial()
+    store.set_state({'identity': identity, 'mtime': st.st_mtime_ns, 'offset': end,
+                     'tail': tail.hex(), 'aliases': len(store.aliases.entries)})
+    store.save()
+    return store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Aggregate task logs on several processes.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    report = commands.add_parser('report', help="totals over one or more logs")
+    report.add_argument('logs', nargs='+')
+    report.add_argument('--by', choices=['task', 'day'], default='task')
+    report.add_argument('--check', action='store_true', help="also aggregate serially and compare")
+    rebuild = commands.add_parser('rebuild', help="recompute a log's .totals sidecar")
+    rebuild.add_argument('log')
+    for command in (report, rebuild):
+        command.add_argument('--workers', type=int, help="processes (default: one per core)")
+        command.add_argument('--chunk-mb', type=int, default=CHUNK_SIZE >> 20)
+    args = parser.parse_args(argv)
+    chunk_size = args.chunk_mb << 20
+
+    started = time.perf_counter()
+    if args.command == 'rebuild':
+        store = rebuild_sidecar(args.log, args.workers, chunk_size)
+        print(f"{store.sidecar}: {len(store.task_totals)} tasks, {len(store.day_totals)} days "
+              f"in {time.perf_counter() - started:.2f} s")
+        return 0
+
+    totals = aggregate(args.logs, args.workers, chunk_size)
+    seconds = time.perf_counter() - started
+    labels = totals.task_totals if args.by == 'task' else dict(sorted(totals.day_totals.items()))
+    print(f"Total time by {args.by}:")
+    for label, total_sec in labels.items():
+        print(f"{label}: {total_sec // 60} minutes")
+    print(f"aggregated in {seconds:.2f} s", file=sys.stderr)
+    if args.check:
+        started = time.perf_counter()
+        serial = serial_totals(args.logs)
+        same = serial.partial() == totals.partial() and all(
+            list(a) == list(b) for a, b in zip(serial.partial(), totals.partial()))
+        print(f"serial in {time.perf_counter() - started:.2f} s: {'identical' if same else 'DIFFERENT'}",
+              file=sys.stderr)
+        return 0 if same else 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,404 @@
+"""Task log partitioned by month, with a manifest for pruning.
+
+A single ever-growing ``task_log.csv`` makes every query scan all of history.
+``PartitionedLog`` keeps one file per start month (``task_log/2026-10.csv``)
+and a ``manifest.json`` holding, per partition, its row count, min/max start
+stamp, totals per task and per day, and each task's latest stamp.  Totals
+and recent tasks come straight from the manifest; range queries open only
+the partitions whose [min, max] overlaps the range (and, for one task, only
+those it appears in).  Rows whose start does not parse go to ``undated.csv``
+and only count towards unfiltered totals.
+
+Old partitions can be gzipped (``2025-01.csv.gz``); readers stream them
+transparently and a late row for that month is appended as a new gzip
+member.  The manifest is checked against each file's size and mtime and a
+changed partition is rescanned on its own.
+
+    python task_partitions.py split task_log.csv task_log
+    python task_partitions.py compress task_log          # all but the current month
+    python task_partitions.py report task_log --by day --from 2026-10-01
+"""
+import argparse
+import csv
+import gzip
+import heapq
+import json
+import os
+import sys
+import threading
+import time
+
+from task_history import (canonical_stamp, format_segments, log_header, parse_day, parse_row_any,
+                          read_rows, read_segments, row_layout, stamp_key)
+
+MANIFEST = 'manifest.json'
+UNDATED = 'undated'
+
+
+def _stamp(date, time_str):
+    stamp = canonical_stamp(date, time_str)
+    if stamp < 0:
+        try:
+            stamp = stamp_key(date, time_str)
+        except ValueError:
+            return -1
+    return stamp
+
+
+def partition_name(stamp):
+    """``YYYY-MM`` for a start stamp, ``undated`` when it did not parse."""
+    if stamp < 0:
+        return UNDATED
+    return f"{stamp // 10 ** 10:04}-{stamp // 10 ** 8 % 100:02}"
+
+
+def _open_text(path, mode, compressed=None):
+    if path.endswith('.gz') if compressed is None else compressed:
+        return gzip.open(path, mode + 't', newline='', encoding='utf-8')
+    return open(path, mode, newline='', encoding='utf-8')
+
+
+class PartitionedLog:
+    """A directory of monthly partitions plus its manifest."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, MANIFEST)
+        self._lock = threading.RLock()
+        self.partitions = {}
+        try:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                self.partitions = json.load(f)['partitions']
+        except (OSError, ValueError, KeyError):
+            pass  # rebuilt by refresh
+
+    # Manifest
+
+    def _path(self, entry):
+        return os.path.join(self.directory, entry['file'])
+
+    def refresh(self):
+        """Rescan partitions whose files changed; returns True if the manifest changed."""
+        with self._lock:
+            try:
+                files = {name: os.stat(os.path.join(self.directory, name))
+                         for name in os.listdir(self.directory)
+                         if name.endswith(('.csv', '.csv.gz'))}
+            except FileNotFoundError:
+                files = {}
+            chosen = {}
+            for file in sorted(files):
+                # A .csv left next to its .csv.gz by an interrupted compress: the .gz is complete
+                chosen[file.split('.')[0]] = file
+            found = {}
+            changed = False
+            for name, file in chosen.items():
+                st = files[file]
+                entry = self.partitions.get(name)
+                if (entry is None or entry['file'] != file or entry['size'] != st.st_size
+                        or entry['mtime'] != st.st_mtime_ns):
+                    entry = self._scan(file)
+                    changed = True
+                found[name] = entry
+            if changed or found.keys() != self.partitions.keys():
+                self.partitions = dict(sorted(found.items()))
+                self._save()
+                return True
+            return False
+
+    def _scan(self, file):
+        entry = self._empty_entry(file)
+        with _open_text(os.path.join(self.directory, file), 'r') as f:
+            for row in csv.reader(f):
+                parsed = parse_row_any(row)
+                if parsed is not None:
+                    self._add(entry, parsed)
+        self._stat(entry)
+        return entry
+
+    @staticmethod
+    def _empty_entry(file):
+        return {'file': file, 'size': 0, 'mtime': 0, 'rows': 0, 'min': None, 'max': None,
+                'tasks': {}, 'days': {}, 'last_seen': {}}
+
+    def _stat(self, entry):
+        st = os.stat(self._path(entry))
+        entry['size'], entry['mtime'] = st.st_size, st.st_mtime_ns
+
+    @staticmethod
+    def _add(entry, parsed):
+        date, time_str, task, _, duration = parsed
+        stamp = _stamp(date, time_str)
+        entry['rows'] += 1
+        entry['tasks'][task] = entry['tasks'].get(task, 0) + duration
+        entry['days'][date] = entry['days'].get(date, 0) + duration
+        if stamp >= 0:
+            if entry['min'] is None or stamp < entry['min']:
+                entry['min'] = stamp
+            if entry['max'] is None or stamp > entry['max']:
+                entry['max'] = stamp
+            if stamp > entry['last_seen'].get(task, -1):
+                entry['last_seen'][task] = stamp
+
+    def _save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = self.manifest_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'partitions': self.partitions}, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp, self.manifest_path)
+
+    # Writing
+
+    def append(self, row):
+        """Append one row (either layout) to the partition of its start month."""
+        parsed = parse_row_any(row)
+        if parsed is None:
+            raise ValueError(f"not a task log row: {row!r}")
+        with self._lock:
+            self.refresh()
+            name = partition_name(_stamp(parsed[0], parsed[1]))
+            entry = self.partitions.get(name)
+            if entry is None:
+                entry = self.partitions[name] = self._empty_entry(name + '.csv')
+                self.partitions = dict(sorted(self.partitions.items()))
+            path = self._path(entry)
+            os.makedirs(self.directory, exist_ok=True)
+            with _open_text(path, 'a') as f:
+                if not os.path.exists(path) or not os.path.getsize(path):
+                    f.write(log_header(row_layout(row)))
+                csv.writer(f).writerow(row)
+            self._add(entry, parsed)
+            self._stat(entry)
+            self._save()
+
+    def compress(self, keep=None):
+        """Gzip every plain partition older than month ``keep`` (default: the current month)."""
+        keep = keep or time.strftime("%Y-%m")
+        done = []
+        with self._lock:
+            self.refresh()
+            for name, entry in self.partitions.items():
+                if name == UNDATED or name >= keep or entry['file'].endswith('.gz'):
+                    continue
+                src = self._path(entry)
+                tmp = src + '.gz.tmp'
+                with open(src, 'rb') as f, gzip.open(tmp, 'wb') as gz:
+                    while True:
+                        block = f.read(1 << 20)
+                        if not block:
+                            break
+                        gz.write(block)
+                with open(tmp, 'rb') as f:
+                    os.fsync(f.fileno())
+                os.replace(tmp, src + '.gz')
+                entry['file'] += '.gz'
+                self._stat(entry)
+                self._save()
+                os.remove(src)
+                done.append(name)
+        return done
+
+    def rename_task(self, old_name, new_name):
+        """Rewrite only the partitions ``old_name`` appears in."""
+        with self._lock:
+            self.refresh()
+            for entry in self.partitions.values():
+                if old_name not in entry['tasks']:
+                    continue
+                path = self._path(entry)
+                tmp = path + '.tmp'
+                with _open_text(path, 'r') as src, _open_text(tmp, 'w', path.endswith('.gz')) as dst:
+                    writer = csv.writer(dst)
+                    for row in csv.reader(src):
+                        column = 2 if len(row) == 5 else 4
+                        if len(row) >= 5 and row[column] == old_name:
+                            row[column] = new_name
+                        writer.writerow(row)
+                os.replace(tmp, path)
+            self.refresh()
+
+    # Queries
+
+    def _overlapping(self, start=None, end=None, task=None):
+        """Partitions that may hold rows of ``task`` starting in days [start, end] (YYYYMMDD)."""
+        low = start * 1000000 if start is not None else None
+        high = end * 1000000 + 235959 if end is not None else None
+        for name, entry in self.partitions.items():
+            if task is not None and task not in entry['tasks']:
+                continue
+            if low is not None or high is not None:
+                if entry['min'] is None:
+                    continue  # undated rows never fall in a range
+                if (low is not None and entry['max'] < low) or (high is not None and entry['min'] > high):
+                    continue
+                inside = ((low is None or entry['min'] >= low) and
+                          (high is None or entry['max'] <= high))
+            else:
+                inside = True
+            yield name, entry, inside, low, high
+
+    def _rows(self, entry, low, high, task=None):
+        with _open_text(self._path(entry), 'r') as f:
+            for row in csv.reader(f):
+                parsed = parse_row_any(row)
+                if parsed is None or (task is not None and parsed[2] != task):
+                    continue
+                if low is not None or high is not None:
+                    stamp = _stamp(parsed[0], parsed[1])
+                    if stamp < 0 or (low is not None and stamp < low) or (high is not None and stamp > high):
+                        continue
+                yield parsed
+
+    def task_totals(self, start=None, end=None):
+        """``{task: seconds}`` for sessions starting in days [start, end]; opens edge partitions only."""
+        with self._lock:
+            totals = {}
+            for _, entry, inside, low, high in list(self._overlapping(start, end)):
+                if inside:
+                    for task, seconds in entry['tasks'].items():
+                        totals[task] = totals.get(task, 0) + seconds
+                    continue
+                for _, _, task, _, duration in self._rows(entry, low, high):
+                    totals[task] = totals.get(task, 0) + duration
+            return totals
+
+    def day_totals(self, start=None, end=None):
+        with self._lock:
+            totals = {}
+            for _, entry, inside, low, high in list(self._overlapping(start, end)):
+                if inside:
+                    for day, seconds in entry['days'].items():
+                        totals[day] = totals.get(day, 0) + seconds
+                    continue
+                for day, _, _, _, duration in self._rows(entry, low, high):
+                    totals[day] = totals.get(day, 0) + duration
+            return totals
+
+    def recent_tasks(self, n=3):
+        """Names of the ``n`` most recently used tasks, newest first, from the manifest alone.
+
+        Ties keep the order in which tasks first appear (partitions in month order).
+        """
+        with self._lock:
+            last_seen = {}
+            for entry in self.partitions.values():
+                for task in entry['tasks']:
+                    stamp = entry['last_seen'].get(task, -1)
+                    if stamp > last_seen.setdefault(task, stamp):
+                        last_seen[task] = stamp
+            return heapq.nlargest(n, last_seen, key=last_seen.__getitem__)
+
+    def sessions(self, task=None, start=None, end=None):
+        """``(date, time, task, comment, duration)`` rows in partition order, filtered."""
+        with self._lock:
+            selected = list(self._overlapping(start, end, task))
+        for _, entry, _, low, high in selected:
+            yield from self._rows(entry, low, high, task)
+
+    def last_session(self, task):
+        """The latest session of ``task``; opens the one partition it was last seen in."""
+        with self._lock:
+            best = None
+            for entry in self.partitions.values():
+                stamp = entry['last_seen'].get(task)
+                if stamp is not None and (best is None or stamp >= best[0]):
+                    best = stamp, entry
+            if best is None:
+                return None
+            latest = None
+            for parsed in self._rows(best[1], None, None, task):
+                if latest is None or _stamp(parsed[0], parsed[1]) >= _stamp(latest[0], latest[1]):
+                    latest = parsed
+            return latest
+
+    def history(self):
+        """``{task: [(date, time, comment, duration)]}`` over every partition."""
+        history = {}
+        for date, time_str, task, comment, duration in self.sessions():
+            history.setdefault(task, []).append((date, time_str, comment, duration))
+        return history
+
+
+def split_log(csv_path, directory):
+    """Stream an existing log into monthly partitions; returns the row count.
+
+    Renames still pending in the log's alias table are applied, and segments
+    from the log's ``.segments`` sidecar move into their rows.
+    """
+    recorded = read_segments(csv_path)
+    count = 0
+    log = PartitionedLog(directory)
+    os.makedirs(directory, exist_ok=True)
+    files = {}
+    try:
+        for row in read_rows(csv_path):
+            parsed = parse_row_any(row)
+            if parsed is None:
+                continue
+            name = partition_name(_stamp(parsed[0], parsed[1]))
+            writer = files.get(name)
+            if writer is None:
+                out = open(os.path.join(directory, name + '.csv'), 'a', newline='', encoding='utf-8')
+                if not out.tell():
+                    out.write(log_header(row_layout(row)))
+                writer = files[name] = (out, csv.writer(out))
+            segments = recorded.get((parsed[0], parsed[1], parsed[4])) if len(row) == 7 else None
+            writer[1].writerow(row + [format_segments(segments)] if segments else row)
+            count += 1
+    finally:
+        for out, _ in files.values():
+            out.close()
+    log.refresh()
+    return count
+
+
+_logs = {}
+_lock = threading.Lock()
+
+
+def get_partitions(directory):
+    """Return the process-wide ``PartitionedLog`` for ``directory``, refreshed."""
+    key = os.path.abspath(directory)
+    with _lock:
+        log = _logs.get(key)
+        if log is None:
+            log = _logs[key] = PartitionedLog(directory)
+    log.refresh()
+    return log
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monthly partitions of the task log.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    split = commands.add_parser('split', help="partition an existing CSV log")
+    split.add_argument('log')
+    split.add_argument('directory')
+    compress = commands.add_parser('compress', help="gzip partitions before a month")
+    compress.add_argument('directory')
+    compress.add_argument('--keep', metavar='YYYY-MM', help="first month left uncompressed")
+    report = commands.add_parser('report', help="totals from the manifest and edge partitions")
+    report.add_argument('directory')
+    report.add_argument('--by', choices=['task', 'day'], default='task')
+    report.add_argument('--from', dest='start', type=parse_day)
+    report.add_argument('--to', dest='end', type=parse_day)
+    args = parser.parse_args(argv)
+
+    if args.command == 'split':
+        print(f"split {split_log(args.log, args.directory)} rows into {args.directory}")
+    elif args.command == 'compress':
+        done = get_partitions(args.directory).compress(args.keep)
+        print(f"compressed {', '.join(done)}" if done else "nothing to compress")
+    else:
+        log = get_partitions(args.directory)
+        if args.by == 'task':
+            totals = log.task_totals(args.start, args.end)
+        else:
+            totals = dict(sorted(log.day_totals(args.start, args.end).items()))
+        print(f"Total time by {args.by}:")
+        for label, total_sec in totals.items():
+            print(f"{label}: {total_sec // 60} minutes")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
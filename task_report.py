@@ -0,0 +1,243 @@
+"""Vectorized reports over the task log (requires NumPy).
+
+The log is loaded once, through the same columnar ``HistoryStore`` the apps
+use, into NumPy arrays; totals by task, day, ISO week and month, date-range
+filters and top-N tasks are then sort-and-reduce group-bys instead of Python
+loops over sessions.  Runs without Tk:
+
+    python task_report.py --by week --from 2025-01-01 --to 2025-06-30
+    python task_report.py --top 10 --layout v1 --log task_log.csv
+    python task_report.py --spans
+"""
+import argparse
+import sys
+from datetime import datetime
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from task_history import (LAYOUTS, TIMESTAMP_FORMAT, HistoryStore, LogFollower, parse_day,
+                          parse_row_any, parse_segments, read_segments)
+
+
+def _day_numbers(day_keys):
+    """YYYYMMDD ints to days since 1970-01-01."""
+    months = (day_keys // 10000 - 1970) * 12 + day_keys // 100 % 100 - 1
+    first = months.astype('datetime64[M]').astype('datetime64[D]').astype(np.int64)
+    return first + day_keys % 100 - 1
+
+
+def _iso_weeks(day_keys):
+    """YYYYMMDD ints to ISO year * 100 + ISO week."""
+    days = _day_numbers(day_keys)
+    thursday = days - (days + 3) % 7 + 3  # 1970-01-01 was a Thursday
+    year = thursday.astype('datetime64[D]').astype('datetime64[Y]').astype(np.int64)
+    jan1 = year.astype('datetime64[Y]').astype('datetime64[D]').astype(np.int64)
+    return (year + 1970) * 100 + (thursday - jan1) // 7 + 1
+
+
+def _group_sum(keys, values):
+    """Sorted unique ``keys`` and the int64 sum of ``values`` per key."""
+    if not len(keys):
+        return keys, values
+    low = keys.min()
+    span = int(keys.max() - low) + 1
+    if span <= max(len(keys), 1 << 16):
+        # Dense keys (task ids, YYYYMMDD days, weeks, months): bincount, no sort.
+        # Float64 sums stay exact up to 2**53 seconds.
+        shifted = keys - low
+        present = np.flatnonzero(np.bincount(shifted, minlength=span))
+        sums = np.bincount(shifted, weights=values, minlength=span)
+        return present + low, sums[present].astype(np.int64)
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    return keys[starts], np.add.reduceat(values[order], starts)
+
+
+class SessionArrays:
+    """Sessions of one log as NumPy columns.
+
+    ``task_ids`` indexes ``tasks`` (first-seen order), ``days`` holds
+    YYYYMMDD ints (-1 when the start timestamp is unparseable; such rows only
+    count towards unfiltered task totals) and ``durations`` seconds.
+    """
+
+    def __init__(self, tasks, task_ids, days, durations):
+        self.tasks = tasks
+        self.task_ids = task_ids
+        self.days = days
+        self.durations = durations
+
+    @classmethod
+    def from_store(cls, store):
+        tasks, task_ids, stamps, durations = store.columns()
+        stamps = np.frombuffer(stamps, dtype=np.int64)
+        days = np.where(stamps >= 0, stamps // 1000000, -1)
+        return cls(tasks, np.frombuffer(task_ids, dtype=np.int64), days,
+                   np.frombuffer(durations, dtype=np.int64))
+
+    @classmethod
+    def load(cls, path, parse_row=parse_row_any):
+        store = HistoryStore(path, parse_row)
+        store.refresh()
+        return cls.from_store(store)
+
+    def _select(self, start, end, dated):
+        """Row mask for days in [start, end] (YYYYMMDD ints or None), or None for all rows."""
+        if start is None and end is None and not dated:
+            return None
+        mask = self.days >= 0
+        if start is not None:
+            mask &= self.days >= start
+        if end is not None:
+            mask &= self.days <= end
+        return mask
+
+    def _rollup(self, keys, start, end, dated=True):
+        durations = self.durations
+        mask = self._select(start, end, dated)
+        if mask is not None:
+            keys, durations = keys[mask], durations[mask]
+        return _group_sum(keys, durations)
+
+    def task_totals(self, start=None, end=None):
+        ids, totals = self._rollup(self.task_ids, start, end, dated=False)
+        return [(self.tasks[i], int(t)) for i, t in zip(ids.tolist(), totals.tolist())]
+
+    def day_totals(self, start=None, end=None):
+        days, totals = self._rollup(self.days, start, end)
+        return [(f"{d // 10000:04}-{d // 100 % 100:02}-{d % 100:02}", t)
+                for d, t in zip(days.tolist(), totals.tolist())]
+
+    def week_totals(self, start=None, end=None):
+        mask = self._select(start, end, True)
+        days, durations = self.days[mask], self.durations[mask]
+        if not len(days):
+            return []
+        # ISO weeks are computed per calendar day, then looked up per row
+        low, high = int(days.min()), int(days.max())
+        if high - low < max(len(days), 1 << 20):
+            weeks = _iso_weeks(np.arange(low, high + 1))[days - low]
+        else:
+            unique, inverse = np.unique(days, return_inverse=True)
+            weeks = _iso_weeks(unique)[inverse.reshape(-1)]
+        keys, totals = _group_sum(weeks, durations)
+        return [(f"{w // 100}-W{w % 100:02}", t) for w, t in zip(keys.tolist(), totals.tolist())]
+
+    def month_totals(self, start=None, end=None):
+        months, totals = self._rollup(self.days // 100, start, end)
+        return [(f"{m // 100:04}-{m % 100:02}", t) for m, t in zip(months.tolist(), totals.tolist())]
+
+    def top_tasks(self, n=3, start=None, end=None):
+        """The ``n`` tasks with the most time, ties in first-seen order."""
+        ids, totals = self._rollup(self.task_ids, start, end, dated=False)
+        order = np.argsort(-totals, kind='stable')[:n]
+        return [(self.tasks[i], int(t)) for i, t in zip(ids[order].tolist(), totals[order].tolist())]
+
+
+def parse_row_spans(row):
+    """Either layout, plus the session's exact active seconds and wall-clock span.
+
+    Rows with segments in an eighth column give both exactly; other 7-column
+    rows span from their start to their end columns, 5-column rows just their
+    duration.  ``SpanTotals`` refines these from the ``<log>.segments`` sidecar.
+    """
+    parsed = parse_row_any(row)
+    if parsed is None:
+        return None
+    duration = parsed[4]
+    segments = parse_segments(row[7]) if len(row) > 7 else []
+    if segments:
+        return parsed + segment_span(segments)
+    span = duration
+    if len(row) >= 7:
+        try:
+            span = (datetime.strptime(f"{row[2]} {row[3]}", TIMESTAMP_FORMAT)
+                    - datetime.strptime(f"{row[0]} {row[1]}", TIMESTAMP_FORMAT)).total_seconds()
+        except ValueError:
+            pass
+    return parsed + (duration, span)
+
+
+def segment_span(segments):
+    """``(active seconds, wall-clock span)`` of ``[(start, seconds)]``."""
+    start, (last_start, last_seconds) = segments[0][0], segments[-1]
+    return sum(seconds for _, seconds in segments), last_start + last_seconds - start
+
+
+class SpanTotals(LogFollower):
+    """Per task: sessions, exact active seconds and wall-clock span (pure Python)."""
+
+    def __init__(self, path, encoding='utf-8'):
+        self.segments = {}
+        super().__init__(path, parse_row_spans, encoding)
+
+    def clear(self):
+        self.totals = {}
+
+    def refresh(self):
+        self.segments = read_segments(self.path)
+        return super().refresh()
+
+    def add(self, parsed):
+        date, time_str, task, _, duration, active, span = parsed
+        segments = self.segments.get((date, time_str, duration))
+        if segments:
+            active, span = segment_span(segments)
+        totals = self.totals.setdefault(task, [0, 0.0, 0.0])
+        totals[0] += 1
+        totals[1] += active
+        totals[2] += span
+
+
+def format_spans(totals):
+    result = "Active vs wall-clock time by task:\n"
+    for task, (sessions, active, span) in totals.items():
+        share = f"{active / span:.0%}" if span else "-"
+        result += (f"{task}: {sessions} sessions, {active / 60:.1f} active minutes"
+                   f" over {span / 60:.1f} minutes ({share} active)\n")
+    return result
+
+
+def format_report(title, rows):
+    result = f"{title}:\n"
+    for label, total_sec in rows:
+        result += f"{label}: {total_sec // 60} minutes\n"
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print time totals from the task log.")
+    parser.add_argument('--log', default='task_log.csv')
+    parser.add_argument('--layout', choices=sorted(LAYOUTS), default='any',
+                        help="v1: only 5-column rows (task-timer.py, v1-v3); v4: only 7-column rows")
+    parser.add_argument('--by', choices=['task', 'day', 'week', 'month'], default='task')
+    parser.add_argument('--from', dest='start', type=parse_day, help="first day, YYYY-MM-DD")
+    parser.add_argument('--to', dest='end', type=parse_day, help="last day, YYYY-MM-DD")
+    parser.add_argument('--top', type=int, help="only the N tasks with the most time")
+    parser.add_argument('--spans', action='store_true',
+                        help="exact active time vs wall-clock span per task (any layout, no NumPy)")
+    args = parser.parse_args(argv)
+    if args.spans:
+        spans = SpanTotals(args.log)
+        spans.refresh()
+        print(format_spans(spans.totals), end="")
+        return 0
+    if np is None:
+        print("task_report.py needs NumPy: pip install numpy", file=sys.stderr)
+        return 1
+
+    sessions = SessionArrays.load(args.log, LAYOUTS[args.layout])
+    if args.top:
+        print(format_report(f"Top {args.top} tasks", sessions.top_tasks(args.top, args.start, args.end)), end="")
+        return 0
+    rollup = getattr(sessions, f"{args.by}_totals")
+    print(format_report(f"Total time by {args.by}", rollup(args.start, args.end)), end="")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
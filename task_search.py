@@ -0,0 +1,207 @@
+"""In-memory search over task names and session comments.
+
+``SearchIndex`` is an inverted index: every lower-cased word of a task name
+or comment maps to the ids of the sessions containing it.  Each query word
+matches as a prefix (``tick`` finds ``ticket``, ``12`` finds ``#1234``);
+all words must match.  A query may also carry ``from:YYYY-MM-DD`` and
+``to:YYYY-MM-DD`` to restrict session start dates.  The index is built once
+from ``read_task_history`` and kept current with ``add`` as sessions are
+saved, so a search never touches the log.
+
+``suggest`` serves type-ahead on the task entry: tasks whose name has a
+word starting with each typed word, most recently used first.
+
+    python task_search.py task_log.csv "ABC-12 from:2026-01-01"
+"""
+import argparse
+import re
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+
+from task_history import canonical_stamp, get_store, parse_day, stamp_key
+
+_WORD = re.compile(r"\w+")
+
+
+def tokens(text):
+    """Lower-cased words of ``text``, each once, in order."""
+    return list(dict.fromkeys(_WORD.findall(text.lower())))
+
+
+def parse_query(text):
+    """``(words, start, end)``; start/end are YYYYMMDD ints or None."""
+    words, start, end = [], None, None
+    for part in text.split():
+        key, _, value = part.partition(':')
+        if key.lower() in ('from', 'to') and value:
+            try:
+                day = parse_day(value)
+            except ValueError:
+                pass  # not a date after all: search for it as text
+            else:
+                if key.lower() == 'from':
+                    start = day
+                else:
+                    end = day
+                continue
+        words.extend(tokens(part))
+    return words, start, end
+
+
+class SearchIndex:
+    """Token -> session ids over ``(date, time, task, comment, duration)`` sessions."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sessions = []
+        self._stamps = array('q')
+        self._postings = {}      # word -> session ids in ascending order
+        self._words = []         # sorted keys of _postings, for prefix ranges
+        self._task_words = {}    # word -> task names containing it
+        self._task_word_list = []
+        self.last_seen = {}      # task -> latest start stamp
+
+    @classmethod
+    def from_history(cls, history):
+        """Build from ``{task: [(date, time, comment, duration)]}``."""
+        index = cls()
+        # add() one session at a time, minus the lock and the sorted-word upkeep
+        index._words = None
+        index._task_word_list = None
+        for task, sessions in history.items():
+            for date, time_str, comment, duration in sessions:
+                index._add((date, time_str, task, comment, duration))
+        index._words = sorted(index._postings)
+        index._task_word_list = sorted(index._task_words)
+        return index
+
+    def add(self, parsed):
+        """Index one ``(date, time, task, comment, duration)`` session."""
+        with self._lock:
+            self._add(parsed)
+
+    def _add(self, parsed):
+        date, time_str, task, comment, duration = parsed
+        stamp = canonical_stamp(date, time_str)
+        if stamp < 0:
+            try:
+                stamp = stamp_key(date, time_str)
+            except ValueError:
+                stamp = -1
+        session_id = len(self.sessions)
+        self.sessions.append(parsed)
+        self._stamps.append(stamp)
+        postings = self._postings
+        for word in tokens(f"{task} {comment}"):
+            ids = postings.get(word)
+            if ids is None:
+                ids = postings[word] = array('q')
+                if self._words is not None:
+                    insort(self._words, word)
+            ids.append(session_id)
+        if task not in self.last_seen:
+            for word in tokens(task):
+                names = self._task_words.get(word)
+                if names is None:
+                    names = self._task_words[word] = set()
+                    if self._task_word_list is not None:
+                        insort(self._task_word_list, word)
+                names.add(task)
+        if stamp > self.last_seen.get(task, -2):
+            self.last_seen[task] = stamp
+
+    @staticmethod
+    def _prefixed(words, prefix):
+        i = bisect_left(words, prefix)
+        while i < len(words) and words[i].startswith(prefix):
+            yield words[i]
+            i += 1
+
+    def _matching(self, word):
+        # Session ids of every indexed word starting with ``word``
+        lists = [self._postings[w] for w in self._prefixed(self._words, word)]
+        if len(lists) == 1:
+            return set(lists[0])
+        ids = set()
+        for ids_of_word in lists:
+            ids.update(ids_of_word)
+        return ids
+
+    def search(self, query, start=None, end=None, limit=None):
+        """Sessions matching ``query`` (text, optionally with from:/to:), in index order.
+
+        ``start``/``end`` (YYYYMMDD) narrow the range further; an empty
+        query with a range returns every session in it.
+        """
+        words, query_start, query_end = parse_query(query)
+        start = query_start if start is None else start
+        end = query_end if end is None else end
+        low = start * 1000000 if start is not None else None
+        high = end * 1000000 + 235959 if end is not None else None
+        with self._lock:
+            if words:
+                ids = None
+                for word in sorted(words, key=len, reverse=True):
+                    matched = self._matching(word)
+                    ids = matched if ids is None else ids & matched
+                    if not ids:
+                        return []
+                ids = sorted(ids)
+            elif low is not None or high is not None:
+                ids = range(len(self.sessions))
+            else:
+                return []
+            results = []
+            stamps = self._stamps
+            for session_id in ids:
+                if low is not None or high is not None:
+                    stamp = stamps[session_id]
+                    if stamp < 0 or (low is not None and stamp < low) or (high is not None and stamp > high):
+                        continue
+                results.append(self.sessions[session_id])
+                if limit is not None and len(results) >= limit:
+                    break
+            return results
+
+    def suggest(self, text, n=5):
+        """Up to ``n`` task names matching every typed word as a word prefix, newest first."""
+        words = tokens(text)
+        if not words:
+            return []
+        with self._lock:
+            names = None
+            for word in words:
+                matched = set()
+                for w in self._prefixed(self._task_word_list, word):
+                    matched |= self._task_words[w]
+                names = matched if names is None else names & matched
+                if not names:
+                    return []
+            return sorted(names, key=lambda task: (-self.last_seen[task], task))[:n]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search sessions by task name and comment.")
+    parser.add_argument('log', nargs='?', default='task_log.csv')
+    parser.add_argument('query', help='words (prefix match) plus optional from:/to: dates')
+    parser.add_argument('--limit', type=int, default=50)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    store = get_store(args.log)
+    index = SearchIndex.from_history(store.history)
+    built = time.perf_counter()
+    results = index.search(args.query)
+    searched = time.perf_counter()
+    for date, time_str, task, comment, duration in results[:args.limit]:
+        print(f"{date} {time_str}  {task} - {duration // 60} min - {comment}")
+    print(f"{len(results)} sessions; index built in {built - started:.2f} s, "
+          f"searched in {(searched - built) * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,425 @@
+"""Local HTTP/JSON service that owns the task log.
+
+Several timer processes appending to one CSV on their own can interleave or
+tear rows.  ``TimerServer`` runs on asyncio, bound to localhost or a Unix
+socket, keeps the running timers in memory and funnels every write (finished
+sessions, renames) through one queue drained by a single writer thread.  The
+writer appends whatever has queued up, then flushes and fsyncs once for the
+whole batch, so many concurrent clients share each disk sync.
+
+    python task_server.py --log task_log.csv --port 8765
+    python task_server.py --unix /tmp/task-timer.sock
+    TASK_TIMER_SERVER=127.0.0.1:8765 python task-timer-v4.py
+
+Endpoints (JSON bodies and responses):
+
+    GET  /timers                      running timers
+    GET  /timers/ID                   one timer
+    POST /timers/ID/start             {"task": ..., "comment": ...}
+    POST /timers/ID/pause             (a no-op if already paused)
+    POST /timers/ID/resume            (a no-op if not paused)
+    POST /timers/ID/stop              saves the session, returns it; {"comment"} optional
+    POST /sessions                    {"task", "comment", "start_time", "duration", "segments"}
+    POST /rename                      {"old": ..., "new": ...}
+    GET  /report?by=task|day          {label: seconds}
+    GET  /recent?n=3                  [[task, total seconds, last comment]]
+    GET  /history                     {task: [[date, time, comment, duration]]}
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import socket
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+from task_core import TaskTimer, session_row
+from task_history import SessionWriter, get_store, get_totals, rename_task
+
+DEFAULT_PORT = 8765
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           409: "Conflict", 500: "Internal Server Error"}
+
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def timer_state(timer_id, timer):
+    return {'id': timer_id, 'task': timer.task, 'comment': timer.comment,
+            'start_time': timer.start_time, 'paused': timer.paused,
+            'elapsed': timer.elapsed()}
+
+
+class TimerServer:
+    """Timers and the log behind one asyncio server."""
+
+    def __init__(self, log='task_log.csv', fsync=True):
+        self.log = log
+        self.timers = {}
+        self.stopping = set()  # timers whose stop is waiting for its row to be written
+        # Every file access (writes and reads) runs on this one thread, in
+        # submission order, so a read issued after a write sees it.
+        self.io = ThreadPoolExecutor(max_workers=1)
+        self.writer = SessionWriter(log, flush_every=1 << 30, fsync=fsync)
+        self.writes = None
+        self.server = None
+
+    async def start(self, host='127.0.0.1', port=DEFAULT_PORT, unix_path=None):
+        self.writes = asyncio.Queue()
+        self._writer_task = asyncio.create_task(self._drain_writes())
+        if unix_path:
+            self.server = await asyncio.start_unix_server(self.handle, unix_path)
+        else:
+            self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+        await self.writes.join()
+        self._writer_task.cancel()
+        await asyncio.get_running_loop().run_in_executor(self.io, self.writer.close)
+        self.io.shutdown()
+
+    # Single writer
+
+    async def write(self, op, *args):
+        """Queue a write and wait until it is on disk."""
+        done = asyncio.get_running_loop().create_future()
+        await self.writes.put((op, args, done))
+        return await done
+
+    async def _drain_writes(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.writes.get()]
+            while not self.writes.empty():
+                batch.append(self.writes.get_nowait())
+            try:
+                results = await loop.run_in_executor(self.io, self._write_batch, batch)
+            except Exception as e:
+                # This task must outlive any error: every later write() waits on it
+                results = [(e, None)] * len(batch)
+            for (_, _, done), (error, result) in zip(batch, results):
+                if not done.cancelled():
+                    if error is not None:
+                        done.set_exception(error)
+                    else:
+                        done.set_result(result)
+                self.writes.task_done()
+
+    def _write_batch(self, batch):
+        results = []
+        for op, args, _ in batch:
+            try:
+                if op == 'row':
+                    self.writer.write(*args)
+                    result = None
+                else:
+                    self.writer.flush()
+                    result = rename_task(self.log, *args)
+                results.append((None, result))
+            except Exception as e:
+                results.append((e, None))
+        try:
+            self.writer.flush()
+        except Exception as e:
+            # None of the batch's rows is known to be on disk
+            results = [(e, None) if op == 'row' else result
+                       for (op, _, _), result in zip(batch, results)]
+        return results
+
+    async def read(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.io, func, *args)
+
+    # HTTP
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    method, target, version, headers, body = await self.read_request(line, reader)
+                except ValueError as e:
+                    # Unparseable request line or headers: answer, then drop the connection
+                    await self.respond(writer, 400, {'error': f"bad request: {e}"}, keep_alive=False)
+                    break
+                status, payload = await self.dispatch(method, target, body)
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass  # a dropped connection or an over-long line
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def read_request(line, reader):
+        """``(method, target, version, headers, body)``; ValueError if malformed."""
+        parts = line.decode('latin-1').split()
+        if len(parts) != 3:
+            raise ValueError(f"malformed request line {line[:80]!r}")
+        method, target, version = parts
+        headers = {}
+        while True:
+            header = await reader.readline()
+            if header in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = header.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get('content-length', 0))
+        if length < 0:
+            raise ValueError(f"negative Content-Length {length}")
+        body = await reader.readexactly(length) if length else b''
+        return method, target, version, headers, body
+
+    @staticmethod
+    async def respond(writer, status, payload, keep_alive=True):
+        data = json.dumps(payload).encode()
+        head = (f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n")
+        if not keep_alive:
+            head += "Connection: close\r\n"
+        writer.write(head.encode('latin-1') + b'\r\n' + data)
+        await writer.drain()
+
+    async def dispatch(self, method, target, body):
+        url = urlsplit(target)
+        parts = [unquote(p) for p in url.path.strip('/').split('/')]
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            payload = json.loads(body) if body else {}
+            if not isinstance(payload, dict):
+                raise RequestError(400, "request body must be a JSON object")
+            if parts[0] == 'timers':
+                return 200, await self.timer_request(method, parts[1:], payload)
+            route = getattr(self, f"{method.lower()}_{parts[0]}", None)
+            if route is None or len(parts) != 1:
+                raise RequestError(404, f"no route for {method} {url.path}")
+            return 200, await route(payload, query)
+        except RequestError as e:
+            return e.status, {'error': str(e)}
+        except (ValueError, KeyError, TypeError) as e:
+            return 400, {'error': f"bad request: {e}"}
+        except Exception as e:
+            return 500, {'error': str(e)}
+
+    async def timer_request(self, method, parts, payload):
+        if not parts:
+            if method != 'GET':
+                raise RequestError(405, "use GET /timers")
+            return [timer_state(i, t) for i, t in self.timers.items()]
+        timer_id, action = parts[0], (parts[1] if len(parts) > 1 else None)
+        timer = self.timers.get(timer_id)
+        if action is None and method == 'GET':
+            if timer is None:
+                raise RequestError(404, f"no timer {timer_id!r}")
+            return timer_state(timer_id, timer)
+        if method != 'POST' or action not in ('start', 'pause', 'resume', 'stop'):
+            raise RequestError(405, f"unsupported {method} on timer {timer_id!r}")
+        if action == 'start':
+            if timer is not None:
+                raise RequestError(409, f"timer {timer_id!r} is already running" if timer.running
+                                   else f"timer {timer_id!r} has an unsaved session; stop it again")
+            task = payload['task'].strip()
+            if not task:
+                raise ValueError("empty task name")
+            timer = self.timers[timer_id] = TaskTimer()
+            timer.start(task, payload.get('comment', "").strip())
+            return timer_state(timer_id, timer)
+        if timer is None:
+            raise RequestError(409, f"timer {timer_id!r} is not running")
+        # Pause and resume are idempotent (TaskTimer ignores them in the wrong state), so a
+        # retried request never flips the timer back
+        if action == 'pause':
+            timer.pause()
+        elif action == 'resume':
+            timer.resume()
+        else:
+            if timer_id in self.stopping:
+                raise RequestError(409, f"timer {timer_id!r} is already being stopped")
+            # The timer is forgotten only once its row is on disk, so a failed stop can be retried
+            self.stopping.add(timer_id)
+            try:
+                task, comment, start_time, duration = timer.stop()
+                comment = payload.get('comment', comment)
+                await self.write('row', session_row(task, comment, start_time, duration, timer.segments),
+                                 timer.segments)
+            finally:
+                self.stopping.discard(timer_id)
+            del self.timers[timer_id]
+            return {'task': task, 'comment': comment, 'start_time': start_time, 'duration': duration,
+                    'segments': timer.segments}
+        return timer_state(timer_id, timer)
+
+    async def post_sessions(self, payload, query):
+        # Optional [[start, seconds]] active segments, kept in the log's segments sidecar
+        segments = [[float(start), float(seconds)] for start, seconds in payload.get('segments') or []]
+        row = session_row(payload['task'], payload.get('comment', ""),
+                          float(payload['start_time']), int(payload['duration']), segments)
+        await self.write('row', row, segments)
+        return {'saved': row}
+
+    async def post_rename(self, payload, query):
+        await self.write('rename', payload['old'], payload['new'])
+        return {'renamed': [payload['old'], payload['new']]}
+
+    async def get_report(self, payload, query):
+        by = query.get('by', 'task')
+        if by not in ('task', 'day'):
+            raise ValueError("by must be task or day")
+        return await self.read(self._report, by)
+
+    async def get_recent(self, payload, query):
+        return await self.read(self._recent, int(query.get('n', 3)))
+
+    async def get_history(self, payload, query):
+        return await self.read(self._history)
+
+    def _report(self, by):
+        totals = get_totals(self.log)
+        return dict(totals.task_totals if by == 'task' else totals.day_totals)
+
+    def _recent(self, n):
+        return [list(recent) for recent in get_totals(self.log).recent(n)]
+
+    def _history(self):
+        history = get_store(self.log).history
+        return {task: [list(s) for s in sessions] for task, sessions in history.items()}
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout):
+        super().__init__('localhost', timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+
+class ServerError(Exception):
+    """An error response from the timer server."""
+
+
+class TimerClient:
+    """Blocking client for ``TimerServer``; ``address`` is "host:port" or "unix:/path".
+
+    One keep-alive connection, shared between threads under a lock.
+    """
+
+    def __init__(self, address, timeout=10):
+        self.address = address
+        self.timeout = timeout
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self.address.startswith('unix:'):
+            return UnixHTTPConnection(self.address[5:], self.timeout)
+        host, _, port = self.address.rpartition(':')
+        return http.client.HTTPConnection(host or '127.0.0.1', int(port or DEFAULT_PORT),
+                                          timeout=self.timeout)
+
+    def request(self, method, path, payload=None):
+        body = json.dumps(payload).encode() if payload is not None else None
+        headers = {'Content-Type': 'application/json'} if body else {}
+        with self._lock:
+            for attempt in range(2):
+                if self._conn is None:
+                    self._conn = self._connect()
+                try:
+                    self._conn.request(method, path, body, headers)
+                    response = self._conn.getresponse()
+                    data = json.loads(response.read())
+                    break
+                except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                    # A keep-alive connection the server already dropped: reconnect once
+                    self._conn.close()
+                    self._conn = None
+                    if attempt:
+                        raise
+        if response.status != 200:
+            raise ServerError(data.get('error', response.reason))
+        return data
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def start(self, timer_id, task, comment=""):
+        return self.request('POST', f"/timers/{quote(timer_id, safe='')}/start",
+                            {'task': task, 'comment': comment})
+
+    def pause(self, timer_id):
+        return self.request('POST', f"/timers/{quote(timer_id, safe='')}/pause")
+
+    def resume(self, timer_id):
+        return self.request('POST', f"/timers/{quote(timer_id, safe='')}/resume")
+
+    def stop(self, timer_id, comment=None):
+        payload = {'comment': comment} if comment is not None else None
+        return self.request('POST', f"/timers/{quote(timer_id, safe='')}/stop", payload)
+
+    def status(self, timer_id=None):
+        if timer_id is None:
+            return self.request('GET', "/timers")
+        return self.request('GET', f"/timers/{quote(timer_id, safe='')}")
+
+    def save(self, task, comment, start_time, duration, segments=None):
+        return self.request('POST', "/sessions", {'task': task, 'comment': comment,
+                                                  'start_time': start_time, 'duration': duration,
+                                                  'segments': segments or []})
+
+    def rename(self, old_name, new_name):
+        return self.request('POST', "/rename", {'old': old_name, 'new': new_name})
+
+    def report(self, by='task'):
+        return self.request('GET', f"/report?by={by}")
+
+    def recent(self, n=3):
+        return self.request('GET', f"/recent?n={n}")
+
+    def history(self):
+        return self.request('GET', "/history")
+
+
+async def serve(args):
+    server = TimerServer(args.log, fsync=not args.no_fsync)
+    await server.start(args.host, args.port, args.unix)
+    where = args.unix or f"{args.host}:{args.port}"
+    print(f"Serving {args.log} on {where}", flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the task log to timer clients.")
+    parser.add_argument('--log', default='task_log.csv')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--unix', metavar='PATH', help="listen on a Unix socket instead of TCP")
+    parser.add_argument('--no-fsync', action='store_true', help="flush batches without fsync")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
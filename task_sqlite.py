@@ -0,0 +1,226 @@
+"""Optional SQLite storage for task sessions.
+
+The CSV log answers every query with a full scan and renames by rewriting the
+whole file.  ``SessionDB`` keeps the same sessions in a WAL-mode SQLite file
+with indexes on task, start time and date, so history lookups and renames
+are indexed operations.  A small ``last_seen`` table, one row per task kept
+up to date on every insert and rename, answers the recent-task top-k with an
+index scan instead of grouping every session.  ``import_csv`` does a one-shot
+import of an existing 5-column (v1-v3) or 7-column (v4) ``task_log.csv``.
+
+Usage: python task_sqlite.py import task_log.csv task_log.db
+"""
+import os
+import sqlite3
+import sys
+import threading
+from collections import defaultdict
+from datetime import datetime
+
+from task_history import (TIMESTAMP_FORMAT, format_segments, parse_row_any, read_rows, read_segments,
+                          stamp_key)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    start_date TEXT NOT NULL,
+    start_time TEXT NOT NULL,
+    end_date TEXT,
+    end_time TEXT,
+    task TEXT NOT NULL,
+    comment TEXT NOT NULL,
+    duration INTEGER NOT NULL,
+    start_key INTEGER,
+    segments TEXT
+);
+CREATE INDEX IF NOT EXISTS sessions_task ON sessions (task, start_key);
+CREATE INDEX IF NOT EXISTS sessions_start ON sessions (start_key);
+CREATE INDEX IF NOT EXISTS sessions_date ON sessions (start_date);
+CREATE TABLE IF NOT EXISTS last_seen (
+    task TEXT PRIMARY KEY,
+    first_id INTEGER NOT NULL,
+    last_key INTEGER,
+    bad_id INTEGER
+);
+CREATE INDEX IF NOT EXISTS last_seen_recent ON last_seen (last_key DESC, first_id);
+CREATE INDEX IF NOT EXISTS last_seen_bad ON last_seen (first_id) WHERE bad_id IS NOT NULL;
+CREATE TABLE IF NOT EXISTS imports (
+    path TEXT PRIMARY KEY,
+    rows INTEGER NOT NULL
+);
+"""
+
+# Folds the sessions matching a WHERE clause into last_seen: per task the first row id, the newest
+# start_key and the first row whose start timestamp did not parse (start_key NULL)
+TOUCH_LAST_SEEN = """
+INSERT INTO last_seen (task, first_id, last_key, bad_id)
+SELECT task, MIN(id), MAX(start_key), MIN(CASE WHEN start_key IS NULL THEN id END)
+FROM sessions WHERE {} GROUP BY task
+ON CONFLICT (task) DO UPDATE SET
+    last_key = CASE WHEN last_key IS NULL OR excluded.last_key > last_key
+               THEN excluded.last_key ELSE last_key END,
+    bad_id = COALESCE(bad_id, excluded.bad_id)
+"""
+
+
+def _key_or_none(date, time_str):
+    try:
+        return stamp_key(date, time_str)
+    except ValueError:
+        return None
+
+
+class SessionDB:
+    """Sessions stored in one SQLite file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        migrate = not self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'last_seen'").fetchone()
+        self.conn.executescript(SCHEMA)
+        if migrate:
+            # Databases created before last_seen existed (a no-op on new ones)
+            with self.conn:
+                self.conn.execute(TOUCH_LAST_SEEN.format("id > 0"))
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(sessions)")]
+        if 'segments' not in columns:
+            # Databases created before active segments were recorded
+            with self.conn:
+                self.conn.execute("ALTER TABLE sessions ADD COLUMN segments TEXT")
+
+    def close(self):
+        self.conn.close()
+
+    def save(self, date, time_str, task, comment, duration, end_date=None, end_time=None,
+             segments=None):
+        """Insert one session; ``segments`` is the v4 eighth column (``format_segments``)."""
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO sessions (start_date, start_time, end_date, end_time, task, comment,"
+                " duration, start_key, segments) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (date, time_str, end_date, end_time, task, comment, duration,
+                 _key_or_none(date, time_str), segments))
+            self.conn.execute(TOUCH_LAST_SEEN.format("id = ?"), (cursor.lastrowid,))
+
+    def history(self):
+        """``{task: [(date, time, comment, duration)]}`` in log order, like ``read_task_history``."""
+        history = defaultdict(list)
+        for task, date, time_str, comment, duration in self.conn.execute(
+                "SELECT task, start_date, start_time, comment, duration FROM sessions ORDER BY id"):
+            history[task].append((date, time_str, comment, duration))
+        return history
+
+    def sessions(self, task):
+        return [tuple(row) for row in self.conn.execute(
+            "SELECT start_date, start_time, comment, duration FROM sessions"
+            " WHERE task = ? ORDER BY id", (task,))]
+
+    def last_comment(self, task):
+        """Comment of the last session logged for ``task`` ("" if none)."""
+        row = self.conn.execute(
+            "SELECT comment FROM sessions WHERE task = ? ORDER BY id DESC LIMIT 1", (task,)).fetchone()
+        return row[0] if row else ""
+
+    def task_total(self, task):
+        """Seconds logged for ``task`` (0 if none)."""
+        return self.conn.execute(
+            "SELECT COALESCE(SUM(duration), 0) FROM sessions WHERE task = ?", (task,)).fetchone()[0]
+
+    def task_totals(self):
+        return dict(self.conn.execute(
+            "SELECT task, SUM(duration) FROM sessions GROUP BY task ORDER BY MIN(id)"))
+
+    def recent_tasks(self, n=3):
+        """Names of the ``n`` most recently used tasks, newest first.
+
+        Same ordering as ``TotalsStore.recent_tasks``: ties keep the order in
+        which tasks first appear, and an unparseable start timestamp raises
+        the ValueError ``strptime`` would raise.
+        """
+        bad = self.conn.execute(
+            "SELECT start_date, start_time FROM last_seen JOIN sessions ON sessions.id = bad_id"
+            " WHERE bad_id IS NOT NULL ORDER BY first_id LIMIT 1").fetchone()
+        if bad:
+            datetime.strptime(bad[0] + " " + bad[1], TIMESTAMP_FORMAT)
+        return [task for task, in self.conn.execute(
+            "SELECT task FROM last_seen ORDER BY last_key DESC, first_id LIMIT ?", (n,))]
+
+    def rename_task(self, old_name, new_name):
+        with self.conn:
+            self.conn.execute("UPDATE sessions SET task = ? WHERE task = ?", (new_name, old_name))
+            self.conn.execute("DELETE FROM last_seen WHERE task IN (?, ?)", (old_name, new_name))
+            self.conn.execute(TOUCH_LAST_SEEN.format("task IN (?, ?)"), (old_name, new_name))
+
+    def import_csv(self, csv_path, encoding='utf-8'):
+        """Import a v1-style (5-column) or v4-style (7-column) CSV log once.
+
+        Rows of either layout may be mixed; the magic line and broken rows are
+        skipped like the CSV readers skip them, and renames still pending in
+        the log's alias table are applied.  Segments come from the log's
+        ``.segments`` sidecar (or an eighth column).  Returns the number of
+        imported rows, or None if ``csv_path`` was imported before.
+        """
+        source = os.path.abspath(csv_path)
+        if self.conn.execute("SELECT 1 FROM imports WHERE path = ?", (source,)).fetchone():
+            return None
+        recorded = read_segments(csv_path)
+        with self.conn:
+            count = 0
+            batch = []
+            for row in read_rows(csv_path, encoding):
+                parsed = parse_row_any(row)
+                if parsed is None:
+                    continue
+                date, time_str, task, comment, duration = parsed
+                end_date, end_time = (row[2], row[3]) if len(row) >= 7 else (None, None)
+                segments = row[7] if len(row) >= 8 else None
+                if segments is None and (date, time_str, duration) in recorded:
+                    segments = format_segments(recorded[date, time_str, duration])
+                batch.append((date, time_str, end_date, end_time, task, comment, duration,
+                              _key_or_none(date, time_str), segments))
+                if len(batch) >= 10000:
+                    count += self._insert(batch)
+            count += self._insert(batch)
+            self.conn.execute("INSERT INTO imports (path, rows) VALUES (?, ?)", (source, count))
+        return count
+
+    def _insert(self, batch):
+        last_id = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM sessions").fetchone()[0]
+        self.conn.executemany(
+            "INSERT INTO sessions (start_date, start_time, end_date, end_time, task, comment,"
+            " duration, start_key, segments) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+        self.conn.execute(TOUCH_LAST_SEEN.format("id > ?"), (last_id,))
+        count = len(batch)
+        batch.clear()
+        return count
+
+
+_dbs = {}
+
+
+def get_db(path):
+    """Return this thread's connection for ``path`` (sqlite3 connections are per-thread)."""
+    key = (os.path.abspath(path), threading.get_ident())
+    db = _dbs.get(key)
+    if db is None:
+        db = _dbs[key] = SessionDB(path)
+    return db
+
+
+def main(argv):
+    if len(argv) != 3 or argv[0] != 'import':
+        print("usage: python task_sqlite.py import LOG.csv DB.sqlite")
+        return 2
+    count = get_db(argv[2]).import_csv(argv[1])
+    if count is None:
+        print(f"{argv[1]} was already imported into {argv[2]}")
+    else:
+        print(f"imported {count} sessions into {argv[2]}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,85 @@
+import csv
+
+import pytest
+
+from task_binlog import RECORD_SIZE, BinaryLog
+from task_history import HistoryStore, rename_task
+
+ROWS = [
+    ['2025-01-06', '09:00:00', '2025-01-06', '09:30:00', 'Write report', 'draft', 1800],
+    ['2025-01-06', '10:00:00', '2025-01-06', '10:15:00', 'Email', '', 900],
+    ['2025-01-07', '09:00:00', 'Review', 'v1 row, quoted', 600],
+    ['2025-01-07', '11:00:00', '2025-01-07', '12:00:00', 'Write report', 'edit', 3600],
+]
+
+
+def history(source):
+    return {task: list(sessions) for task, sessions in source.history.items()}
+
+
+@pytest.fixture
+def log(tmp_path):
+    path = tmp_path / 'task_log.csv'
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerows(ROWS + [['not a date', '??', 'Email', '', 5]])
+    return str(path)
+
+
+def csv_history(path):
+    store = HistoryStore(path)
+    store.refresh()
+    return history(store)
+
+
+def test_import_and_export_round_trip(log, tmp_path):
+    binlog = BinaryLog(str(tmp_path / 'task_log.tlog'))
+    assert binlog.import_csv(log) == (4, 1)
+    expected = csv_history(log)
+    del expected['Email'][-1]  # no epoch for an unparseable timestamp
+    assert history(binlog) == expected
+    assert binlog.task_totals == {'Write report': 5400, 'Email': 900, 'Review': 600}
+    assert binlog.recent_tasks(2) == ['Write report', 'Review']
+    exported = str(tmp_path / 'exported.csv')
+    assert binlog.export_csv(exported) == 4
+    assert csv_history(exported) == expected
+
+
+def test_import_applies_pending_renames(log, tmp_path):
+    rename_task(log, 'Email', 'Write report')
+    rename_task(log, 'Review', 'Reviews')
+    binlog = BinaryLog(str(tmp_path / 'task_log.tlog'))
+    binlog.import_csv(log)
+    assert list(binlog.history) == ['Write report', 'Reviews']
+    assert binlog.task_totals == {'Write report': 6300, 'Reviews': 600}
+
+
+def test_readers_follow_appends_and_renames(tmp_path):
+    path = str(tmp_path / 'task_log.tlog')
+    writer = BinaryLog(path)
+    reader = BinaryLog(path)
+    writer.append(1736150400, 1736152200, 'Write report', 'draft', 1800)
+    assert reader.refresh()
+    assert [comment for _, _, comment, _ in reader.history['Write report']] == ['draft']
+    writer.append(1736154000, 1736154900, 'Email', '', 900, segments=[(1736154000, 900)])
+    writer.rename_task('Email', 'Write report')
+    assert reader.refresh()
+    assert list(reader.history) == ['Write report']
+    assert len(reader.history['Write report']) == 2
+    assert reader.segments(1) == [(1736154000, 900)]
+    assert not reader.refresh()
+
+
+def test_torn_record_is_ignored_and_cut_off(tmp_path):
+    path = str(tmp_path / 'task_log.tlog')
+    writer = BinaryLog(path)
+    writer.append(1736150400, 1736152200, 'Write report', 'draft', 1800)
+    writer.close()
+    with open(path, 'ab') as f:
+        f.write(b'\x01' * (RECORD_SIZE - 3))
+    reader = BinaryLog(path)
+    reader.refresh()
+    assert reader.task_totals == {'Write report': 1800}
+    writer = BinaryLog(path)
+    writer.append(1736154000, 1736154900, 'Email', '', 900)
+    reader.refresh()
+    assert reader.task_totals == {'Write report': 1800, 'Email': 900}
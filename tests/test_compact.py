@@ -0,0 +1,75 @@
+import csv
+import os
+import shutil
+
+import pytest
+
+import task_history
+from task_history import HistoryStore, compact_log, rename_task
+
+ROWS = [
+    ['2025-01-06', '09:00:00', '2025-01-06', '09:30:00', 'Write report', 'draft', 1800],
+    ['2025-01-06', '10:00:00', '2025-01-06', '10:15:00', 'Email', '', 900],
+    ['2025-01-07', '09:00:00', '2025-01-07', '10:00:00', 'Write report', 'edit', 3600],
+    ['2025-01-07', '11:00:00', 'Review', 'v1 row', 600],
+]
+
+
+def write_log(path, rows, mode='w'):
+    with open(path, mode, newline='', encoding='utf-8') as f:
+        csv.writer(f).writerows(rows)
+
+
+def history(path):
+    store = HistoryStore(str(path))
+    store.refresh()
+    return {task: list(sessions) for task, sessions in store.history.items()}
+
+
+@pytest.fixture
+def log(tmp_path):
+    path = tmp_path / 'task_log.csv'
+    write_log(path, ROWS[:2])
+    return str(path)
+
+
+def test_compact_log_round_trip(log):
+    write_log(log, ROWS[2:], mode='a')
+    rename_task(log, 'Email', 'Mail')
+    rename_task(log, 'Review', 'Write report')
+    before = history(log)
+    assert compact_log(log)
+    assert not os.path.exists(log + '.aliases')
+    assert history(log) == before
+    assert list(before) == ['Write report', 'Mail']
+    assert not compact_log(log)
+
+
+def test_compact_log_keeps_renames_made_meanwhile(log, monkeypatch):
+    rename_task(log, 'Email', 'Mail')
+    iter_chunks = task_history.iter_chunks
+
+    def rename_midway(*args, **kwargs):
+        for i, chunk in enumerate(iter_chunks(*args, **kwargs)):
+            if i == 0:
+                write_log(log, [ROWS[1]], mode='a')
+                rename_task(log, 'Write report', 'Report')
+            yield chunk
+    monkeypatch.setattr(task_history, 'iter_chunks', rename_midway)
+    compact_log(log)
+    assert list(history(log)) == ['Report', 'Mail', 'Email']
+
+
+def test_compact_log_keeps_a_row_appended_before_the_replace(log, monkeypatch):
+    # Another process appends after the tail has been copied but before the log is swapped
+    rename_task(log, 'Email', 'Mail')
+    copyfileobj = shutil.copyfileobj
+
+    def append_after(src, dst):
+        copyfileobj(src, dst)
+        write_log(log, [ROWS[3]], mode='a')
+    monkeypatch.setattr(shutil, 'copyfileobj', append_after)
+    assert compact_log(log)
+    assert history(log) == {'Write report': [('2025-01-06', '09:00:00', 'draft', 1800)],
+                            'Mail': [('2025-01-06', '10:00:00', '', 900)],
+                            'Review': [('2025-01-07', '11:00:00', 'v1 row', 600)]}
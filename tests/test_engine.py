@@ -0,0 +1,75 @@
+import pytest
+
+from task_core import ReplayClock, TimerEngine
+
+
+@pytest.fixture
+def clock():
+    return ReplayClock(1000.0)
+
+
+@pytest.fixture
+def saved():
+    return []
+
+
+@pytest.fixture
+def engine(saved):
+    return TimerEngine(save=lambda *session: saved.append(session))
+
+
+def test_tick_reports_changed_seconds_and_the_next_wake_up(engine, clock):
+    engine.start('a', 'Write report', clock=clock, wall=clock)
+    assert engine.tick() == ({'a': 0}, 1000)
+    clock.now += 0.25
+    assert engine.tick() == ({}, 750)
+    engine.start('b', 'Email', clock=clock, wall=clock)
+    assert engine.tick() == ({'b': 0}, 750)
+    clock.now += 0.6875
+    assert engine.tick() == ({}, 100)  # a's next second is 63 ms away: not sooner than floor_ms
+    clock.now += 0.125
+    assert engine.tick() == ({'a': 1}, 188)
+    engine.redraw('b')
+    assert engine.tick() == ({'b': 0}, 188)
+    engine.redraw()
+    assert engine.tick() == ({'a': 1, 'b': 0}, 188)
+
+
+def test_paused_timers_are_not_ticked(engine, clock):
+    engine.start('a', 'Write report', clock=clock, wall=clock)
+    engine.tick()
+    clock.now += 2.5
+    engine.pause('a')
+    assert engine.tick() == ({}, None)  # nothing counting: the loop can stop
+    assert engine.running() == ['a']
+    clock.now += 60
+    engine.resume('a')
+    assert engine.tick() == ({'a': 2}, 500)
+
+
+def test_stop_saves_and_forgets_the_timer(engine, clock, saved):
+    engine.start('a', 'Write report', 'draft', clock=clock, wall=clock)
+    with pytest.raises(ValueError):
+        engine.start('a', 'Email', clock=clock, wall=clock)
+    clock.now += 90
+    assert engine.stop('a', comment='done') == ('Write report', 'done', 1000, 90)
+    assert saved == [('Write report', 'done', 1000, 90, [[1000, 90]])]
+    assert engine.timers == {} and engine.running() == []
+    engine.start('a', 'Email', clock=clock, wall=clock)  # the id is free again
+
+
+def test_a_failed_save_keeps_the_timer_for_a_retry(clock):
+    attempts = []
+
+    def save(*session):
+        attempts.append(session)
+        if len(attempts) == 1:
+            raise OSError("disk full")
+    engine = TimerEngine(save=save)
+    engine.start('a', 'Write report', clock=clock, wall=clock)
+    clock.now += 30
+    with pytest.raises(OSError):
+        engine.stop('a')
+    assert 'a' in engine.timers
+    assert engine.stop('a') == ('Write report', '', 1000, 30)
+    assert attempts[0] == attempts[1]
@@ -0,0 +1,181 @@
+import csv
+import os
+
+import pytest
+
+import task_history
+from task_history import HistoryStore, LogFollower, TotalsStore, append_row, get_totals, rename_task
+
+ROWS = [
+    ['2025-01-06', '09:00:00', '2025-01-06', '09:30:00', 'Write report', 'draft', 1800],
+    ['2025-01-06', '10:00:00', '2025-01-06', '10:15:00', 'Email', '', 900],
+    ['2025-01-07', '09:00:00', '2025-01-07', '10:00:00', 'Write report', 'edit', 3600],
+    ['2025-01-07', '11:00:00', 'Review', 'v1 row', 600],
+]
+
+
+def write_log(path, rows, mode='w'):
+    with open(path, mode, newline='', encoding='utf-8') as f:
+        csv.writer(f).writerows(rows)
+
+
+def history(path):
+    store = HistoryStore(str(path))
+    store.refresh()
+    return {task: list(sessions) for task, sessions in store.history.items()}
+
+
+class Recorder(LogFollower):
+    """Counts full reloads and keeps every parsed row."""
+
+    def __init__(self, path):
+        self.reloads = -1
+        super().__init__(path)
+
+    def clear(self):
+        self.reloads += 1
+        self.rows = []
+
+    def add(self, parsed):
+        self.rows.append(parsed)
+
+
+@pytest.fixture
+def log(tmp_path):
+    path = tmp_path / 'task_log.csv'
+    write_log(path, ROWS[:2])
+    return str(path)
+
+
+def test_refresh_reads_only_appended_rows(log):
+    follower = Recorder(log)
+    assert follower.refresh()
+    assert [row[2] for row in follower.rows] == ['Write report', 'Email']
+    assert not follower.refresh()
+    write_log(log, ROWS[2:], mode='a')
+    assert follower.refresh()
+    assert [row[2] for row in follower.rows] == ['Write report', 'Email', 'Write report', 'Review']
+    assert follower.reloads == 1  # the first refresh only
+
+
+def test_refresh_leaves_a_partial_line_for_later(log):
+    follower = Recorder(log)
+    follower.refresh()
+    with open(log, 'a', newline='', encoding='utf-8') as f:
+        f.write('2025-01-08,09:00:00,Half')
+    follower.refresh()
+    assert len(follower.rows) == 2
+    with open(log, 'a', newline='', encoding='utf-8') as f:
+        f.write(' written,,60\r\n')
+    follower.refresh()
+    assert follower.rows[-1] == ('2025-01-08', '09:00:00', 'Half written', '', 60)
+    assert follower.reloads == 1
+
+
+def test_refresh_keeps_the_rows_around_an_invalid_byte(tmp_path):
+    path = tmp_path / 'task_log.csv'
+    path.write_bytes(b'2025-01-06,09:00:00,A,,60\r\n'
+                     b'2025-01-06,10:00:00,B,caf\xe9,60\r\n'
+                     b'2025-01-06,11:00:00,C,,60\r\n')
+    totals = TotalsStore(str(path))
+    totals.refresh()
+    assert totals.task_totals == {'A': 60, 'B': 60, 'C': 60}
+    assert totals.last_comment['B'] == 'caf\ufffd'
+    assert not totals.refresh()
+
+
+@pytest.mark.parametrize('comment', ['plain', 'quoted, "multi"\nline'])
+def test_history_reads_rows_like_csv_reader(tmp_path, comment):
+    # Plain rows are split without the csv module; a quoted field sends the chunk through it
+    path = tmp_path / 'task_log.csv'
+    rows = [[f'2025-01-{day % 28 + 1:02}', f'09:{day % 60:02}:00', 'e', 'e', f'T{day % 3}', f'c{day}', day]
+            for day in range(100)]
+    rows[40][5] = comment
+    write_log(path, rows)
+    expected = {}
+    for date, time_str, _, _, task, note, duration in rows:
+        expected.setdefault(task, []).append((date, time_str, note, duration))
+    expected['T0'].append(('9am', 'today', 'odd stamp', 5))
+    store = HistoryStore(str(path))
+    store.refresh()
+    write_log(path, [['9am', 'today', 'T0', 'odd stamp', 5], ['2025-01-09', 'x', 'T1', 'junk']], mode='a')
+    store.refresh()
+    assert {task: list(sessions) for task, sessions in store.history.items()} == expected
+    sessions = store.history['T1']
+    assert len(sessions) == 33
+    assert sessions[-1] == expected['T1'][-1]
+    assert sessions[10:15] == expected['T1'][10:15]
+    tasks, task_ids, stamps, durations = store.columns()
+    assert tasks == ['T0', 'T1', 'T2']
+    assert list(task_ids).count(0) == 35 and stamps[34] == -1
+    assert stamps[0] == 20250101090000 and sum(durations) == sum(range(100)) + 5
+
+
+def test_rename_merges_in_log_order(log):
+    write_log(log, ROWS[2:] + ROWS[1:2], mode='a')
+    store = HistoryStore(log)
+    store.refresh()
+    rename_task(log, 'Write report', 'Email')
+    store.refresh()
+    assert list(store.history) == ['Email', 'Review']
+    assert [comment for _, _, comment, _ in store.history['Email']] == ['draft', '', 'edit', '']
+
+
+def test_refresh_reloads_a_truncated_log(log):
+    follower = Recorder(log)
+    follower.refresh()
+    write_log(log, ROWS[:1])
+    assert follower.refresh()
+    assert [row[2] for row in follower.rows] == ['Write report']
+    assert follower.reloads == 2
+
+
+def test_refresh_reloads_a_replaced_log(log, tmp_path):
+    follower = Recorder(log)
+    follower.refresh()
+    other = tmp_path / 'other.csv'
+    write_log(other, [ROWS[1], ROWS[0], ROWS[2]])
+    os.replace(other, log)
+    assert follower.refresh()
+    assert [row[2] for row in follower.rows] == ['Email', 'Write report', 'Write report']
+    assert follower.reloads == 2
+
+
+def test_refresh_of_a_missing_log_empties_the_store(log):
+    follower = Recorder(log)
+    follower.refresh()
+    os.remove(log)
+    assert follower.refresh()
+    assert follower.rows == []
+
+
+def test_new_rename_is_applied_without_a_reload(log):
+    write_log(log, ROWS[2:], mode='a')
+    store = HistoryStore(log)
+    totals = TotalsStore(log)
+    store.refresh()
+    totals.refresh()
+    rename_task(log, 'Email', 'Write report')
+    write_log(log, [ROWS[1]], mode='a')
+    store.refresh()
+    totals.refresh()
+    assert history(log) == {task: list(sessions) for task, sessions in store.history.items()}
+    assert list(store.history) == ['Write report', 'Review', 'Email']
+    assert totals.task_totals == {'Write report': 6300, 'Review': 600, 'Email': 900}
+
+
+def test_totals_sidecar_is_written_in_batches(log, monkeypatch):
+    monkeypatch.setattr(task_history, 'SIDECAR_SAVE_BYTES', 100)
+    sidecar = log + '.totals'
+    get_totals(log)  # the first load parses more than 100 bytes
+    saved = os.stat(sidecar).st_mtime_ns
+    append_row(log, ROWS[2])
+    assert os.stat(sidecar).st_mtime_ns == saved
+    append_row(log, ROWS[3])
+    append_row(log, ROWS[2])
+    assert os.stat(sidecar).st_mtime_ns != saved
+    append_row(log, ROWS[3])
+    task_history.save_totals()  # what runs at exit
+    loaded = TotalsStore(log)
+    assert not loaded.refresh()
+    assert loaded.task_totals == get_totals(log).task_totals
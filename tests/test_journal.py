@@ -0,0 +1,74 @@
+import pytest
+
+import task_core
+from task_core import ReplayClock, SessionJournal, TaskTimer
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = SessionJournal(str(tmp_path / 'task_log.csv.journal'))
+    yield journal
+    journal.close()
+
+
+def crashed_session(journal, *events):
+    """Journal a session started at 1000 (wall clock), then ``(when, method)`` events, and drop it."""
+    clock = ReplayClock(1000.0)
+    timer = TaskTimer(clock, clock, journal=journal)
+    timer.start('Write report', 'draft')
+    for when, method in events:
+        clock.now = when
+        getattr(timer, method)()
+
+
+def test_running_session_is_recovered_up_to_its_last_heartbeat(journal, monkeypatch):
+    crashed_session(journal, (1030, 'heartbeat'), (1060, 'heartbeat'))
+    monkeypatch.setattr(task_core.time, 'time', lambda: 1300.0)
+    assert journal.downtime() == 240
+    clock = ReplayClock(50.0)
+    timer = journal.recover(clock)
+    assert (timer.task, timer.comment, timer.start_time) == ('Write report', 'draft', 1000)
+    assert timer.running and not timer.paused
+    assert timer.elapsed() == 60
+    assert timer.segments == [[1000, 60], [1300, 0.0]]
+    assert [(e['event'], e['time']) for e in journal.events()[-2:]] == [('pause', 1060), ('resume', 1300)]
+    clock.now += 5
+    assert timer.elapsed() == 65
+    assert timer.stop() == ('Write report', 'draft', 1000, 65)
+
+
+def test_downtime_can_be_counted(journal, monkeypatch):
+    crashed_session(journal, (1060, 'heartbeat'))
+    monkeypatch.setattr(task_core.time, 'time', lambda: 1300.0)
+    timer = journal.recover(ReplayClock(50.0), count_downtime=True)
+    assert timer.elapsed() == 300
+    assert timer.segments == [[1000, 0.0]]
+
+
+def test_paused_session_stays_paused(journal, monkeypatch):
+    crashed_session(journal, (1100, 'pause'), (1200, 'resume'), (1250, 'pause'))
+    monkeypatch.setattr(task_core.time, 'time', lambda: 5000.0)
+    assert journal.downtime() == 0
+    timer = journal.recover(ReplayClock(0.0))
+    assert timer.paused and timer.elapsed() == 150
+    assert timer.segments == [[1000, 100], [1200, 50]]
+
+
+def test_only_the_last_session_is_replayed_and_clear_forgets_it(journal, monkeypatch):
+    crashed_session(journal, (1100, 'pause'))
+    clock = ReplayClock(2000.0)
+    TaskTimer(clock, clock, journal=journal).start('Email')
+    monkeypatch.setattr(task_core.time, 'time', lambda: 2000.0)
+    assert journal.recover(ReplayClock(0.0)).task == 'Email'
+    journal.clear()
+    assert journal.recover() is None
+
+
+def test_torn_last_line_is_skipped_and_ended(journal):
+    crashed_session(journal, (1100, 'pause'))
+    journal.close()
+    with open(journal.path, 'a', encoding='utf-8') as f:
+        f.write('{"event": "resu')
+    assert [e['event'] for e in journal.events()] == ['start', 'pause']
+    journal.record('resume', 1200)
+    assert [e['event'] for e in journal.events()] == ['start', 'pause', 'resume']
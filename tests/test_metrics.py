@@ -0,0 +1,75 @@
+import json
+import os
+import pstats
+import tracemalloc
+
+import pytest
+
+import task_metrics
+from task_metrics import Histogram, Metrics
+
+
+@pytest.fixture
+def metrics(monkeypatch):
+    monkeypatch.setattr(task_metrics.atexit, 'register', lambda func: func)  # dumped by the test instead
+    monkeypatch.delenv('TASK_TIMER_METRICS', raising=False)
+    monkeypatch.delenv('TASK_TIMER_PROFILE', raising=False)
+    yield Metrics()
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def test_histogram_buckets_and_percentiles():
+    histogram = Histogram()
+    for seconds in [0.000002, 0.001, 0.001, 0.003, 0.5]:
+        histogram.add(seconds)
+    summary = histogram.to_dict()
+    assert summary['count'] == 5 and summary['min_ms'] == 0.002 and summary['max_ms'] == 500.0
+    assert summary['buckets_us'] == {'<=4': 1, '<=1024': 2, '<=4096': 1, '<=524288': 1}
+    assert summary['p50_ms'] == 1.024
+    assert summary['p99_ms'] == 500.0  # capped at the largest sample, not the bucket bound
+    assert Histogram().to_dict()['mean_ms'] is None
+
+
+def test_nothing_is_recorded_until_configured(metrics, tmp_path):
+    calls = []
+    timed = metrics.timed('work')(calls.append)
+    timed(1)
+    metrics.count('rows')
+    with metrics.capture('startup'):
+        pass
+    assert calls == [1] and metrics.histograms == {} and metrics.counters == {}
+    assert not metrics.configure()
+    with pytest.raises(ValueError):
+        metrics.configure(str(tmp_path / 'metrics.json'), 'perf')
+
+
+def test_counters_timers_and_cprofile_captures_are_dumped(metrics, tmp_path):
+    path = str(tmp_path / 'metrics.json')
+    assert metrics.configure(path, 'cprofile')
+    timed = metrics.timed('work')(sum)
+    assert timed([1, 2]) == 3
+    metrics.count('rows', 5)
+    with metrics.capture('window_open'):
+        with metrics.capture('load:inner'):  # overlaps the first capture: timed, not profiled
+            sorted(range(1000))
+    metrics.dump()
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    assert data['counters'] == {'rows': 5}
+    assert sorted(data['timers']) == ['phase:load:inner', 'phase:window_open', 'work']
+    assert data['timers']['work']['count'] == 1
+    assert list(data['profiles']) == ['window_open']
+    assert os.path.exists(data['profiles']['window_open'])
+    pstats.Stats(data['profiles']['window_open'])  # readable
+
+
+def test_tracemalloc_capture_records_allocations(metrics, tmp_path):
+    metrics.configure(str(tmp_path / 'metrics.json'), 'tracemalloc')
+    with metrics.capture('startup'):
+        kept = [bytearray(1024) for _ in range(100)]
+    (summary,) = metrics.memory['startup']
+    assert summary['allocated_bytes'] >= 100 * 1024
+    assert summary['peak_bytes'] >= summary['allocated_bytes']
+    assert summary['top'] and len(summary['top']) <= task_metrics.TOP_ALLOCATIONS
+    del kept
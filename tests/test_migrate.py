@@ -0,0 +1,60 @@
+import csv
+import os
+
+import pytest
+
+from task_history import HistoryStore, migrate_log, read_header, rename_task
+
+ROWS = [
+    ['2025-01-06', '09:00:00', '2025-01-06', '09:30:00', 'Write report', 'draft', 1800],
+    ['2025-01-06', '10:00:00', '2025-01-06', '10:15:00', 'Email', '', 900],
+    ['2025-01-07', '09:00:00', '2025-01-07', '10:00:00', 'Write report', 'edit', 3600],
+    ['2025-01-07', '11:00:00', 'Review', 'v1 row', 600],
+]
+
+
+def write_log(path, rows, mode='w'):
+    with open(path, mode, newline='', encoding='utf-8') as f:
+        csv.writer(f).writerows(rows)
+
+
+def history(path):
+    store = HistoryStore(str(path))
+    store.refresh()
+    return {task: list(sessions) for task, sessions in store.history.items()}
+
+
+@pytest.fixture
+def log(tmp_path):
+    path = tmp_path / 'task_log.csv'
+    write_log(path, ROWS[:2])
+    return str(path)
+
+
+@pytest.mark.parametrize('layout', ['v1', 'v4'])
+def test_migrate_log_round_trip(log, layout):
+    write_log(log, ROWS[2:], mode='a')
+    rename_task(log, 'Email', 'Mail')
+    before = history(log)
+    assert migrate_log(log, layout) == len(ROWS)
+    assert read_header(log) == layout
+    assert history(log) == before
+    other = 'v4' if layout == 'v1' else 'v1'
+    migrate_log(log, other)
+    assert read_header(log) == other
+    assert history(log) == before
+
+
+def test_migrate_log_resumes_after_an_interruption(log, tmp_path):
+    write_log(log, ROWS[2:] * 200, mode='a')
+    expected = history(log)
+
+    def stop(done, total):
+        if done > 4096:
+            raise KeyboardInterrupt
+    with pytest.raises(KeyboardInterrupt):
+        migrate_log(log, 'v1', progress=stop, checkpoint=1024)
+    assert os.path.exists(log + '.migrate.json')
+    migrate_log(log, 'v1', checkpoint=1024)
+    assert not os.path.exists(log + '.migrate.json')
+    assert history(log) == expected
@@ -0,0 +1,79 @@
+import csv
+import random
+
+import pytest
+
+from task_history import TotalsStore, rename_task
+from task_parallel import aggregate, rebuild_sidecar, serial_totals, split_ranges
+
+
+def snapshot(totals):
+    return (list(totals.task_totals.items()), list(totals.day_totals.items()),
+            totals.task_day_totals, totals.last_seen, totals.last_comment, totals.bad_stamps)
+
+
+@pytest.fixture
+def logs(tmp_path):
+    rng = random.Random(7)
+    paths = []
+    for name in ('a.csv', 'b.csv'):
+        path = tmp_path / name
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            for _ in range(3000):
+                day = f"2025-{rng.randrange(1, 13):02}-{rng.randrange(1, 29):02}"
+                start = f"{rng.randrange(24):02}:{rng.randrange(60):02}:00"
+                task = f"task {rng.randrange(30)}"
+                comment = rng.choice(["", "notes", "a, quoted \"comment\""])
+                if rng.random() < 0.5:
+                    writer.writerow([day, start, task, comment, rng.randrange(3600)])
+                else:
+                    writer.writerow([day, start, day, start, task, comment, rng.randrange(3600)])
+            writer.writerow(['not a date', '??', 'task 3', '', 5])
+            writer.writerow(['broken row'])
+        paths.append(str(path))
+    rename_task(paths[0], 'task 1', 'task 2')
+    return paths
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_aggregate_matches_serial_totals(logs, workers):
+    expected = serial_totals(logs)
+    assert snapshot(aggregate(logs, workers=workers, chunk_size=4096)) == snapshot(expected)
+
+
+def test_rebuild_sidecar_matches_a_serial_store(logs):
+    store = TotalsStore(logs[0])
+    store.refresh()
+    rebuilt = rebuild_sidecar(logs[0], workers=1, chunk_size=4096)
+    assert snapshot(rebuilt) == snapshot(store)
+    loaded = TotalsStore(logs[0])
+    assert not loaded.refresh()  # the sidecar is current
+    assert snapshot(loaded) == snapshot(store)
+
+
+def test_split_ranges_cover_the_file_on_line_boundaries(logs):
+    ranges = split_ranges(logs[0], chunk_size=1000)
+    with open(logs[0], 'rb') as f:
+        data = f.read()
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(data)
+    assert all(end == start for (_, end), (start, _) in zip(ranges, ranges[1:]))
+    assert all(data[end - 1:end] == b'\n' for _, end in ranges)
+
+
+def test_rebuild_sidecar_leaves_a_partial_line_for_later(logs):
+    with open(logs[0], 'a', newline='', encoding='utf-8') as f:
+        f.write('2025-01-08,09:00:00,task 99')
+    rebuilt = rebuild_sidecar(logs[0], workers=1, chunk_size=4096)
+    assert 'task 99' not in rebuilt.task_totals
+    with open(logs[0], 'a', newline='', encoding='utf-8') as f:
+        f.write(',,60\r\n')
+    loaded = TotalsStore(logs[0])
+    assert loaded.refresh()  # picks up only the completed row
+    assert loaded.task_totals['task 99'] == 60
+    assert loaded.task_totals == serial_totals(logs[:1]).task_totals
+
+
+def test_aggregate_rejects_an_unknown_layout(logs):
+    with pytest.raises(ValueError):
+        aggregate(logs, workers=1, parse_row=lambda row: None)
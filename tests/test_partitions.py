@@ -0,0 +1,76 @@
+import csv
+import os
+
+import pytest
+
+from task_history import HistoryStore, rename_task
+from task_partitions import PartitionedLog, split_log
+
+ROWS = [
+    ['2025-01-06', '09:00:00', '2025-01-06', '09:30:00', 'Write report', 'draft', 1800],
+    ['2025-01-31', '23:50:00', '2025-02-01', '00:05:00', 'Email', '', 900],
+    ['2025-02-03', '09:00:00', 'Review', 'v1 row, quoted', 600],
+    ['2025-03-10', '11:00:00', '2025-03-10', '12:00:00', 'Write report', 'edit', 3600],
+    ['not a date', '??', 'Email', '', 5],
+]
+
+
+@pytest.fixture
+def log(tmp_path):
+    path = tmp_path / 'task_log.csv'
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerows(ROWS)
+    return str(path)
+
+
+def csv_history(path):
+    store = HistoryStore(path)
+    store.refresh()
+    return {task: list(sessions) for task, sessions in store.history.items()}
+
+
+def test_split_log_keeps_every_session(log, tmp_path):
+    directory = str(tmp_path / 'parts')
+    assert split_log(log, directory) == 5
+    assert sorted(os.listdir(directory)) == ['2025-01.csv', '2025-02.csv', '2025-03.csv', 'manifest.json',
+                                             'undated.csv']
+    parts = PartitionedLog(directory)
+    assert parts.history() == {task: sorted(sessions) for task, sessions in csv_history(log).items()}
+    assert parts.task_totals() == {'Write report': 5400, 'Email': 905, 'Review': 600}
+
+
+def test_split_log_applies_pending_renames(log, tmp_path):
+    rename_task(log, 'Email', 'Write report')
+    rename_task(log, 'Review', 'Reviews')
+    directory = str(tmp_path / 'parts')
+    split_log(log, directory)
+    parts = PartitionedLog(directory)
+    assert parts.task_totals() == {'Write report': 6305, 'Reviews': 600}
+    assert set(parts.history()) == {'Write report', 'Reviews'}
+
+
+def test_range_queries_use_the_manifest(log, tmp_path):
+    directory = str(tmp_path / 'parts')
+    split_log(log, directory)
+    parts = PartitionedLog(directory)
+    assert parts.task_totals(20250201, 20250228) == {'Review': 600}
+    assert parts.day_totals(20250131, 20250203) == {'2025-01-31': 900, '2025-02-03': 600}
+    assert parts.recent_tasks(2) == ['Write report', 'Review']
+    assert parts.last_session('Write report')[3] == 'edit'
+
+
+def test_append_rename_and_compress(log, tmp_path):
+    directory = str(tmp_path / 'parts')
+    split_log(log, directory)
+    parts = PartitionedLog(directory)
+    parts.append(['2025-02-04', '10:00:00', '2025-02-04', '10:10:00', 'Email', 'late', 600])
+    assert parts.task_totals(20250201, 20250228) == {'Review': 600, 'Email': 600}
+    assert parts.compress(keep='2025-03') == ['2025-01', '2025-02']
+    assert os.path.exists(os.path.join(directory, '2025-02.csv.gz'))
+    parts.append(['2025-02-05', '10:00:00', 'Email', 'into the gzip', 60])
+    parts.rename_task('Email', 'Mail')
+    reloaded = PartitionedLog(directory)
+    reloaded.refresh()
+    assert reloaded.task_totals() == {'Write report': 5400, 'Mail': 1565, 'Review': 600}
+    assert [comment for _, _, _, comment, _ in reloaded.sessions('Mail', 20250204, 20250205)] == [
+        'late', 'into the gzip']
@@ -0,0 +1,100 @@
+import csv
+import importlib.util
+import os
+
+import pytest
+
+from task_search import SearchIndex, parse_query, tokens
+
+SESSIONS = {
+    'ABC-1234 login bug': [('2025-01-06', '09:00:00', 'repro, see #1234', 1800),
+                           ('2025-02-03', '10:00:00', 'ticket closed', 600)],
+    'Email': [('2025-01-07', '08:00:00', '', 300)],
+    'Write report': [('2025-01-08', '09:00:00', 'login numbers', 3600),
+                     ('9am', 'today', 'odd stamp', 5)],
+}
+
+
+@pytest.fixture
+def index():
+    return SearchIndex.from_history(SESSIONS)
+
+
+def test_tokens_and_query_parsing():
+    assert tokens('Fix #1234, fix it') == ['fix', '1234', 'it']
+    assert parse_query('bug from:2025-01-01 to:2025-01-31') == (['bug'], 20250101, 20250131)
+    assert parse_query('from:someone') == (['from', 'someone'], None, None)
+
+
+def test_search_matches_every_word_as_a_prefix(index):
+    assert index.search('tick') == [('2025-02-03', '10:00:00', 'ABC-1234 login bug', 'ticket closed', 600)]
+    assert [s[2] for s in index.search('login')] == ['ABC-1234 login bug', 'ABC-1234 login bug', 'Write report']
+    assert [s[3] for s in index.search('login num')] == ['login numbers']
+    assert index.search('login nothing') == []
+    assert index.search('') == []
+
+
+def test_search_by_date_range(index):
+    assert [s[3] for s in index.search('login to:2025-01-31')] == ['repro, see #1234', 'login numbers']
+    assert [s[2] for s in index.search('from:2025-01-07 to:2025-01-07')] == ['Email']
+    assert len(index.search('', start=20250101)) == 4  # the odd stamp is never in a range
+    assert len(index.search('login', limit=2)) == 2
+
+
+def test_add_keeps_search_and_suggest_current(index):
+    assert index.suggest('e') == ['Email']
+    index.add(('2025-03-01', '09:00:00', 'Expenses', 'march', 60))
+    assert index.search('march')[0][2] == 'Expenses'
+    assert index.suggest('e') == ['Expenses', 'Email']
+    assert index.suggest('log b') == ['ABC-1234 login bug']
+    assert index.suggest('zzz') == []
+
+
+def load_app(monkeypatch, tmp_path):
+    for name in ('TASK_TIMER_DB', 'TASK_TIMER_BINLOG', 'TASK_TIMER_PARTITIONS', 'TASK_TIMER_SERVER'):
+        monkeypatch.delenv(name, raising=False)
+    path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'task-timer-v4.py')
+    spec = importlib.util.spec_from_file_location('task_timer_v4', path)
+    app = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(app)
+    app.DATA_FILE = str(tmp_path / 'task_log.csv')
+    with open(app.DATA_FILE, 'w', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerow(['2025-01-06', '09:00:00', '2025-01-06', '09:30:00', 'Email', 'inbox', 1800])
+    return app
+
+
+def test_session_saved_during_an_index_build_is_indexed_once(monkeypatch, tmp_path):
+    app = load_app(monkeypatch, tmp_path)
+    from_history = SearchIndex.from_history
+
+    def save_midway(history):
+        # The Tk thread saves sessions while the loader thread builds the index
+        app.save_session('Email', 'outbox', 1736157600, 60)
+        index = from_history(history)
+        app.save_session('Email', 'drafts', 1736161200, 60)
+        return index
+    monkeypatch.setattr(app.SearchIndex, 'from_history', save_midway)
+    try:
+        index = app.get_search_index()
+        assert [s[3] for s in index.search('email')] == ['inbox', 'outbox', 'drafts']
+        app.save_session('Email', 'later', 1736164800, 60)
+        assert [s[3] for s in index.search('email')] == ['inbox', 'outbox', 'drafts', 'later']
+    finally:
+        app.close_writer()
+
+
+def test_rename_during_an_index_build_starts_it_over(monkeypatch, tmp_path):
+    app = load_app(monkeypatch, tmp_path)
+    from_history = SearchIndex.from_history
+    builds = []
+
+    def rename_midway(history):
+        builds.append(history)
+        if len(builds) == 1:
+            app.rename_task_in_file('Email', 'Mail')
+        return from_history(history)
+    monkeypatch.setattr(app.SearchIndex, 'from_history', rename_midway)
+    index = app.get_search_index()
+    assert len(builds) == 2
+    assert index.suggest('m') == ['Mail']
+    assert index.search('email') == []
@@ -0,0 +1,124 @@
+import asyncio
+import csv
+import http.client
+import threading
+
+import pytest
+
+from task_core import session_row
+from task_server import ServerError, TimerClient, TimerServer
+
+
+@pytest.fixture
+def server(tmp_path):
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever)
+    thread.start()
+    timer_server = TimerServer(str(tmp_path / 'task_log.csv'), fsync=False)
+    listening = asyncio.run_coroutine_threadsafe(timer_server.start(port=0), loop).result()
+    timer_server.port = listening.sockets[0].getsockname()[1]
+    yield timer_server
+    asyncio.run_coroutine_threadsafe(timer_server.close(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+@pytest.fixture
+def client(server):
+    client = TimerClient(f"127.0.0.1:{server.port}")
+    yield client
+    client.close()
+
+
+def log_rows(server):
+    with open(server.log, newline='', encoding='utf-8') as f:
+        return list(csv.reader(f))
+
+
+def test_timer_lifecycle(server, client):
+    state = client.start('tk-1', ' Write report ', 'draft')
+    assert (state['task'], state['comment'], state['paused']) == ('Write report', 'draft', False)
+    with pytest.raises(ServerError, match='already running'):
+        client.start('tk-1', 'Email')
+    client.pause('tk-1')
+    assert client.pause('tk-1')['paused']  # a retried pause leaves it paused
+    assert not client.resume('tk-1')['paused']
+    assert [timer['id'] for timer in client.status()] == ['tk-1']
+    saved = client.stop('tk-1', 'done')
+    assert (saved['task'], saved['comment']) == ('Write report', 'done')
+    assert len(saved['segments']) == 2
+    assert log_rows(server) == [[str(v) for v in session_row('Write report', 'done', saved['start_time'],
+                                                              saved['duration'], saved['segments'])]]
+    assert client.status() == []
+    with pytest.raises(ServerError, match='not running'):
+        client.stop('tk-1')
+
+
+def test_sessions_rename_and_reports(server, client):
+    client.save('Email', 'inbox', 1736150400, 900)
+    client.save('Write report', 'draft', 1736154000, 1800, [[1736154000, 600], [1736155000, 1200]])
+    client.save('Email', '', 1736240400, 300)
+    client.rename('Email', 'Mail')
+    assert client.report() == {'Write report': 1800, 'Mail': 1200}
+    days = {}
+    for start, duration in [(1736150400, 900), (1736154000, 1800), (1736240400, 300)]:
+        day = session_row('', '', start, duration)[0]
+        days[day] = days.get(day, 0) + duration
+    assert client.report('day') == days
+    assert client.recent(2) == [['Mail', 1200, ''], ['Write report', 1800, 'draft']]
+    history = client.history()
+    assert list(history) == ['Mail', 'Write report']
+    assert [comment for _, _, comment, _ in history['Mail']] == ['inbox', '']
+    with open(server.log + '.segments', encoding='utf-8') as f:
+        assert f.read()  # the segments went to the sidecar
+
+
+def test_bad_requests_are_answered(server, client):
+    with pytest.raises(ServerError, match='no route'):
+        client.request('GET', '/nowhere')
+    with pytest.raises(ServerError, match='by must be'):
+        client.report('week')
+    with pytest.raises(ServerError, match='empty task'):
+        client.start('tk-1', '  ')
+    conn = http.client.HTTPConnection('127.0.0.1', server.port, timeout=5)
+    conn.request('POST', '/sessions', b'[1, 2]', {'Content-Type': 'application/json'})
+    response = conn.getresponse()
+    assert response.status == 400 and b'JSON object' in response.read()
+    conn.close()
+    assert client.status() == []  # the server is still serving
+
+
+def test_a_failed_stop_keeps_the_timer(server, client, monkeypatch):
+    client.start('tk-1', 'Write report')
+    write = server.writer.write
+    calls = []
+
+    def fail_once(*args):
+        calls.append(args)
+        if len(calls) == 1:
+            raise OSError("disk full")
+        return write(*args)
+    monkeypatch.setattr(server.writer, 'write', fail_once)
+    with pytest.raises(ServerError, match='disk full'):
+        client.stop('tk-1')
+    assert [timer['id'] for timer in client.status()] == ['tk-1']
+    assert client.stop('tk-1')['task'] == 'Write report'
+    assert len(log_rows(server)) == 1
+
+
+def test_concurrent_clients_share_one_writer(server):
+    def save_many(n):
+        client = TimerClient(f"127.0.0.1:{server.port}")
+        for i in range(25):
+            client.save(f"task {n}", f"row {i}", 1736150400 + i, 60)
+        client.close()
+    threads = [threading.Thread(target=save_many, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    rows = log_rows(server)
+    assert len(rows) == 100 and all(len(row) == 7 for row in rows)
+    for n in range(4):
+        assert [row[5] for row in rows if row[4] == f"task {n}"] == [f"row {i}" for i in range(25)]
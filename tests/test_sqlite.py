@@ -0,0 +1,110 @@
+import csv
+import sqlite3
+
+import pytest
+
+from task_history import HistoryStore, TotalsStore, append_row, rename_task
+from task_sqlite import SessionDB
+
+ROWS = [
+    ['2025-01-06', '09:00:00', '2025-01-06', '09:30:00', 'Write report', 'draft', 1800],
+    ['2025-01-06', '10:00:00', '2025-01-06', '10:15:00', 'Email', '', 900],
+    ['2025-01-07', '09:00:00', 'Review', 'v1 row, quoted', 600],
+    ['2025-01-07', '11:00:00', '2025-01-07', '12:00:00', 'Write report', 'edit', 3600],
+]
+
+
+@pytest.fixture
+def log(tmp_path):
+    path = tmp_path / 'task_log.csv'
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerows(ROWS)
+    return str(path)
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = SessionDB(str(tmp_path / 'task_log.db'))
+    yield db
+    db.close()
+
+
+def test_import_csv_matches_the_csv_readers(log, db):
+    assert db.import_csv(log) == 4
+    assert db.import_csv(log) is None  # once per file
+    store = HistoryStore(log)
+    store.refresh()
+    assert db.history() == {task: list(sessions) for task, sessions in store.history.items()}
+
+
+def test_import_csv_applies_pending_renames(log, db):
+    rename_task(log, 'Email', 'Write report')
+    rename_task(log, 'Review', 'Reviews')
+    db.import_csv(log)
+    assert db.task_totals() == {'Write report': 6300, 'Reviews': 600}
+    assert db.sessions('Email') == []
+
+
+def test_queries_match_the_totals_store(log, db):
+    db.import_csv(log)
+    db.save('2025-01-07', '10:00:00', 'Email', 'late reply', 300, '2025-01-07', '10:05:00')
+    totals = TotalsStore(log)
+    totals.refresh()
+    append_row(log, ['2025-01-07', '10:00:00', '2025-01-07', '10:05:00', 'Email', 'late reply', 300])
+    totals.refresh()
+    assert db.task_totals() == totals.task_totals
+    assert db.recent_tasks(3) == totals.recent_tasks(3) == ['Write report', 'Email', 'Review']
+    assert db.last_comment('Email') == 'late reply' and db.last_comment('Nothing') == ''
+    assert db.task_total('Write report') == 5400 and db.task_total('Nothing') == 0
+    assert db.sessions('Email')[-1] == ('2025-01-07', '10:00:00', 'late reply', 300)
+
+
+def test_rename_merges_last_seen(db):
+    db.save('2025-01-06', '09:00:00', 'Write report', '', 60)
+    db.save('2025-01-08', '09:00:00', 'Email', '', 60)
+    db.save('2025-01-07', '09:00:00', 'Review', '', 60)
+    assert db.recent_tasks(3) == ['Email', 'Review', 'Write report']
+    db.rename_task('Email', 'Write report')
+    assert db.recent_tasks(3) == ['Write report', 'Review']
+    assert db.task_totals() == {'Write report': 120, 'Review': 60}
+    db.rename_task('Review', 'Reviews')
+    assert db.recent_tasks(3) == ['Write report', 'Reviews']
+
+
+def test_recent_tasks_raises_on_an_unparseable_stamp(db):
+    db.save('2025-01-06', '09:00:00', 'Write report', '', 60)
+    db.save('yesterday', '9am', 'Email', '', 60)
+    with pytest.raises(ValueError):
+        db.recent_tasks()
+    assert db.task_totals() == {'Write report': 60, 'Email': 60}
+
+
+def test_import_keeps_segments_from_the_sidecar(tmp_path, db):
+    log = str(tmp_path / 'task_log.csv')
+    append_row(log, ROWS[0], segments=[(1736154000.0, 600.0), (1736155000.0, 1200.0)])
+    append_row(log, ROWS[1])
+    db.import_csv(log)
+    stored = [segments for segments, in db.conn.execute("SELECT segments FROM sessions ORDER BY id")]
+    assert stored[0] and stored[1] is None
+
+
+def test_old_databases_are_migrated(tmp_path):
+    path = str(tmp_path / 'old.db')
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE sessions (id INTEGER PRIMARY KEY, start_date TEXT NOT NULL, start_time TEXT NOT NULL,
+            end_date TEXT, end_time TEXT, task TEXT NOT NULL, comment TEXT NOT NULL,
+            duration INTEGER NOT NULL, start_key INTEGER);
+        INSERT INTO sessions (start_date, start_time, task, comment, duration, start_key) VALUES
+            ('2025-01-06', '09:00:00', 'Write report', '', 60, 20250106090000),
+            ('2025-01-07', '09:00:00', 'Email', '', 60, 20250107090000);
+    """)
+    conn.commit()
+    conn.close()
+    db = SessionDB(path)
+    try:
+        assert db.recent_tasks() == ['Email', 'Write report']
+        db.save('2025-01-08', '09:00:00', 'Write report', '', 60, segments='1736323200:60')
+        assert db.recent_tasks() == ['Write report', 'Email']
+    finally:
+        db.close()